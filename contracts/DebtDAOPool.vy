@@ -1,4 +1,5 @@
 # @version ^0.3.9
+# pragma optimize codesize
 
 """
 @title 	Debt DAO Lending Pool
@@ -29,6 +30,7 @@ implements: IERC2612
 implements: IERC3156
 implements: IERC4626
 implements: IERC4626R
+implements: IERC4626P
 implements: IDebtDAOPool
 implements: IRevenueGenerator
 
@@ -42,6 +44,7 @@ interface IDebtDAOPool:
 	# investments
 	def unlock_profits() -> uint256: nonpayable
 	def collect_interest(line: address, id: bytes32) -> uint256: nonpayable
+	def collect_interest_many(lines: DynArray[address, MAX_BATCH_SIZE], ids: DynArray[bytes32, MAX_BATCH_SIZE]) -> uint256: nonpayable
 	def increase_credit( line: address, id: bytes32, amount: uint256) -> bool: nonpayable
 	def set_rates( line: address, id: bytes32, drate: uint128, frate: uint128) -> bool: nonpayable
 	def add_credit( line: address, drate: uint128, frate: uint128, amount: uint256) -> bytes32: nonpayable
@@ -55,14 +58,23 @@ interface IDebtDAOPool:
 	def divest_vault(vault: address, amount: uint256) -> bool: nonpayable
 	def invest_vault(vault: address, amount: uint256) -> uint256: nonpayable
 
+	# portfolio
+	def get_credit_positions(start: uint256, count: uint256) -> DynArray[CreditPosition, MAX_BATCH_SIZE]: view
+	def get_vaults(start: uint256, count: uint256) -> DynArray[address, MAX_BATCH_SIZE]: view
+
+	# batched delegate operations
+	def multicall(calls: DynArray[Bytes[MAX_MULTICALL_CALLDATA], MAX_BATCH_SIZE]) -> DynArray[Bytes[64], MAX_BATCH_SIZE]: nonpayable
+
 	# Pool Admin
 	def set_max_assets(new_max: uint256) -> bool: nonpayable
 	def set_min_deposit(new_min: uint256) -> bool: nonpayable
 	def set_vesting_rate(vesting_rate: uint256): nonpayable
+	def set_redemption_queue(queue: address): nonpayable
 
 	def stake_assets(_assets: uint256) -> uint256: nonpayable
 	def initiate_unstake(_shares: uint256) -> uint256: nonpayable
 	def unstake_shares(_index: uint256, _receiver: address): nonpayable
+	def unstake_matured(_max_entries: uint256, _receiver: address) -> uint256: nonpayable
 
 	# fees
 	def set_performance_fee(fee: uint16) -> bool: nonpayable
@@ -89,6 +101,8 @@ SNITCH_FEE: public(constant(uint16)) = 500
 MAX_PITTANCE_FEE: public(constant(uint16)) = 200
 # @notice How long delegate has to wait to claim stake after initiating withdrawal. 7 days in seconds
 UNSTAKE_TIMELOCK: public(constant(uint256)) = 60*60*24 * 7 # 7 days
+# @notice max number of pending unstakes Delegate can have at once. size of unstake_queue ring buffer
+MAX_UNSTAKE_QUEUE: public(constant(uint256)) = 64
 
 # rate per block of profit degradation. VESTING_RATE_COEFFICIENT is 100% per block
 VESTING_RATE_COEFFICIENT: public(constant(uint256)) = 10 ** 18
@@ -102,6 +116,23 @@ API_VERSION: public(constant(String[7])) = "0.0.001"
 DOMAIN_TYPE_HASH: constant(bytes32) = keccak256('EIP712Domain(string name,string version,uint256 chainId,address verifyingContract)')
 # @notice EIP712 permit type hash
 PERMIT_TYPE_HASH: constant(bytes32) = keccak256("Permit(address owner,address spender,uint256 value,uint256 nonce,uint256 deadline)")
+# @notice bit masks for unpacking storage slots
+UINT16_MASK: constant(uint256) = 2**16 - 1
+UINT64_MASK: constant(uint256) = 2**64 - 1
+UINT128_MASK: constant(uint256) = 2**128 - 1
+UINT192_MASK: constant(uint256) = 2**192 - 1
+# @notice max number of items that can be processed in a single batch call
+MAX_BATCH_SIZE: public(constant(uint256)) = 50
+# @notice max calldata for one multicall item. selector + 4 static args (add_credit, set_rates)
+MAX_MULTICALL_CALLDATA: public(constant(uint256)) = 4 + 32 * 4
+# @notice Delegate functions that can be batched in multicall()
+ADD_CREDIT_SELECTOR: constant(uint256) = 3500764669 # method_id("add_credit(address,uint128,uint128,uint256)")
+INCREASE_CREDIT_SELECTOR: constant(uint256) = 4051305103 # method_id("increase_credit(address,bytes32,uint256)")
+SET_RATES_SELECTOR: constant(uint256) = 1535545335 # method_id("set_rates(address,bytes32,uint128,uint128)")
+REDUCE_CREDIT_SELECTOR: constant(uint256) = 4231630808 # method_id("reduce_credit(address,bytes32,uint256)")
+INVEST_VAULT_SELECTOR: constant(uint256) = 1209894285 # method_id("invest_vault(address,uint256)")
+DIVEST_VAULT_SELECTOR: constant(uint256) = 2727134044 # method_id("divest_vault(address,uint256)")
+UNLOCK_PROFITS_SELECTOR: constant(uint256) = 3028936756 # method_id("unlock_profits()")
 # Debt DAO SecuredLine statuses from LineLib.STATUS (vyper and solidity convert enums differerntly)
 STATUS_UNINITIALIZED: constant(uint8) = 0
 STATUS_ACTIVE: constant(uint8) = 1
@@ -131,14 +162,17 @@ total_assets: public(uint256)
 
 # share price logic stolen from yearn vyper vaults
 # vars - https://github.com/yearn/yearn-vaults/blob/74364b2c33bd0ee009ece975c157f065b592eeaf/contracts/Vault.vy#L239-L242
-# block.timestamp of last report
-last_report: public(uint256)
 # how many base tokens earned as profit are locked and cant be withdrawn
 locked_profits: public(uint256)
-# The rate of degradation in percent per second scaled to 1e18. 
-# lower the coefficient the slower the profit drip
-# VESTING_RATE_COEFFICIENT is 100% per block
-vesting_rate: public(uint256)
+# profit vesting schedule packed into a single slot bc always read together on every price calculation
+# | pending_flash_fees (128 bits) | vesting_rate (64 bits) | last_report (64 bits) |
+# last_report - block.timestamp of last report
+# vesting_rate - The rate of degradation in percent per second scaled to 1e18. 
+# 	lower the coefficient the slower the profit drip
+# 	VESTING_RATE_COEFFICIENT is 100% per block
+# pending_flash_fees - flash loan fees received but not added to total_assets + locked_profits yet.
+# 	folded in on next _unlock_profits so flash loans dont pay for a full share price update
+packed_vesting: uint256
 
 # IERC2612 Variables
 nonces: public(HashMap[address, uint256])
@@ -161,8 +195,14 @@ pending_rev_recipient: public(address)
 accrued_fees: public(uint256)
 # shares deposited by delegaet as collateral to manage pool
 delegate_stake: public(uint256)
-# delegate stake withdrawals with timelock. block timestamp -> amount
-unstake_queue: public(HashMap[uint256, uint256])
+# delegate stake withdrawals with timelock. ring buffer indexed by queue position % MAX_UNSTAKE_QUEUE
+# each entry packed into a single slot - | unlock_time (64 bits) | shares (192 bits) |
+# timelock is constant so entries always mature in FIFO order
+unstake_queue: public(uint256[MAX_UNSTAKE_QUEUE])
+# queue position of oldest unsettled unstake
+unstake_head: public(uint256)
+# queue position next unstake will be written to
+unstake_tail: public(uint256)
 
 # minimum amount of assets that can be deposited at once. whales only, fuck plebs.
 min_deposit: public(uint256)
@@ -178,6 +218,21 @@ impairments: public(HashMap[address, uint256])
 # total notional amount of ASSET borrowed from lines. Does not include interest owed.
 debt_principal: public(uint256)
 
+# enumerable sets of open investments so portfolio can be read without replaying events
+# entries are swap-and-pop'd on removal so order is not stable across removals
+# credit positions on lines with deposit still in them, including impaired ones until their lost principal is
+# recovered. 1-indexed position in set for O(1) removal. 0 = not in set
+credit_positions: HashMap[uint256, CreditPosition]
+credit_position_count: public(uint256)
+credit_position_index: HashMap[address, HashMap[bytes32, uint256]]
+# 4626 vaults with principal or shares still held by pool. 1-indexed position in set. 0 = not in set
+vaults: HashMap[uint256, address]
+vault_count: public(uint256)
+vault_index: HashMap[address, uint256]
+
+# RedemptionQueue escrowing shares of depositors waiting for liquidity. redeemed whenever liquidity comes back
+redemption_queue: public(address)
+
 
 struct Fees:
 	# Fee types #0-2 go to pool owner
@@ -211,7 +266,9 @@ enum FEE_TYPES:
 	REFERRAL
 	SNITCH
 
-fees: public(Fees)
+# all Fees packed into a single slot. 16 bits per fee in same order as Fees struct starting at lowest bits
+# | ... | referral | collector | flash | withdraw | deposit | performance |
+packed_fees: uint256
 
 
 @external
@@ -232,16 +289,17 @@ def __init__(
 	"""
 	assert _delegate != empty(address), "must have delegate"
 
-	self.owner = msg.sender # set owner to deployer for validation functions
-	self._assert_max_fee(_fees.performance, FEE_TYPES.PERFORMANCE) # max 100% performance fee
-	self._assert_pittance_fee(_fees.deposit, FEE_TYPES.DEPOSIT)
-	self._assert_pittance_fee(_fees.withdraw, FEE_TYPES.WITHDRAW)
-	self._assert_pittance_fee(_fees.flash, FEE_TYPES.FLASH)
-	self._assert_pittance_fee(_fees.collector, FEE_TYPES.COLLECTOR)
-	self._assert_pittance_fee(_fees.referral, FEE_TYPES.REFERRAL)
+	# same checks and logs as fee setters. inlined bc owner isnt set yet
+	assert convert(_fees.performance, uint256) <= FEE_COEFFICIENT, "bad performance _fee" # max 100% performance fee
+	log FeeSet(_fees.performance, convert(FEE_TYPES.PERFORMANCE, uint256))
+	fee_type: uint256 = convert(FEE_TYPES.DEPOSIT, uint256)
+	for fee in [_fees.deposit, _fees.withdraw, _fees.flash, _fees.collector, _fees.referral]:
+		assert fee <= MAX_PITTANCE_FEE, "bad pittance fee"
+		log FeeSet(fee, fee_type)
+		fee_type = fee_type << 1 # FEE_TYPES are declared in the same order as Fees fields
 
 	# Setup Pool variables
-	self.fees = _fees
+	self.packed_fees = self._pack_fees(_fees)
 	self.owner = _delegate
 	self.rev_recipient = _delegate
 	self.max_assets = max_value(uint256)
@@ -263,8 +321,7 @@ def __init__(
 
 	# TODO: Debt DAO - set profit to bedistributed to every `4 eek` (ethereum week)
 	# 4 * 2048 epochs = 4 * 32 * 2048 blocks = COEFFICIENT / (4 * 32 * 2048) / 10 ** 6 ???
-	self.vesting_rate = FOUR_EEKS_VESTING_RATE
-	self.last_report = block.timestamp
+	self.packed_vesting = self._pack_vesting(block.timestamp, FOUR_EEKS_VESTING_RATE, 0)
 
 	# IERC2612
 	CACHED_CHAIN_ID = chain.id # cache before compute
@@ -274,40 +331,29 @@ def __init__(
 ### Investing functions
 
 @internal
-def _assert_owner_has_available_funds(amount: uint256):
+def _assert_owner():
 	assert msg.sender == self.owner, "not owner"
+
+@internal
+def _assert_owner_has_available_funds(amount: uint256):
+	self._assert_owner()
 	assert self.total_assets - self.total_deployed >= amount
 
 @external
 @nonreentrant("lock")
 def add_credit(_line: address, _drate: uint128, _frate: uint128, _amount: uint256) -> bytes32:
-	self._assert_owner_has_available_funds(_amount)
-	 # TODO rename to prevent delegate confusion btw this add_credit and accept_offer which also call SecuredLine.addCredit()
-	assert ISecuredLine(_line).borrower() != self
-	
-	self.total_deployed += _amount
-	
-	# NOTE: no need to log, Line emits events already
-	IERC20(ASSET).approve(_line, _amount)
-	return ISecuredLine(_line).addCredit(_drate, _frate, _amount, ASSET, self)
+	return self._add_credit(_line, _drate, _frate, _amount)
 
 @external
 @nonreentrant("lock")
 def increase_credit(_line: address, _id: bytes32, _amount: uint256) -> bool:
-	self._assert_owner_has_available_funds(_amount)
-
-	self.total_deployed += _amount
-
-	# NOTE: no need to log, Line emits events already
-	IERC20(ASSET).approve(_line, _amount)
-	ISecuredLine(_line).increaseCredit(_id, _amount)
+	self._increase_credit(_line, _id, _amount)
 	return True
 
 @external
 def set_rates(_line: address, _id: bytes32, drate: uint128, frate: uint128) -> bool:
-	assert msg.sender == self.owner, "not owner"
-	# NOTE: no need to log, Line emits events already
-	ISecuredLine(_line).setRates(_id, drate, frate)
+	self._assert_owner()
+	self._set_rates(_line, _id, drate, frate)
 	return True
 
 @external
@@ -321,6 +367,38 @@ def collect_interest(_line: address, _id: bytes32) -> uint256:
 	"""
 	return self._reduce_credit(_line, _id, 0)[1]
 
+@external
+@nonreentrant("lock")
+def collect_interest_many(
+	_lines: DynArray[address, MAX_BATCH_SIZE],
+	_ids: DynArray[bytes32, MAX_BATCH_SIZE]
+) -> uint256:
+	"""
+	@notice
+		Anyone can claim interest from many active lines at once and start vesting profits into pool shares.
+		Profits are unlocked, booked and charged performance + collector fees once for the whole batch.
+	@dev
+		Positions without any interest to claim are skipped so keepers can submit stale batches
+	@param _lines	line of credit contracts to collect from
+	@param _ids		credit position on each line in `_lines` controlled by this pool
+	@return
+		Total amount of assets earned across all Debt DAO Line of Credit contracts
+	"""
+	assert len(_lines) == len(_ids) # dev: mismatched positions
+
+	total_interest: uint256 = 0
+	for i in range(MAX_BATCH_SIZE):
+		if i >= len(_lines):
+			break
+		total_interest += self._withdraw_from_line(_lines[i], _ids[i], 0)[1]
+
+	assert total_interest != 0 # dev: no interest to collect
+
+	self._update_shares(total_interest) # add to locked profits
+	self._take_performance_fee(total_interest)
+	self._settle_redemptions()
+
+	return total_interest
 
 @external
 @nonreentrant("lock")
@@ -340,19 +418,19 @@ def abort(_line: address, _id: bytes32) -> (uint256, uint256):
 	"""
 	@notice emergency cord to remove all avialable funds from a _line (deposit + interestRepaid)
 	"""
-	assert msg.sender == self.owner, "not owner"
+	self._assert_owner()
 	return self._reduce_credit(_line, _id, max_value(uint256))
 
 @external
 @nonreentrant("lock")
 def reduce_credit(_line: address, _id: bytes32, _withdraw_amount: uint256) -> (uint256, uint256):
-	assert msg.sender == self.owner, "not owner"
+	self._assert_owner()
 	return self._reduce_credit(_line, _id, _withdraw_amount)
 
 @external
 @nonreentrant("lock")
 def use_and_repay(_line: address, _repay_amount: uint256, _withdraw_amount: uint256) -> (uint256, uint256):
-	assert msg.sender == self.owner, "not owner"
+	self._assert_owner()
 
 	# Assume we are next lender in queue. 
 	# save id for later incase we repay full amount and stepQ
@@ -416,6 +494,9 @@ def impair(_line: address, _id: bytes32) -> (uint256, uint256):
 	# NOTE: no need to log, Line emits events already
 	ISecuredLine(_line).withdraw(_id, withdrawable)
 
+	# position stays listed while impairments[_line] tracks principal the borrower may still repay.
+	# reduce_credit removes it once all of it is recovered
+
 	log Impair(_line, _id, recovered, position.interestRepaid, fees_burned, pool_net_loss, position.principal)
 	
 	return (pool_net_loss, fees_burned)
@@ -425,17 +506,7 @@ def impair(_line: address, _id: bytes32) -> (uint256, uint256):
 @external
 @nonreentrant("lock")
 def invest_vault(_vault: address, _amount: uint256) -> uint256:
-	self._assert_owner_has_available_funds(_amount)
-
-	self.total_deployed += _amount
-	self.vault_investments[_vault] += _amount
-
-	# NOTE: Owner should check previewDeposit(`_amount`) expected vs `_amount` for slippage ?
-	IERC20(ASSET).approve(_vault, _amount)
-	shares: uint256 = IERC4626(_vault).deposit(_amount, self)
-
-	log InvestVault(_vault, _amount, shares) ## TODO shares
-	return shares
+	return self._invest_vault(_vault, _amount)
 
 
 @external
@@ -452,12 +523,38 @@ def divest_vault(_vault: address, _amount: uint256) -> bool:
 	if not is_loss:
 		# if not snitching, then only owner can call bc its part of their investment strategy
 		# otherwise if is_loss anyone can snitch to burn delegate fees and recoup pool losses
-		assert msg.sender == self.owner
+		self._assert_owner()
 
 	# TODO TEST check that investing, then partially divesting at a loss, then investing more, then divesting more at a profit and/or loss updates our pool share price appropriately
 
+	self._settle_redemptions()
 	return True
 
+### Batched Delegate operations
+
+@external
+@nonreentrant("lock")
+def multicall(_calls: DynArray[Bytes[MAX_MULTICALL_CALLDATA], MAX_BATCH_SIZE]) -> DynArray[Bytes[64], MAX_BATCH_SIZE]:
+	"""
+	@notice
+		Delegate can run a batch of portfolio operations in a single tx under one reentrancy lock.
+		e.g. weekly rebalance - reduce_credit on one line, increase_credit on another, invest leftovers in a vault
+	@dev
+		Vyper can't call back into its own dispatcher without re-entering the lock (or losing msg.sender)
+		so calldata is decoded here and routed to the same internal functions the external methods use.
+		Supports add_credit, increase_credit, set_rates, reduce_credit, invest_vault, divest_vault, unlock_profits
+	@param _calls	abi encoded calldata (selector + args) for each operation, executed in order
+	@return
+		abi encoded return data for each call in `_calls`
+	"""
+	self._assert_owner()
+
+	results: DynArray[Bytes[64], MAX_BATCH_SIZE] = []
+	for call in _calls:
+		results.append(self._dispatch_call(call))
+
+	return results
+
 
 @external
 def sweep(_token: address, _amount: uint256 = max_value(uint256)):
@@ -473,13 +570,13 @@ def sweep(_token: address, _amount: uint256 = max_value(uint256)):
 	@param _token The token to transfer out of this vault.
 	@param _amount The quantity or tokenId to transfer out.
 	"""
-	assert msg.sender == self.owner, "not owner"
+	self._assert_owner()
 
 	value: uint256 = _amount
 	if _token == ASSET:
 		# recover assets sent directly to pool
 		# Can't be used to steal what this pool is protecting
-		value = IERC20(ASSET).balanceOf(self) - (self.total_assets - self.total_deployed)
+		value = IERC20(ASSET).balanceOf(self) - (self.total_assets - self.total_deployed) - self._pending_flash_fees()
 	elif _token == self:
 		# recover shares sent directly to pool, minus fees held for owner.
 		value = self.balances[self] - self.accrued_fees - self.delegate_stake
@@ -494,7 +591,7 @@ def sweep(_token: address, _amount: uint256 = max_value(uint256)):
 
 @external
 def set_owner(new_owner: address) -> bool:
-	assert msg.sender == self.owner, "not owner"
+	self._assert_owner()
 	self.pending_owner = new_owner
 	log NewPendingOwner(new_owner)
 	return True
@@ -509,15 +606,28 @@ def accept_owner() -> bool:
 
 @external
 def set_min_deposit(new_min: uint256)  -> bool:
-	assert msg.sender == self.owner, "not owner"
+	self._assert_owner()
 	assert new_min != 0
 	self.min_deposit = new_min
 	log UpdateMinDeposit(new_min)
 	return True
 
+@external
+def set_redemption_queue(_queue: address):
+	"""
+	@notice set queue that pool redeems escrowed shares for whenever liquidity comes back. empty address to disable
+	@dev
+		Cant swap while current queue still has shares escrowed or their requests would never be filled.
+		Shares pool already redeemed are burned and their assets held by the old queue so it can still allocate and pay them out.
+	"""
+	self._assert_owner()
+	assert self.balances[self.redemption_queue] == 0 # dev: queue has pending redemptions
+	self.redemption_queue = _queue
+	log UpdateRedemptionQueue(_queue)
+
 @external
 def set_max_assets(new_max: uint256)  -> bool:
-	assert msg.sender == self.owner, "not owner"
+	self._assert_owner()
 	self.max_assets = new_max
 	log UpdateMaxAssets(new_max)
 	return True
@@ -525,63 +635,68 @@ def set_max_assets(new_max: uint256)  -> bool:
 
 ### Manage Pool Fees
 
-@internal
-def _assert_max_fee(_fee: uint16, _fee_type: FEE_TYPES):
-  assert msg.sender == self.owner, "not owner"
-  assert convert(_fee, uint256) <= FEE_COEFFICIENT, "bad performance _fee" # max 100% performance _fee
-  log FeeSet(_fee, convert(_fee_type, uint256))
-
 @external
 @nonreentrant("lock")
 def set_performance_fee(_fee: uint16) -> bool:
-  self._assert_max_fee(_fee, FEE_TYPES.PERFORMANCE)
-  self.fees.performance = _fee
-  return True
-
-@internal
-def _assert_pittance_fee(_fee: uint16, fee_type: FEE_TYPES):
-	assert msg.sender == self.owner, "not owner"
-	assert _fee <= MAX_PITTANCE_FEE, "bad pittance fee"
-	log FeeSet(_fee, convert(fee_type, uint256))
+	self._set_fee(_fee, FEE_TYPES.PERFORMANCE, FEE_COEFFICIENT)
+	return True
 
 @external
 @nonreentrant("lock")
 def set_flash_fee(_fee: uint16) -> bool:
-	self._assert_pittance_fee(_fee, FEE_TYPES.FLASH)
-	self.fees.flash = _fee
+	self._set_fee(_fee, FEE_TYPES.FLASH, convert(MAX_PITTANCE_FEE, uint256))
 	return True
 
 @external
 @nonreentrant("lock")
 def set_collector_fee(_fee: uint16) -> bool:
-	self._assert_pittance_fee(_fee, FEE_TYPES.COLLECTOR)
-	self.fees.collector = _fee
+	self._set_fee(_fee, FEE_TYPES.COLLECTOR, convert(MAX_PITTANCE_FEE, uint256))
 	return True
 
 @external
 @nonreentrant("lock")
 def set_deposit_fee(_fee: uint16) -> bool:
-	self._assert_pittance_fee(_fee, FEE_TYPES.DEPOSIT)
-	self.fees.deposit = _fee
+	self._set_fee(_fee, FEE_TYPES.DEPOSIT, convert(MAX_PITTANCE_FEE, uint256))
 	return True
 
 @external
 @nonreentrant("lock")
 def set_withdraw_fee(_fee: uint16) -> bool:
-	self._assert_pittance_fee(_fee, FEE_TYPES.WITHDRAW)
-	self.fees.withdraw = _fee
+	self._set_fee(_fee, FEE_TYPES.WITHDRAW, convert(MAX_PITTANCE_FEE, uint256))
 	return True
 
 @external
 @nonreentrant("lock")
 def set_referral_fee(_fee: uint16) -> bool:
-	self._assert_pittance_fee(_fee, FEE_TYPES.REFERRAL)
-	self.fees.referral = _fee
+	self._set_fee(_fee, FEE_TYPES.REFERRAL, convert(MAX_PITTANCE_FEE, uint256))
 	return True
 
+@internal
+def _set_fee(_fee: uint16, _fee_type: FEE_TYPES, _max_fee: uint256):
+	"""
+	@notice validate and update a single fee inside packed fees slot
+	@param _max_fee		FEE_COEFFICIENT (100%) for performance fee, MAX_PITTANCE_FEE for the rest
+	"""
+	self._assert_owner()
+	assert convert(_fee, uint256) <= _max_fee, "bad fee"
+	log FeeSet(_fee, convert(_fee_type, uint256))
+
+	# each fee is 16 bits in packed_fees, in FEE_TYPES order
+	offset: uint256 = 0
+	for i in range(6):
+		if convert(_fee_type, uint256) == 1 << i:
+			break
+		offset += 16
+	packed: uint256 = self.packed_fees
+	self.packed_fees = packed ^ ((((packed >> offset) & UINT16_MASK) ^ convert(_fee, uint256)) << offset)
+
+@internal
+def _assert_rev_recipient():
+	assert msg.sender == self.rev_recipient, "not rev_recipient"
+
 @external
 def set_rev_recipient(_new_recipient: address) -> bool:
-  assert msg.sender == self.rev_recipient, "not rev_recipient"
+  self._assert_rev_recipient()
   self.pending_rev_recipient = _new_recipient
   log NewPendingRevRecipient(_new_recipient)
   return True
@@ -610,7 +725,7 @@ def claim_rev(_token: address, _amount: uint256) -> bool:
 	@param _amount - amount of _token rev_recipient wants to claim
 	"""
 	assert _token == self, "non-revenue token"
-	assert msg.sender == self.rev_recipient, "not rev_recipient"
+	self._assert_rev_recipient()
 
 	claimed: uint256 = _amount
 	if _amount == max_value(uint256):
@@ -637,10 +752,10 @@ def set_vesting_rate(_vesting_rate: uint256):
 		Changes the locked profit _vesting_rate.
 	@param _vesting_rate The rate of _vesting_rate in percent per second scaled to 1e18.
 	"""
-	assert msg.sender == self.owner, "not owner"
+	self._assert_owner()
 	# Since "_vesting_rate" is of type uint256 it can never be less than zero
 	assert _vesting_rate <= VESTING_RATE_COEFFICIENT
-	self.vesting_rate = _vesting_rate
+	self.packed_vesting = self._pack_vesting(self._last_report(), _vesting_rate, self._pending_flash_fees())
 	log UpdateProfitVestingRate(_vesting_rate) 
 
 
@@ -669,45 +784,90 @@ def initiate_unstake(_shares: uint256) -> uint256:
 	"""
 	@notice
 		Starts qithdrawal process for delegate to Remove shares from first loss pool
-		Each unstake process is identified by the block that its timelock ends at
+		Each unstake process is identified by its position in the unstake queue
 	@dev we use shares instead of assets in case share price changes between initiation and unstaking
 	@param _shares The amount of pool shares to return to delegate.
 	@return
-		Block that owner can claim unstaked s hares
+		Queue position that owner can claim unstaked shares from after UNSTAKE_TIMELOCK
 	"""
 	assert _shares != 0 # dev: zero value
-	assert msg.sender == self.owner  # dev: not pool owner
+	self._assert_owner()
 	assert self.delegate_stake >= _shares # dev: not enough shares to unstake
-	
-	unlock_index: uint256 = block.timestamp + UNSTAKE_TIMELOCK
-	self.unstake_queue[unlock_index] = _shares
 
-	log InitiateUnstake(unlock_index, _shares)
-	return unlock_index
+	index: uint256 = self.unstake_tail
+	assert index - self.unstake_head < MAX_UNSTAKE_QUEUE # dev: unstake queue full
+
+	unlock_time: uint256 = block.timestamp + UNSTAKE_TIMELOCK
+	self.unstake_queue[index % MAX_UNSTAKE_QUEUE] = self._pack_unstake(unlock_time, _shares)
+	self.unstake_tail = index + 1
+
+	log InitiateUnstake(unlock_time, _shares)
+	return index
 
 @external
 @nonreentrant("lock")
 def unstake_shares(_index: uint256, _receiver: address):
 	"""
 	@notice
-		Removes shares from first loss pool of delegate stake 
-	@param _index The block timestamp that unstake can be withdrawn at
+		Removes shares from first loss pool of delegate stake
+	@param _index The unstake queue position returned from initiate_unstake
 	@param _receiver The address to send unstaked shares to
 	"""
-	assert _index < block.timestamp # dev: queue not ready
-	assert msg.sender == self.owner  # dev: not pool owner
+	self._assert_owner()
+	assert _index >= self.unstake_head and _index < self.unstake_tail # dev: index not in unstake queue
 
-	shares_unstaked: uint256 = self.unstake_queue[_index]
+	unlock_time: uint256 = 0
+	shares_unstaked: uint256 = 0
+	(unlock_time, shares_unstaked) = self._unpack_unstake(self.unstake_queue[_index % MAX_UNSTAKE_QUEUE])
 	assert shares_unstaked != 0 # dev: index not in unstake queue
-	# ensure stake hasnt been slashed since initiating unstake
-	assert self.delegate_stake >= shares_unstaked # dev: not enough shares to unstake
-	
-	self.unstake_queue[_index] = 0
-	self.delegate_stake -= shares_unstaked
+	assert unlock_time < block.timestamp # dev: queue not ready
 
-	self._transfer(self, _receiver, shares_unstaked)
-	
-	log UnstakeShares(_index, shares_unstaked)
+	self.unstake_queue[_index % MAX_UNSTAKE_QUEUE] = 0
+	if _index == self.unstake_head:
+		# free the slot for new unstakes. entries claimed out of order are skipped by unstake_matured
+		self.unstake_head = _index + 1
+	self._unstake(unlock_time, shares_unstaked, _receiver)
+
+@external
+@nonreentrant("lock")
+def unstake_matured(_max_entries: uint256, _receiver: address) -> uint256:
+	"""
+	@notice
+		Removes shares from first loss pool for every unstake past its timelock in a single tx
+	@dev
+		Settles from the head of the queue until it hits an unstake that is still locked.
+		Slots are cleared as they are settled so their storage is refunded.
+		Head always moves past entries already claimed with unstake_shares, even if nothing matured.
+	@param _max_entries	max number of queue entries to process (bounded by MAX_UNSTAKE_QUEUE)
+	@param _receiver	The address to send unstaked shares to
+	@return total shares unstaked
+	"""
+	self._assert_owner()
+
+	head: uint256 = self.unstake_head
+	tail: uint256 = self.unstake_tail
+	total_unstaked: uint256 = 0
+
+	for i in range(MAX_UNSTAKE_QUEUE):
+		if i >= _max_entries or head == tail:
+			break
+
+		packed_unstake: uint256 = self.unstake_queue[head % MAX_UNSTAKE_QUEUE]
+		# entry already claimed with unstake_shares. skip
+		if packed_unstake != 0:
+			unlock_time: uint256 = 0
+			shares_unstaked: uint256 = 0
+			(unlock_time, shares_unstaked) = self._unpack_unstake(packed_unstake)
+			if unlock_time >= block.timestamp:
+				break # everything behind this is locked too
+
+			self.unstake_queue[head % MAX_UNSTAKE_QUEUE] = 0
+			total_unstaked += self._unstake(unlock_time, shares_unstaked, _receiver)
+
+		head += 1
+
+	self.unstake_head = head
+	return total_unstaked
 
 
 
@@ -764,6 +924,59 @@ def mintWithReferral(_shares: uint256, _receiver: address, _referrer: address) -
 	self._deposit(assets, _shares, _receiver, _referrer)
 	return assets
 
+@external
+@nonreentrant("lock")
+def depositWithPermit(
+	_assets: uint256,
+	_receiver: address,
+	_deadline: uint256,
+	_signature: Bytes[65],
+	_referrer: address = empty(address)
+) -> uint256:
+	"""
+	@notice
+		Approve pool with an IERC2612 permit signed for ASSET and deposit in the same tx
+	@dev
+		update share price before taking action to prevent stale virtual price being exploited
+	@param _deadline	deadline signed in ASSET permit
+	@param _signature	owner signature of ASSET permit for `_assets` packed as r, s, v. see _permit_asset for supported tokens
+	@param _referrer	optional address to receive referral fees
+	@return - shares caller received for depositing `_assets` tokens
+	"""
+	self._permit_asset(_assets, _deadline, _signature)
+	self._unlock_profits()
+	return self._deposit(_assets, self._convert_to_shares(_assets), _receiver, _referrer)
+
+@external
+@nonreentrant("lock")
+def mintWithPermit(
+	_shares: uint256,
+	_receiver: address,
+	_max_assets: uint256,
+	_deadline: uint256,
+	_signature: Bytes[65],
+	_referrer: address = empty(address)
+) -> uint256:
+	"""
+	@notice
+		Approve pool with an IERC2612 permit signed for ASSET and mint in the same tx
+	@dev
+		update share price before taking action to prevent stale virtual price being exploited
+	@param _max_assets	amount signed in ASSET permit. Reverts if minting costs more assets than this
+	@param _deadline	deadline signed in ASSET permit
+	@param _signature	owner signature of ASSET permit for `_max_assets` packed as r, s, v. see _permit_asset for supported tokens
+	@param _referrer	optional address to receive referral fees
+	@return assets - amount of assets caller deposited to receive exactly `_shares` shares back
+	"""
+	self._permit_asset(_max_assets, _deadline, _signature)
+	self._unlock_profits()
+	# save original share price bc price potentially changes after minflation fees
+	# so `assets` return value is what user actually paid
+	assets: uint256 = self._convert_to_assets(_shares)
+	assert assets <= _max_assets # dev: mint costs more than permitted
+	self._deposit(assets, _shares, _receiver, _referrer)
+	return assets
+
 @external
 @nonreentrant("lock")
 def withdraw(
@@ -777,7 +990,7 @@ def withdraw(
 		@return - shares
 	"""
 	self._unlock_profits()
-	return self._withdraw(_assets, _owner, _receiver)
+	return self._withdraw(_assets, _owner, _receiver, self._virtual_price())
 
 @external
 @nonreentrant("lock")
@@ -788,7 +1001,8 @@ def redeem(_shares: uint256, _receiver: address, _owner: address) -> uint256:
 		@return - assets
 	"""
 	self._unlock_profits()
-	return self._redeem(_shares, _owner, _receiver)
+	self._assert_caller_has_approval(_owner, _shares)
+	return self._redeem(_shares, _owner, _receiver, self._virtual_price())
 
 ### ERC20 Functions
 
@@ -819,6 +1033,21 @@ def increaseAllowance(_spender: address, _amount: uint256) -> bool:
 ### Internal Functions 
 
 # transfer + approve vault shares
+@internal
+def _unstake(_unlock_time: uint256, _shares: uint256, _receiver: address) -> uint256:
+	"""
+	@notice send unstaked shares to _receiver
+	@dev	stake may have been slashed by impairments since initiating unstake.
+			Clamp to whats left so an oversized entry can still be cleared from the queue
+	@return shares actually unstaked
+	"""
+	shares: uint256 = min(_shares, self.delegate_stake)
+	self.delegate_stake -= shares
+	self._transfer(self, _receiver, shares)
+
+	log UnstakeShares(_unlock_time, shares)
+	return shares
+
 @internal
 def _approve(_owner: address, _spender: address, _amount: uint256) -> bool:
 	self.allowances[_owner][_spender] = _amount
@@ -934,7 +1163,142 @@ def _calc_and_mint_fee(
 	
 	return fees
 
-@internal 
+@internal
+def _add_credit_position(_line: address, _id: bytes32):
+	if self.credit_position_index[_line][_id] != 0:
+		return
+
+	count: uint256 = self.credit_position_count + 1
+	self.credit_positions[count] = CreditPosition({line: _line, id: _id})
+	self.credit_position_index[_line][_id] = count
+	self.credit_position_count = count
+
+@internal
+def _remove_credit_position(_line: address, _id: bytes32):
+	index: uint256 = self.credit_position_index[_line][_id]
+	if index == 0:
+		return
+
+	# move last position into removed slot
+	count: uint256 = self.credit_position_count
+	last: CreditPosition = self.credit_positions[count]
+	self.credit_positions[index] = last
+	self.credit_position_index[last.line][last.id] = index
+
+	self.credit_positions[count] = empty(CreditPosition)
+	self.credit_position_index[_line][_id] = 0
+	self.credit_position_count = count - 1
+
+@internal
+def _add_vault(_vault: address):
+	if self.vault_index[_vault] != 0:
+		return
+
+	count: uint256 = self.vault_count + 1
+	self.vaults[count] = _vault
+	self.vault_index[_vault] = count
+	self.vault_count = count
+
+@internal
+def _remove_vault(_vault: address):
+	index: uint256 = self.vault_index[_vault]
+	if index == 0:
+		return
+
+	# move last vault into removed slot
+	count: uint256 = self.vault_count
+	last: address = self.vaults[count]
+	self.vaults[index] = last
+	self.vault_index[last] = index
+
+	self.vaults[count] = empty(address)
+	self.vault_index[_vault] = 0
+	self.vault_count = count - 1
+
+@internal
+def _add_credit(_line: address, _drate: uint128, _frate: uint128, _amount: uint256) -> bytes32:
+	self._assert_owner_has_available_funds(_amount)
+	 # TODO rename to prevent delegate confusion btw this add_credit and accept_offer which also call SecuredLine.addCredit()
+	assert ISecuredLine(_line).borrower() != self
+
+	self.total_deployed += _amount
+
+	# NOTE: no need to log, Line emits events already
+	IERC20(ASSET).approve(_line, _amount)
+	id: bytes32 = ISecuredLine(_line).addCredit(_drate, _frate, _amount, ASSET, self)
+	self._add_credit_position(_line, id)
+	return id
+
+@internal
+def _increase_credit(_line: address, _id: bytes32, _amount: uint256):
+	self._assert_owner_has_available_funds(_amount)
+
+	self.total_deployed += _amount
+
+	# NOTE: no need to log, Line emits events already
+	IERC20(ASSET).approve(_line, _amount)
+	ISecuredLine(_line).increaseCredit(_id, _amount)
+
+@internal
+def _set_rates(_line: address, _id: bytes32, drate: uint128, frate: uint128):
+	# NOTE: no need to log, Line emits events already
+	ISecuredLine(_line).setRates(_id, drate, frate)
+
+@internal
+def _invest_vault(_vault: address, _amount: uint256) -> uint256:
+	self._assert_owner_has_available_funds(_amount)
+
+	self.total_deployed += _amount
+	self.vault_investments[_vault] += _amount
+	self._add_vault(_vault)
+
+	# NOTE: Owner should check previewDeposit(`_amount`) expected vs `_amount` for slippage ?
+	IERC20(ASSET).approve(_vault, _amount)
+	shares: uint256 = IERC4626(_vault).deposit(_amount, self)
+
+	log InvestVault(_vault, _amount, shares) ## TODO shares
+	return shares
+
+@internal
+def _dispatch_call(_call: Bytes[MAX_MULTICALL_CALLDATA]) -> Bytes[64]:
+	"""
+	@notice routes a single multicall() item to the internal function for its selector
+	@dev caller MUST check msg.sender is owner
+	@return abi encoded return value of the equivalent external function
+	"""
+	selector: uint256 = convert(slice(_call, 0, 4), uint256)
+
+	# every supported function takes an address and up to 3 static args so all items decode the same way.
+	# args an item doesnt have are padded with 0. _abi_decode and convert still revert on out of range values
+	target: address = empty(address)
+	arg1: uint256 = 0
+	arg2: uint256 = 0
+	arg3: uint256 = 0
+	target, arg1, arg2, arg3 = _abi_decode(
+		slice(concat(slice(_call, 4, len(_call) - 4), empty(bytes32), empty(bytes32), empty(bytes32), empty(bytes32)), 0, 128),
+		(address, uint256, uint256, uint256)
+	)
+
+	if selector == ADD_CREDIT_SELECTOR:
+		return _abi_encode(self._add_credit(target, convert(arg1, uint128), convert(arg2, uint128), arg3))
+	elif selector == INCREASE_CREDIT_SELECTOR:
+		self._increase_credit(target, convert(arg1, bytes32), arg2)
+	elif selector == SET_RATES_SELECTOR:
+		self._set_rates(target, convert(arg1, bytes32), convert(arg2, uint128), convert(arg3, uint128))
+	elif selector == REDUCE_CREDIT_SELECTOR:
+		return _abi_encode(self._reduce_credit(target, convert(arg1, bytes32), arg2))
+	elif selector == INVEST_VAULT_SELECTOR:
+		return _abi_encode(self._invest_vault(target, arg1))
+	elif selector == DIVEST_VAULT_SELECTOR:
+		self._divest_vault(target, arg1)
+	elif selector == UNLOCK_PROFITS_SELECTOR:
+		return _abi_encode(self._unlock_profits())
+	else:
+		raise "bad multicall selector"
+
+	return _abi_encode(True)
+
+@internal
 def _divest_vault(_vault: address, _amount: uint256) -> (bool, uint256):
 	"""
 	@notice
@@ -979,11 +1343,6 @@ def _divest_vault(_vault: address, _amount: uint256) -> (bool, uint256):
 	# MUST ONLY be true when burning last share with outstanding principal left
 	is_loss = curr_shares == burned_shares and principal > amount
 
-	log named_uint("burned_shares", burned_shares)
-	log named_uint("curr_shares", curr_shares)
-	log named_uint("initial principal", principal)
-	log named_uint("is_loss", convert(is_loss, uint256))
-
 	if is_loss:
 		net = principal - amount
 		self.vault_investments[_vault] = 0 # erase debt so no replay attacks
@@ -1002,6 +1361,9 @@ def _divest_vault(_vault: address, _amount: uint256) -> (bool, uint256):
 		self.total_deployed -= amount
 		self.vault_investments[_vault] -= amount
 
+	if curr_shares == burned_shares:
+		self._remove_vault(_vault)
+
 	log DivestVault(_vault, amount, burned_shares, net, is_loss)
 
 	return (is_loss, net)
@@ -1013,6 +1375,30 @@ def _reduce_credit(_line: address, _id: bytes32, _amount: uint256) -> (uint256,
 	@notice		withdraw deposit and/or interest from an external position
 	@return 	(initial principal withdrawn, interest earned)
 	"""
+	deposit: uint256 = 0
+	interest: uint256 = 0
+	(deposit, interest) = self._withdraw_from_line(_line, _id, _amount)
+	assert deposit + interest > 0 # TODO custom error
+
+	# only withdrawing principal can close a position
+	if deposit != 0 and ISecuredLine(_line).credits(_id).deposit == 0:
+		self._remove_credit_position(_line, _id)
+
+	if interest != 0:
+		self._update_shares(interest) # add to locked profits
+		# TODO TEST does taking fees before/after updating shares affect RDT ???
+		fees: uint256 = self._take_performance_fee(interest)
+
+	self._settle_redemptions()
+	return (deposit, interest)
+
+@internal
+def _withdraw_from_line(_line: address, _id: bytes32, _amount: uint256) -> (uint256, uint256):
+	"""
+	@notice		withdraw deposit and/or interest from an external position without booking interest as profit
+	@dev		caller MUST account for returned interest with _update_shares + _take_performance_fee
+	@return 	(initial principal withdrawn, interest earned). (0, 0) if nothing could be withdrawn
+	"""
 	withdrawable: uint256 = _amount
 	interest: uint256 = 0
 	deposit: uint256 = 0
@@ -1026,7 +1412,8 @@ def _reduce_credit(_line: address, _id: bytes32, _amount: uint256) -> (uint256,
 		# MAX is shorthand for take all liquid assets
 		withdrawable = deposit + interest
 
-	assert withdrawable > 0 # TODO custom error
+	if withdrawable == 0:
+		return (0, 0)
 
 	# set how much deposit vs interest we are collecting
 	# NOTE: MUST come after `_amount` shorthand assignments
@@ -1045,12 +1432,6 @@ def _reduce_credit(_line: address, _id: bytes32, _amount: uint256) -> (uint256,
 		if self.impairments[_line] != 0:
 			self.impairments[_line] -= deposit
 
-
-	if interest != 0:
-		self._update_shares(interest) # add to locked profits
-		# TODO TEST does taking fees before/after updating shares affect RDT ???
-		fees: uint256 = self._take_performance_fee(interest)
-
 	# NOTE: no need to log, Line emits events already
 	ISecuredLine(_line).withdraw(_id, withdrawable)
 
@@ -1064,20 +1445,45 @@ def _take_performance_fee(interest_earned: uint256) -> uint256:
 	@param interest_earned - total amount of assets claimed as interest payments from Debt DAO Line of Credit contracts
 	@return total amount of shares taken as fees
 	"""
-	performance_fee: uint256 = self._calc_and_mint_fee(self, self.owner, self._convert_to_shares(interest_earned), self.fees.performance, FEE_TYPES.PERFORMANCE)
+	fees: Fees = self._fees()
+	# price before minting fees so performance + collector fees are valued the same
+	price: uint256 = self._virtual_price()
+	performance_fee: uint256 = self._calc_and_mint_fee(self, self.owner, self._to_shares(interest_earned, price), fees.performance, FEE_TYPES.PERFORMANCE)
 
 	# NOTE: only _calc not _mint_and_calc so caller gets collector fees in raw asset for easier MEV
 	# calc fee on assets not shares so mintflation doesnt affect collector's payout
-	collector_assets: uint256 = self._calc_fee(interest_earned, self.fees.collector)
+	collector_assets: uint256 = self._calc_fee(interest_earned, fees.collector)
 	if (collector_assets != 0 and msg.sender != self.owner): # lazy eval saves SLOAD
 		self.total_assets -= collector_assets
 		self._erc20_safe_transfer(ASSET, msg.sender, collector_assets)
 		log RevenueGenerated(self, ASSET, collector_assets, interest_earned, convert(FEE_TYPES.COLLECTOR, uint256), msg.sender)
-		return performance_fee + self._convert_to_shares(collector_assets)
+		return performance_fee + self._to_shares(collector_assets, price)
 	
 	return performance_fee
 
 
+@internal
+def _permit_asset(_amount: uint256, _deadline: uint256, _signature: Bytes[65]):
+	"""
+	@notice approve pool to pull `_amount` of ASSET from msg.sender using their IERC2612 permit signature
+	@dev
+		permit signatures are public once in the mempool and anyone can submit them first.
+		Result is ignored so that doesnt grief the deposit. Deposit falls back to any allowance
+		msg.sender already gave the pool and transferFrom reverts if there is none.
+		Only supports ASSETs with the packed bytes signature permit this pool uses itself.
+		Standard v, r, s permit(address,address,uint256,uint256,uint8,bytes32,bytes32) tokens fail silently
+		here so depositors must approve() ASSET and call deposit/mint instead.
+	"""
+	# result intentionally unused (see above). vyper requires raw_call results to be assigned
+	permitted: bool = raw_call(
+		ASSET,
+		_abi_encode(
+			msg.sender, self, _amount, _deadline, _signature,
+			method_id=method_id("permit(address,address,uint256,uint256,bytes)")
+		),
+		revert_on_failure=False
+	)
+
 @internal
 def _deposit(
 	_assets: uint256,
@@ -1095,8 +1501,9 @@ def _deposit(
 	assert self.total_assets + _assets <= self.max_assets # dev: Pool max reached
 	assert _receiver != empty(address)
 
+	fees: Fees = self._fees()
 	# call even if fees = 0 to log revenue for prod analytics
-	self._calc_and_mint_fee(self, self.owner, _shares, self.fees.deposit, FEE_TYPES.DEPOSIT)
+	self._calc_and_mint_fee(self, self.owner, _shares, fees.deposit, FEE_TYPES.DEPOSIT)
 
 	# dont mint referral fees if depositor isnt being referred by 3rd party
 	shares_referred: uint256 = 0
@@ -1104,7 +1511,7 @@ def _deposit(
 		shares_referred = _shares
 
 	# call even if fees = 0 to log revenue for prod analytics
-	self._calc_and_mint_fee(self, _referrer, shares_referred, self.fees.referral, FEE_TYPES.REFERRAL)
+	self._calc_and_mint_fee(self, _referrer, shares_referred, fees.referral, FEE_TYPES.REFERRAL)
 
 	# TODO TEST how deposit/refer fee inflation affects the _shares/asssets that they are *supposed* to lose
 
@@ -1124,21 +1531,24 @@ def _deposit(
 def _withdraw(
 	_assets: uint256,
 	_owner: address,
-	_receiver: address
+	_receiver: address,
+	_price: uint256
 ) -> uint256:
 	"""
 	@dev - priviliged internal function. Run price updates before calling to prevent stale virtual price being exploited.
+	@param _price - share price snapshot taken after price updates
 	"""
 	# checks in _burn_and_withdraw
 
 	# mintflation fees adversly affects pool but not withdrawer who should be the one penalized.
 	# make them burn extra _shares instead and keep assets constant.
-	shares: uint256 = self._convert_to_shares(_assets)
-	withdraw_fee: uint256 = self._calc_fee(shares, self.fees.withdraw)
+	shares: uint256 = self._to_shares(_assets, _price)
+	withdraw_fee: uint256 = self._calc_fee(shares, self._fees().withdraw)
 	log RevenueGenerated(_owner, self, withdraw_fee, shares, convert(FEE_TYPES.WITHDRAW, uint256), self)
 
 	# take additional shares from withdrawer as fee to
 	burned_shares: uint256 = shares + withdraw_fee
+	self._assert_caller_has_approval(_owner, burned_shares)
 	self._burn_and_withdraw(burned_shares, _assets, _owner, _receiver)
 
 	return burned_shares
@@ -1147,19 +1557,23 @@ def _withdraw(
 def _redeem(
 	_shares: uint256,
 	_owner: address,
-	_receiver: address
+	_receiver: address,
+	_price: uint256
 ) -> uint256:
 	"""
 	@notice
 		Burns a specific amount of shares reducing supply to receive assets back. 
 		Takes withdraw fee from assets received back increasing share price.
-	@dev - priviliged internal function. Should run price updates before calculating _assets/_shares params
+	@dev
+		priviliged internal function. Should run price updates before calculating _assets/_shares params
+		Caller MUST check msg.sender is approved to spend _owner's _shares
+	@param _price - share price snapshot taken after price updates
 	"""
-	withdraw_fee: uint256 = self._calc_fee(_shares, self.fees.withdraw)
+	withdraw_fee: uint256 = self._calc_fee(_shares, self._fees().withdraw)
 	log RevenueGenerated(_owner, self, withdraw_fee, _shares, convert(FEE_TYPES.WITHDRAW, uint256), self)
 
 	# receive less assets than _shares bc of withdraw fee
-	assets_minus_fees: uint256 = self._convert_to_assets(_shares) - self._convert_to_assets(withdraw_fee)
+	assets_minus_fees: uint256 = self._to_assets(_shares, _price) - self._to_assets(withdraw_fee, _price)
 
 	self._burn_and_withdraw(_shares, assets_minus_fees, _owner, _receiver)
 
@@ -1173,7 +1587,6 @@ def _burn_and_withdraw(_shares: uint256, _assets: uint256, _owner: address, _rec
 	assert _assets <= self._max_liquid_assets() 	# dev: insufficient liquidity
 	remaining_assets: uint256 = self.total_assets - _assets	# total must be >= max_liquid
 	assert remaining_assets == 0 or remaining_assets >= self.min_deposit # dev: Pool min reached
-	self._assert_caller_has_approval(_owner, _shares)
 
 	# remove _assets from pool
 	self.total_assets -= _assets		
@@ -1185,6 +1598,29 @@ def _burn_and_withdraw(_shares: uint256, _assets: uint256, _owner: address, _rec
 	# for testing - log price change after deposit and fee inflation
 	# log TrackSharePrice((_assets * PRICE_DECIMALS) / _shares, self._virtual_price(), self._virtual_apr()) # log price/apr
 
+@internal
+def _settle_redemptions():
+	"""
+	@notice
+		Redeem shares escrowed in redemption_queue with liquidity that just came back to pool.
+		Assets go to queue which pays out requests FIFO.
+	@dev
+		Skips instead of reverting so settling never blocks the action that brought liquidity back
+	"""
+	queue: address = self.redemption_queue
+	if queue == empty(address):
+		return
+	price: uint256 = self._virtual_price()
+	# remaining assets must stay above min_deposit like any withdraw
+	liquid: uint256 = self._max_liquid_assets()
+	if self.total_assets - liquid < self.min_deposit:
+		liquid = self.total_assets - min(self.total_assets, self.min_deposit)
+	shares: uint256 = min(self.balances[queue], self._to_shares(liquid, price))
+	if shares == 0:
+		return
+	# no approval needed, queue is the owner
+	self._redeem(shares, queue, queue, price)
+
 @internal
 def _update_shares(_assets: uint256, _impair: bool = False) -> (uint256, uint256):
 	"""
@@ -1206,13 +1642,14 @@ def _update_shares(_assets: uint256, _impair: bool = False) -> (uint256, uint256
 	
 	# If available, take performance fee from delegate
 	stake_to_burn: uint256 = self.delegate_stake + self.accrued_fees
-	total_to_burn: uint256 = self._convert_to_shares(_assets)
+	price: uint256 = self._virtual_price()
+	total_to_burn: uint256 = self._to_shares(_assets, price)
 
 	# cap fees burned to actual amount being burned
 	if stake_to_burn > total_to_burn:
 		stake_to_burn = total_to_burn
 	# NOTE: set after updating stake_to_burn
-	burned_assets: uint256 = self._convert_to_assets(stake_to_burn)
+	burned_assets: uint256 = self._to_assets(stake_to_burn, price)
 
 	# Realize notional pool loss. Reduce share price.
 	# NOTE: must reduce AFTER converting amounts to burn from owner/pool
@@ -1220,19 +1657,15 @@ def _update_shares(_assets: uint256, _impair: bool = False) -> (uint256, uint256
 
 	# burn owner fees to cover losses
 	if stake_to_burn > self.accrued_fees:
-		self.accrued_fees = 0
+		# fees go first, rest comes out of stake
 		self.delegate_stake -= stake_to_burn - self.accrued_fees
+		self.accrued_fees = 0
 	else:
 		self.accrued_fees -= stake_to_burn
 
 	self._burn(self, stake_to_burn)
 	pool_assets_lost: uint256 = _assets - burned_assets
 
-	log named_uint("fees_shares_burn", stake_to_burn)
-	log named_uint("fee_assets_burned", burned_assets)
-	log named_uint("total_to_burn", total_to_burn)
-	log named_uint("pool_assets_lost", pool_assets_lost)
-
 	# TODO TEST feels like theres a bug here. Whats the diff if we do or dont reduce locked_profit?
 	# Is it an accounting error if we remove assets from total but not profit?
 	# Share price will be the same (assets/supply) regardless of change in locked profit (but APR is diff)
@@ -1255,14 +1688,87 @@ def _update_shares(_assets: uint256, _impair: bool = False) -> (uint256, uint256
 def _unlock_profits() -> uint256:
 	locked_profit: uint256 = self._calc_locked_profit()
 	vested_profits: uint256 = self.locked_profits - locked_profit
+	vesting_rate: uint256 = self._vesting_rate()
 	
 	self.locked_profits -= vested_profits
-	self.last_report = block.timestamp
+	# lock flash fees earned since last update same as _update_shares would have
+	flash_fees: uint256 = self._pending_flash_fees()
+	if flash_fees != 0:
+		self.total_assets += flash_fees
+		self.locked_profits += flash_fees
+		locked_profit += flash_fees
+
+	self.packed_vesting = self._pack_vesting(block.timestamp, vesting_rate, 0)
 
-	log UnlockProfits(vested_profits, locked_profit, self.vesting_rate)
+	log UnlockProfits(vested_profits, locked_profit, vesting_rate)
 
 	return vested_profits
 
+### Packed Storage
+
+@pure
+@internal
+def _pack_fees(_fees: Fees) -> uint256:
+	return (
+		convert(_fees.performance, uint256)
+		| (convert(_fees.deposit, uint256) << 16)
+		| (convert(_fees.withdraw, uint256) << 32)
+		| (convert(_fees.flash, uint256) << 48)
+		| (convert(_fees.collector, uint256) << 64)
+		| (convert(_fees.referral, uint256) << 80)
+	)
+
+@pure
+@internal
+def _unpack_fees(_packed_fees: uint256) -> Fees:
+	return Fees({
+		performance: convert(_packed_fees & UINT16_MASK, uint16),
+		deposit: convert((_packed_fees >> 16) & UINT16_MASK, uint16),
+		withdraw: convert((_packed_fees >> 32) & UINT16_MASK, uint16),
+		flash: convert((_packed_fees >> 48) & UINT16_MASK, uint16),
+		collector: convert((_packed_fees >> 64) & UINT16_MASK, uint16),
+		referral: convert((_packed_fees >> 80) & UINT16_MASK, uint16),
+	})
+
+@view
+@internal
+def _fees() -> Fees:
+	return self._unpack_fees(self.packed_fees)
+
+@pure
+@internal
+def _pack_vesting(_last_report: uint256, _vesting_rate: uint256, _flash_fees: uint256) -> uint256:
+	# vesting_rate <= VESTING_RATE_COEFFICIENT and last_report is a timestamp so both always fit in 64 bits
+	assert _flash_fees <= UINT128_MASK # dev: too many pending flash fees
+	return _last_report | (_vesting_rate << 64) | (_flash_fees << 128)
+
+@view
+@internal
+def _last_report() -> uint256:
+	return self.packed_vesting & UINT64_MASK
+
+@view
+@internal
+def _vesting_rate() -> uint256:
+	return (self.packed_vesting >> 64) & UINT64_MASK
+
+@view
+@internal
+def _pending_flash_fees() -> uint256:
+	return self.packed_vesting >> 128
+
+@pure
+@internal
+def _pack_unstake(_unlock_time: uint256, _shares: uint256) -> uint256:
+	# unlock_time is a timestamp so always fits in 64 bits
+	assert _shares <= UINT192_MASK # dev: too many shares to unstake
+	return _shares | (_unlock_time << 192)
+
+@pure
+@internal
+def _unpack_unstake(_packed_unstake: uint256) -> (uint256, uint256):
+	return (_packed_unstake >> 192, _packed_unstake & UINT192_MASK)
+
 ##############################
 ##############################
 ### Conversions w/ Decimals
@@ -1286,6 +1792,20 @@ def _convert_to_shares(_assets: uint256) -> uint256:
 def _convert_to_assets(_shares: uint256) -> uint256:
 	return (_shares * self._virtual_price() / PRICE_DECIMALS)
 
+# conversions against a price snapshot so one user action only computes _virtual_price once
+
+@internal
+@pure
+def _to_shares(_assets: uint256, _price: uint256) -> uint256:
+	if _price == 0: # prevent div by 0
+		return 0
+	return (_assets * PRICE_DECIMALS) / _price # max() in _virtual_price prevents div by 0
+
+@internal
+@pure
+def _to_assets(_shares: uint256, _price: uint256) -> uint256:
+	return (_shares * _price / PRICE_DECIMALS)
+
 @view
 @internal
 def _virtual_price() -> uint256:
@@ -1317,14 +1837,15 @@ def _calc_locked_profit() -> uint256:
 	"""
 	@notice
 		Gets the amount of self.locked_profit is actually locked
-		after accounting for tokens vested since self.last_report
+		after accounting for tokens vested since last_report
 	@dev
 		_locked_profit is functionally totally separate from _virtual_price
 	@return
 		# of assets that are currently locked.
 		If 0 then all of self.locked_profits are available to vest 
 	"""
-	pct_profit_locked: uint256 = (block.timestamp - self.last_report) * self.vesting_rate
+	packed_vesting: uint256 = self.packed_vesting
+	pct_profit_locked: uint256 = (block.timestamp - (packed_vesting & UINT64_MASK)) * ((packed_vesting >> 64) & UINT64_MASK)
 
 	if(pct_profit_locked < VESTING_RATE_COEFFICIENT):
 		locked_profit: uint256 = self.locked_profits
@@ -1351,28 +1872,6 @@ def _max_liquid_assets() -> uint256:
 def _get_pool_name(_name: String[34]) -> String[50]:
 	return concat(CONTRACT_NAME, ' - ', _name)
 
-@pure
-@internal
-def _get_pool_decimals(_token: address) -> uint8:
-	"""	
-	@notice
-		Gets the decimals for the underlying pool token so we can duplicate it according to 4626 standard
-	@param _token
-		Pool's asset to mimic decimals for pool's token
-	"""
-	asset_decimals: Bytes[32] = b""
-	asset_decimals = raw_call(
-		_token,
-		method_id("decimals()"),
-		max_outsize=32, is_static_call=True, revert_on_failure=True
-	)
-
-	if convert(asset_decimals, uint256) == 0:
-		return 18
-	else:
-		 return convert(asset_decimals, uint8)
-
-
 # 	         IERC 3156 Flash Loan functions
 # 
 #                    .-~*~--,.   .-.
@@ -1415,20 +1914,21 @@ def maxFlashLoan(_token: address) -> uint256:
 
 @view
 @internal
-def _calc_flash_fee(_token: address, _amount: uint256) -> uint256:
+def _calc_flash_fee(_amount: uint256, _liquid_assets: uint256) -> uint256:
 	"""
 	@notice
 		Slight wrapper around _calc_fee to account for liquid assets that can be lent
 	@dev
 		MUST manually emit RevenueGenerated event when flash fee is paid
+	@param _liquid_assets - snapshot of _max_liquid_assets()
 	"""
-	return self._calc_fee(min(_amount, self._max_liquid_assets()), self.fees.flash)
+	return self._calc_fee(min(_amount, _liquid_assets), self._fees().flash)
 
 @view
 @external
 def flashFee(_token: address, _amount: uint256) -> uint256:
 	assert _token == ASSET
-	return self._calc_flash_fee(_token, _amount)
+	return self._calc_flash_fee(_amount, self._max_liquid_assets())
 
 @external
 @nonreentrant("lock")
@@ -1438,12 +1938,13 @@ def flashLoan(
 	amount: uint256,
 	data: Bytes[25000]
 ) -> bool:
-	assert amount <= self._max_liquid_assets()
+	liquid_assets: uint256 = self._max_liquid_assets()
+	assert amount <= liquid_assets
 
 	# give them the flashloan
 	self._erc20_safe_transfer(ASSET, msg.sender, amount)
 
-	fee: uint256 = self._calc_flash_fee(_token, amount)
+	fee: uint256 = self._calc_flash_fee(amount, liquid_assets)
 	log RevenueGenerated(msg.sender, ASSET, fee, amount, convert(FEE_TYPES.FLASH, uint256), self)
 
 	# ensure they can receive flash loan and are ERC3156 compatible
@@ -1455,7 +1956,9 @@ def flashLoan(
 	# TODO _erc20_safe_transfer_from
 	IERC20(ASSET).transferFrom(msg.sender, self, amount + fee)
 
-	self._update_shares(fee)
+	# fee would be fully locked until the next update anyway so just add to pending fees
+	# instead of updating share price. reverts if pending fees overflow their 128 bits.
+	self.packed_vesting += fee << 128
 
 	return True
 
@@ -1588,7 +2091,8 @@ def allowance(owner: address, spender: address) -> uint256:
 @view
 @external
 def totalAssets() -> uint256:
-	return self.total_assets
+	# include flash fees that get added on next accounting update
+	return self.total_assets + self._pending_flash_fees()
 
 @view
 @external
@@ -1638,7 +2142,7 @@ def maxWithdraw(_owner: address) -> uint256:
 	"""
 		remove shares
 	"""
-	return max(
+	return min(
 		self._convert_to_assets(self.balances[_owner]),
 		self._max_liquid_assets()
 	)
@@ -1650,7 +2154,7 @@ def maxRedeem(_owner: address) -> uint256:
 	"""
 		remove assets
 	"""
-	return max(
+	return min(
 		self.balances[_owner],
 		self._convert_to_shares(self._max_liquid_assets())
 	)
@@ -1662,7 +2166,7 @@ def previewDeposit(_assets: uint256) -> uint256:
 	@notice		Returns max amount that can be deposited which is min(maxDeposit, userRequested)
 				So if assets > maxDeposit then it returns maxDeposit
 				
-	@dev 		INCLUSIVE of self.fees.deposit (should be same as without deposit fees bc of mintflation)
+	@dev 		INCLUSIVE of fees.deposit (should be same as without deposit fees bc of mintflation)
 				TODO? > make INCLUSIVE of self.PRICE_DECIMALS to prevent total_assets overflowing on price calculations???
 	@return 	shares returned when minting _assets
 	"""
@@ -1682,7 +2186,7 @@ def previewMint(_shares: uint256) -> uint256:
 	@notice		Returns max amount that can be deposited which is min(maxDeposit, userRequested)
 				So if assets > maxDeposit then it returns maxDeposit
 				
-	@dev 		INCLUSIVE of self.fees.deposit (should be same as without deposit fees bc of mintflation)
+	@dev 		INCLUSIVE of fees.deposit (should be same as without deposit fees bc of mintflation)
 				TODO? > make INCLUSIVE of self.PRICE_DECIMALS to prevent total_assets overflowing on price calculations???
 	@return 	assets required to mint _shares
 	"""
@@ -1705,8 +2209,9 @@ def previewWithdraw(_assets: uint256) -> uint256:
 	# TODO need if statement if share price is over/under 1. need to use total_assets vs total_supply
 	# e.g. if pool.price() < PRICE_DECIMALS: (max_value(uint256) - self.total_assets) else: (max_value(uint256) - self.total_supply)
 	# TODO include withdraw fees to assets 
-	shares: uint256 = self._convert_to_shares(_assets)
-	return shares + self._convert_to_shares(self._calc_fee(shares, self.fees.withdraw))
+	price: uint256 = self._virtual_price()
+	shares: uint256 = self._to_shares(_assets, price)
+	return shares + self._to_shares(self._calc_fee(shares, self._fees().withdraw), price)
 
 
 @view
@@ -1719,11 +2224,41 @@ def previewRedeem(_shares: uint256) -> uint256:
 	# TODO need if statement if share price is over/under 1. need to use total_assets vs total_supply
 	# e.g. if pool.price() < PRICE_DECIMALS: return self._convert_to_assets(max_redeemabl else: return self._convert_to_assets(max_redeemabl
 	# TODO FIX withdraw fees
-	return self._convert_to_assets(_shares) - self._convert_to_assets(self._calc_fee(_shares, self.fees.withdraw))
+	price: uint256 = self._virtual_price()
+	return self._to_assets(_shares, price) - self._to_assets(self._calc_fee(_shares, self._fees().withdraw), price)
 
 
 ### Pool view
 
+@view
+@external
+def fees() -> Fees:
+	return self._fees()
+
+@view
+@external
+def last_report() -> uint256:
+	"""
+	@notice block.timestamp of last report
+	"""
+	return self._last_report()
+
+@view
+@external
+def vesting_rate() -> uint256:
+	"""
+	@notice The rate of degradation in percent per second scaled to 1e18
+	"""
+	return self._vesting_rate()
+
+@view
+@external
+def pending_flash_fees() -> uint256:
+	"""
+	@notice flash loan fees that will be locked as profit on next accounting update
+	"""
+	return self._pending_flash_fees()
+
 @view
 @external
 def free_profit() -> uint256:
@@ -1762,6 +2297,40 @@ def vault_assets() -> uint256:
 	return self._vault_assets()
 
 
+@view
+@external
+def get_credit_positions(_start: uint256, _count: uint256) -> DynArray[CreditPosition, MAX_BATCH_SIZE]:
+	"""
+	@notice page through open credit positions held by pool. includes impaired positions, see impairments()
+	@param _start	1-indexed position in set to start from
+	@param _count	max positions to return. capped at MAX_BATCH_SIZE
+	"""
+	positions: DynArray[CreditPosition, MAX_BATCH_SIZE] = []
+	total: uint256 = self.credit_position_count
+	for i in range(MAX_BATCH_SIZE):
+		if i >= _count or _start + i > total:
+			break
+		positions.append(self.credit_positions[_start + i])
+
+	return positions
+
+@view
+@external
+def get_vaults(_start: uint256, _count: uint256) -> DynArray[address, MAX_BATCH_SIZE]:
+	"""
+	@notice page through 4626 vaults pool is invested in
+	@param _start	1-indexed position in set to start from
+	@param _count	max vaults to return. capped at MAX_BATCH_SIZE
+	"""
+	vaults: DynArray[address, MAX_BATCH_SIZE] = []
+	total: uint256 = self.vault_count
+	for i in range(MAX_BATCH_SIZE):
+		if i >= _count or _start + i > total:
+			break
+		vaults.append(self.vaults[_start + i])
+
+	return vaults
+
 @view
 @external
 def liquid_assets() -> uint256:
@@ -1842,6 +2411,10 @@ interface IERC4626R:
 	def depositWithReferral(assets: uint256, receiver: address, referrer: address)  -> uint256: nonpayable
 	def mintWithReferral(shares: uint256, receiver: address, referrer: address) -> uint256: nonpayable
 
+interface IERC4626P:
+	def depositWithPermit(assets: uint256, receiver: address, deadline: uint256, signature: Bytes[65], referrer: address)  -> uint256: nonpayable
+	def mintWithPermit(shares: uint256, receiver: address, max_assets: uint256, deadline: uint256, signature: Bytes[65], referrer: address) -> uint256: nonpayable
+
 # Flashloans
 interface IERC3156:
 	# /**
@@ -1904,6 +2477,10 @@ interface IRevenueGenerator:
 
 
 # (uint256, uint256, uint256, uint256, uint8, address, address)
+struct CreditPosition:
+	line: address
+	id: bytes32
+
 struct Position:
 	deposit: uint256
 	principal: uint256
@@ -2043,6 +2620,9 @@ event UpdateMinDeposit:
 event UpdateMaxAssets:
 	maximum: uint256 # New active deposit limit
 
+event UpdateRedemptionQueue:
+	queue: indexed(address)
+
 event Sweep:
 	token: indexed(address) # New active deposit limit
 	amount: uint256 # New active deposit limit
@@ -25,6 +25,18 @@ struct Fees: # from PoolDelegate.vy
 	collector: uint16
 	referral: uint16
 
+struct PoolConfig: # deploy_pool() params
+    owner: address
+    token: address
+    name: String[50]
+    symbol: String[18]
+    performance_fee: uint16
+    deposit_fee: uint16
+    initial_deposit: uint256
+
+# max pools that can be deployed in a single deploy_pools() call
+MAX_POOL_DEPLOYS: constant(uint256) = 20
+
 # default Debt DAO Pool init config
 DEFAULT_FLASH_FEE: constant(uint16) = 5     # 5 bps. 0.05% per flashloan. Similar Aave rate.
 DEFAULT_REFERRAL_FEE: constant(uint16) = 20 # 20 bps, 0.2% of deposit goes to incentivizing chicken bond liquidity
@@ -43,6 +55,52 @@ def __init__(pool_impl: address):
 @external
 def deploy_pool(_owner: address, _token: address, _name: String[50], _symbol: String[18],
                 _performance_fee: uint16, _deposit_fee: uint16, _initial_deposit: uint256) -> address:
+    return self._deploy_pool(_owner, _token, _name, _symbol, _performance_fee, _deposit_fee, _initial_deposit)
+
+@external
+def deploy_pools(_configs: DynArray[PoolConfig, MAX_POOL_DEPLOYS]) -> DynArray[address, MAX_POOL_DEPLOYS]:
+    """
+    @notice deploy a set of pools in one tx. Pools are deployed in the same order as `_configs`
+    @dev    salt is per deployer + token so each config MUST be for a different token
+    @return addresses of the new pools
+    """
+    pools: DynArray[address, MAX_POOL_DEPLOYS] = []
+    for c in _configs:
+        pools.append(self._deploy_pool(c.owner, c.token, c.name, c.symbol, c.performance_fee, c.deposit_fee, c.initial_deposit))
+
+    return pools
+
+@view
+@external
+def compute_pool_address(_deployer: address, _token: address, _init_code_hash: bytes32) -> address:
+    """
+    @notice CREATE2 address of the pool that `_deployer` gets for `_token` from deploy_pool/deploy_pools
+    @dev    pool constructor args are part of the CREATE2 initcode and vyper cant load the whole blueprint
+            to hash it onchain, so callers pass in the initcode hash for the pool config they will deploy.
+            _init_code_hash = keccak256(pool_implementation.code + abi encoded constructor args)
+    """
+    return convert(
+        slice(
+            keccak256(concat(
+                0xff,
+                convert(self, bytes20),
+                self._pool_salt(_deployer, _token),
+                _init_code_hash
+            )),
+            12, 20
+        ),
+        address
+    )
+
+@view
+@internal
+def _pool_salt(_deployer: address, _token: address) -> bytes32:
+    # similiar composite index as lines for pool CREATE2. (contract-actor-token)
+    return keccak256(_abi_encode(self, _deployer, _token))
+
+@internal
+def _deploy_pool(_owner: address, _token: address, _name: String[50], _symbol: String[18],
+                _performance_fee: uint16, _deposit_fee: uint16, _initial_deposit: uint256) -> address:
 
     fees: Fees = Fees({
         performance: _performance_fee,
@@ -58,7 +116,7 @@ def deploy_pool(_owner: address, _token: address, _name: String[50], _symbol: St
         pool_implementation,
         _owner, _token, _name, _symbol, fees, # args
         code_offset=0, # tbh dont know what this does
-        salt=keccak256(_abi_encode(self, msg.sender, _token)) # similiar composite index as lines for pool CREATE2. (contract-actor-token)
+        salt=self._pool_salt(msg.sender, _token)
     )
 
     log DeployPool(pool, _owner, _token)
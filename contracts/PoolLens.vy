@@ -0,0 +1,196 @@
+# @version ^0.3.9
+
+"""
+@title 	Debt DAO Pool Lens
+@author	Kiba Gateaux
+@notice	Read only batch views over DebtDAOPools so dashboards and indexers can read a pool or all its holders in one eth_call
+@dev	Lives outside DebtDAOPool bc pool initcode is deployed as a blueprint and is already close to EIP-170 limit.
+		Stateless so one deployment serves every pool. Offchain decoder in offchain/lens.py
+"""
+
+interface IDebtDAOPool:
+	def asset() -> address: view
+	def decimals() -> uint8: view
+	def totalAssets() -> uint256: view
+	def totalSupply() -> uint256: view
+	def price() -> uint256: view
+	def locked_profits() -> uint256: view
+	def free_profit() -> uint256: view
+	def pending_flash_fees() -> uint256: view
+	def liquid_assets() -> uint256: view
+	def total_deployed() -> uint256: view
+	def debt_principal() -> uint256: view
+	def accrued_fees() -> uint256: view
+	def delegate_stake() -> uint256: view
+	def fees() -> Fees: view
+	def vesting_rate() -> uint256: view
+	def last_report() -> uint256: view
+	def min_deposit() -> uint256: view
+	def max_assets() -> uint256: view
+	def owner() -> address: view
+	def rev_recipient() -> address: view
+	def credit_position_count() -> uint256: view
+	def vault_count() -> uint256: view
+	def balanceOf(account: address) -> uint256: view
+	def allowance(owner: address, spender: address) -> uint256: view
+	def nonces(owner: address) -> uint256: view
+
+struct Fees: # from DebtDAOPool.vy
+	performance: uint16
+	deposit: uint16
+	withdraw: uint16
+	flash: uint16
+	collector: uint16
+	referral: uint16
+
+struct PoolState:
+	pool: address
+	asset: address
+	decimals: uint8
+	total_assets: uint256
+	total_supply: uint256
+	price: uint256
+	# all profit since last report. locked_profits - free_profit is still vesting
+	locked_profits: uint256
+	free_profit: uint256
+	pending_flash_fees: uint256
+	liquid_assets: uint256
+	total_deployed: uint256
+	debt_principal: uint256
+	accrued_fees: uint256
+	delegate_stake: uint256
+	fees: Fees
+	vesting_rate: uint256
+	last_report: uint256
+	min_deposit: uint256
+	max_assets: uint256
+	owner: address
+	rev_recipient: address
+	credit_position_count: uint256
+	vault_count: uint256
+	# block state was read at
+	block_number: uint256
+	timestamp: uint256
+
+struct AccountState:
+	account: address
+	balance: uint256
+	max_withdraw: uint256
+	max_redeem: uint256
+	allowance: uint256
+	nonce: uint256
+
+struct AccountsState:
+	pool: address
+	price: uint256
+	liquid_assets: uint256
+	accounts: DynArray[AccountState, MAX_ACCOUNTS]
+	# block state was read at
+	block_number: uint256
+	timestamp: uint256
+
+# max pools read in a single pool_states() call
+MAX_POOLS: constant(uint256) = 100
+# max accounts read in a single accounts_state() call
+MAX_ACCOUNTS: constant(uint256) = 500
+# DebtDAOPool.PRICE_DECIMALS
+PRICE_DECIMALS: constant(uint256) = 10**8
+
+@view
+@internal
+def _pool_state(_pool: address) -> PoolState:
+	pool: IDebtDAOPool = IDebtDAOPool(_pool)
+	return PoolState({
+		pool: _pool,
+		asset: pool.asset(),
+		decimals: pool.decimals(),
+		total_assets: pool.totalAssets(),
+		total_supply: pool.totalSupply(),
+		price: pool.price(),
+		locked_profits: pool.locked_profits(),
+		free_profit: pool.free_profit(),
+		pending_flash_fees: pool.pending_flash_fees(),
+		liquid_assets: pool.liquid_assets(),
+		total_deployed: pool.total_deployed(),
+		debt_principal: pool.debt_principal(),
+		accrued_fees: pool.accrued_fees(),
+		delegate_stake: pool.delegate_stake(),
+		fees: pool.fees(),
+		vesting_rate: pool.vesting_rate(),
+		last_report: pool.last_report(),
+		min_deposit: pool.min_deposit(),
+		max_assets: pool.max_assets(),
+		owner: pool.owner(),
+		rev_recipient: pool.rev_recipient(),
+		credit_position_count: pool.credit_position_count(),
+		vault_count: pool.vault_count(),
+		block_number: block.number,
+		timestamp: block.timestamp
+	})
+
+@view
+@external
+def pool_state(_pool: address) -> PoolState:
+	"""
+	@notice every pool getter a dashboard row needs in one call
+	@param _pool	DebtDAOPool to read
+	"""
+	return self._pool_state(_pool)
+
+@view
+@external
+def pool_states(_pools: DynArray[address, MAX_POOLS]) -> DynArray[PoolState, MAX_POOLS]:
+	"""
+	@notice pool_state() for many pools in one call
+	@param _pools	DebtDAOPools to read
+	"""
+	states: DynArray[PoolState, MAX_POOLS] = []
+	for pool in _pools:
+		states.append(self._pool_state(pool))
+	return states
+
+@view
+@external
+def accounts_state(
+	_pool: address,
+	_accounts: DynArray[address, MAX_ACCOUNTS],
+	_spender: address
+) -> AccountsState:
+	"""
+	@notice
+		balanceOf, maxWithdraw, maxRedeem, allowance and nonces for many holders of a pool in one call
+	@dev
+		Price and liquidity are read once for every account.
+		Same math as DebtDAOPool.maxWithdraw/maxRedeem so results match calling them per account.
+	@param _pool		DebtDAOPool to read
+	@param _accounts	holders to read
+	@param _spender		spender to read each account's allowance for
+	"""
+	pool: IDebtDAOPool = IDebtDAOPool(_pool)
+	price: uint256 = pool.price()
+	liquid_assets: uint256 = pool.liquid_assets()
+	# _convert_to_shares(_max_liquid_assets()) is the same for every account
+	max_liquid_shares: uint256 = 0
+	if price != 0:
+		max_liquid_shares = liquid_assets * PRICE_DECIMALS / price
+
+	accounts: DynArray[AccountState, MAX_ACCOUNTS] = []
+	for account in _accounts:
+		balance: uint256 = pool.balanceOf(account)
+		accounts.append(AccountState({
+			account: account,
+			balance: balance,
+			max_withdraw: min(balance * price / PRICE_DECIMALS, liquid_assets),
+			max_redeem: min(balance, max_liquid_shares),
+			allowance: pool.allowance(account, _spender),
+			nonce: pool.nonces(account)
+		}))
+
+	return AccountsState({
+		pool: _pool,
+		price: price,
+		liquid_assets: liquid_assets,
+		accounts: accounts,
+		block_number: block.number,
+		timestamp: block.timestamp
+	})
@@ -0,0 +1,189 @@
+# @version ^0.3.9
+
+"""
+@title 	Debt DAO Pool Redemption Queue
+@notice	FIFO queue for redemptions larger than a pool's liquid assets.
+		Depositors escrow shares here and DebtDAOPool redeems them whenever reduce_credit, collect_interest
+		or divest_vault brings liquidity back. Assets are allocated to requests in order and claimed by receivers.
+@dev	Set as the pool's redemption_queue by its owner. One queue per pool.
+		Pool redeems all escrowed shares at once so assets received are split between requests by shares filled.
+"""
+
+interface IDebtDAOPool:
+	def asset() -> address: view
+	def balanceOf(account: address) -> uint256: view
+	def maxRedeem(owner: address) -> uint256: view
+	def transfer(to: address, amount: uint256) -> bool: nonpayable
+	def transferFrom(sender: address, receiver: address, amount: uint256) -> bool: nonpayable
+	def redeem(shares: uint256, receiver: address, owner: address) -> uint256: nonpayable
+
+interface IERC20:
+	def balanceOf(account: address) -> uint256: view
+	def transfer(to: address, amount: uint256) -> bool: nonpayable
+
+struct Request:
+	owner: address
+	receiver: address
+	# escrowed shares not redeemed yet
+	shares: uint256
+
+event RequestRedeem:
+	index: indexed(uint256)
+	owner: indexed(address)
+	receiver: indexed(address)
+	shares: uint256
+
+event SettleRedeem:
+	index: indexed(uint256)
+	receiver: indexed(address)
+	shares: uint256
+	assets: uint256
+
+event CancelRedeem:
+	index: indexed(uint256)
+	owner: indexed(address)
+	shares: uint256
+
+event Claim:
+	receiver: indexed(address)
+	assets: uint256
+
+# max requests filled per call so settling cost is bounded. leftovers are filled on the next call
+MAX_SETTLE: constant(uint256) = 50
+
+POOL: public(immutable(address))
+ASSET: public(immutable(address))
+
+# requests in FIFO order. head is the next request to fill, tail the next index to push
+requests: public(HashMap[uint256, Request])
+head: public(uint256)
+tail: public(uint256)
+# shares escrowed in requests that are not filled yet
+total_shares: public(uint256)
+# shares + assets redeemed by pool not allocated to requests yet
+unallocated_shares: public(uint256)
+unallocated_assets: public(uint256)
+# assets allocated to receivers waiting to be claimed
+claimable: public(HashMap[address, uint256])
+total_claimable: public(uint256)
+
+@external
+def __init__(_pool: address):
+	POOL = _pool
+	ASSET = IDebtDAOPool(_pool).asset()
+
+@internal
+def _sync():
+	"""
+	@notice pick up shares pool redeemed since last sync and allocate assets to requests FIFO
+	"""
+	escrowed: uint256 = self.total_shares - self.unallocated_shares
+	balance: uint256 = IDebtDAOPool(POOL).balanceOf(self)
+	if balance < escrowed:
+		self.unallocated_shares += escrowed - balance
+		# everything held that isnt claimable or already tracked came from redemptions
+		self.unallocated_assets = IERC20(ASSET).balanceOf(self) - self.total_claimable
+
+	shares: uint256 = self.unallocated_shares
+	assets: uint256 = self.unallocated_assets
+	index: uint256 = self.head
+	for i in range(MAX_SETTLE):
+		if shares == 0 or index == self.tail:
+			break
+		request: Request = self.requests[index]
+		filled: uint256 = min(request.shares, shares)
+		if filled != 0:
+			# pro rata of what is left so rounding dust goes to the last request filled
+			paid: uint256 = assets * filled / shares
+			shares -= filled
+			assets -= paid
+			self.requests[index].shares = request.shares - filled
+			self.claimable[request.receiver] += paid
+			self.total_claimable += paid
+			log SettleRedeem(index, request.receiver, filled, paid)
+		if filled == request.shares:
+			index += 1
+
+	self.total_shares -= self.unallocated_shares - shares
+	self.unallocated_shares = shares
+	self.unallocated_assets = assets
+	self.head = index
+
+@external
+@nonreentrant("lock")
+def request_redeem(_shares: uint256, _receiver: address) -> uint256:
+	"""
+	@notice escrow pool shares to be redeemed for `_receiver` once pool has liquidity
+	@return index of request in queue
+	"""
+	assert _shares != 0
+	assert _receiver != empty(address)
+	self._sync()
+	IDebtDAOPool(POOL).transferFrom(msg.sender, self, _shares)
+
+	index: uint256 = self.tail
+	self.requests[index] = Request({ owner: msg.sender, receiver: _receiver, shares: _shares })
+	self.tail = index + 1
+	self.total_shares += _shares
+	log RequestRedeem(index, msg.sender, _receiver, _shares)
+	return index
+
+@external
+@nonreentrant("lock")
+def cancel(_index: uint256) -> uint256:
+	"""
+	@notice return shares of a request that have not been redeemed yet to its owner
+	@return shares returned
+	"""
+	self._sync()
+	# redeemed shares left unallocated may belong to this request
+	assert self.unallocated_shares == 0 # dev: settle first
+	request: Request = self.requests[_index]
+	assert request.owner == msg.sender
+	assert _index >= self.head and request.shares != 0 # dev: already filled
+
+	self.requests[_index].shares = 0
+	self.total_shares -= request.shares
+	IDebtDAOPool(POOL).transfer(msg.sender, request.shares)
+	log CancelRedeem(_index, msg.sender, request.shares)
+	return request.shares
+
+@external
+@nonreentrant("lock")
+def settle() -> uint256:
+	"""
+	@notice
+		Anyone can redeem escrowed shares with liquidity pool already has e.g. from new deposits.
+		Pool does this itself when credit or vault investments return liquidity.
+	@return shares redeemed
+	"""
+	self._sync()
+	shares: uint256 = min(IDebtDAOPool(POOL).maxRedeem(self), self.total_shares - self.unallocated_shares)
+	if shares != 0:
+		IDebtDAOPool(POOL).redeem(shares, self, self)
+		self._sync()
+	return shares
+
+@external
+@nonreentrant("lock")
+def claim(_receiver: address = msg.sender) -> uint256:
+	"""
+	@notice send assets from filled requests to `_receiver`
+	@return assets sent
+	"""
+	self._sync()
+	assets: uint256 = self.claimable[_receiver]
+	if assets != 0:
+		self.claimable[_receiver] = 0
+		self.total_claimable -= assets
+		assert IERC20(ASSET).transfer(_receiver, assets)
+		log Claim(_receiver, assets)
+	return assets
+
+@view
+@external
+def pending_shares() -> uint256:
+	"""
+	@notice escrowed shares waiting for pool liquidity
+	"""
+	return self.total_shares - self.unallocated_shares
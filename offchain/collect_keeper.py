@@ -0,0 +1,246 @@
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Iterable, List, Set, Tuple
+from eth_abi import decode, encode
+from eth_utils import function_signature_to_4byte_selector
+from .impair_keeper import Position
+from .rpc import BatchCaller, ChainClient
+
+# Schedules collect_interest_many() and unlock_profits() across many pools when they pay for their gas.
+#
+# Interest repaid to a line sits in ISecuredLine.credits(id).interestRepaid until it is collected and the caller
+# earns the pool's collector fee on it. Flash fees sit in pending_flash_fees until the next unlock starts vesting
+# them. The scheduler keeps a local copy of both and only re-reads what may have changed each round: positions
+# marked dirty (e.g. from line repayment logs) plus a bounded round robin of the rest, so thousands of positions
+# cost a few batched calls per block instead of a full rescan.
+#
+#   scheduler = CollectScheduler(JsonRpcClient(url, sender=KEEPER), positions, asset_price=wei_per_token)
+#   await scheduler.run()
+
+# DebtDAOPool constants
+FEE_COEFFICIENT = 10000
+MAX_BATCH_SIZE = 50
+# gas from tests/boa/.gas-snapshot. collect_interest_many = base + per position
+COLLECT_POSITION_GAS = 195067 - 151907
+COLLECT_BASE_GAS = 151907 - COLLECT_POSITION_GAS
+UNLOCK_GAS = 30561
+
+CREDITS_SELECTOR = function_signature_to_4byte_selector("credits(bytes32)")
+FEES_SELECTOR = function_signature_to_4byte_selector("fees()")
+PENDING_FLASH_FEES_SELECTOR = function_signature_to_4byte_selector("pending_flash_fees()")
+COLLECT_MANY_SELECTOR = function_signature_to_4byte_selector("collect_interest_many(address[],bytes32[])")
+UNLOCK_SELECTOR = function_signature_to_4byte_selector("unlock_profits()")
+# ISecuredLine Position struct
+POSITION_ABI = ["uint256", "uint256", "uint256", "uint256", "uint8", "address", "address", "bool"]
+# DebtDAOPool Fees struct. NOTE: MUST be same order as Fees struct
+FEES_ABI = ["uint16"] * 6
+COLLECTOR = 4
+
+log = logging.getLogger(__name__)
+
+@dataclass
+class PoolState:
+    collector_fee: int = 0
+    pending_flash_fees: int = 0
+
+@dataclass(frozen=True)
+class Plan:
+    pool: str
+    positions: Tuple[Position, ...]     # empty for unlock_profits()
+    interest: int                       # assets collected
+    reward: int                         # wei paid to keeper as collector fee
+    gas: int
+    gas_price: int
+
+    @property
+    def gas_cost(self) -> int:
+        return self.gas * self.gas_price
+
+    @property
+    def profit(self) -> int:
+        return self.reward - self.gas_cost
+
+    def calldata(self) -> bytes:
+        if not self.positions:
+            return UNLOCK_SELECTOR
+        return COLLECT_MANY_SELECTOR + encode(
+            ["address[]", "bytes32[]"], [[p.line for p in self.positions], [p.id for p in self.positions]]
+        )
+
+@dataclass(frozen=True)
+class PlanResult:
+    plan: Plan
+    tx_hash: str | None = None
+    error: str | None = None
+
+class CollectScheduler:
+    def __init__(
+        self, client: ChainClient, positions: Iterable[Position] = (), asset_price: float = 1.0,
+        min_profit: int = 0, unlock_multiple: float = 10, refresh_per_round: int = 1000,
+        concurrency: int = 8, batch_size: int = 100,
+    ):
+        """
+        @param asset_price - wei per smallest unit of pool assets. pools with different assets need their own scheduler
+        @param min_profit - min wei left after gas for a collect to be sent
+        @param unlock_multiple - send unlock_profits() when pending flash fees are worth this many times its gas.
+            caller earns nothing so it is only worth it for sizable fees
+        @param refresh_per_round - max positions re-read per round that weren't marked dirty
+        """
+        self.client = client
+        self.rpc = BatchCaller(client, concurrency, batch_size)
+        self.asset_price = asset_price
+        self.min_profit = min_profit
+        self.unlock_multiple = unlock_multiple
+        self.refresh_per_round = refresh_per_round
+        self.interest: Dict[Position, int] = {}         # interestRepaid last read per position
+        self.pools: Dict[str, PoolState] = {}
+        self.positions: Dict[str, Set[Position]] = {}   # pool -> positions it holds
+        self.dirty: Set[Position] = set()
+        self._stale: Deque[Position] = deque()          # round robin of clean positions
+        for position in positions:
+            self.track(position)
+
+    ### State
+
+    def track(self, position: Position):
+        if position not in self.interest:
+            self.interest[position] = 0
+            self.pools.setdefault(position.pool, PoolState())
+            self.positions.setdefault(position.pool, set()).add(position)
+            self.dirty.add(position)
+
+    def untrack(self, position: Position):
+        self.interest.pop(position, None)
+        self.dirty.discard(position)
+        positions = self.positions.get(position.pool, set())
+        positions.discard(position)
+        if not positions:
+            self.positions.pop(position.pool, None)
+            self.pools.pop(position.pool, None)
+
+    def mark_dirty(self, position: Position):
+        """
+        interest on position may have changed e.g. borrower repaid
+        """
+        if position in self.interest:
+            self.dirty.add(position)
+
+    async def refresh(self) -> List[Position]:
+        """
+        re-read pool fees and every dirty position plus the next `refresh_per_round` clean ones
+        @return positions read
+        """
+        if not self._stale:
+            self._stale.extend(p for p in self.interest if p not in self.dirty)
+        positions = list(self.dirty)
+        while self._stale and len(positions) < len(self.dirty) + self.refresh_per_round:
+            position = self._stale.popleft()
+            if position in self.interest and position not in self.dirty:
+                positions.append(position)
+
+        pools = list(self.pools)
+        calls = [(p.line, CREDITS_SELECTOR + p.id) for p in positions]
+        calls += [(pool, FEES_SELECTOR) for pool in pools] + [(pool, PENDING_FLASH_FEES_SELECTOR) for pool in pools]
+        outputs = await self.rpc.call_many(calls)
+
+        for position, output in zip(positions, outputs):
+            if output is None:
+                continue
+            deposit, principal, interest_accrued, interest_repaid, decimals, token, lender, is_open = decode(POSITION_ABI, output)
+            if lender.lower() != position.pool:
+                # position was closed and removed from pool so there is nothing left to collect
+                self.untrack(position)
+            else:
+                self.interest[position] = interest_repaid
+                self.dirty.discard(position)
+
+        fees, flash_fees = outputs[len(positions):len(positions) + len(pools)], outputs[len(positions) + len(pools):]
+        for pool, fee, flash in zip(pools, fees, flash_fees):
+            if pool in self.pools and fee is not None and flash is not None:
+                self.pools[pool] = PoolState(decode(FEES_ABI, fee)[COLLECTOR], decode(["uint256"], flash)[0])
+        return positions
+
+    ### Planning
+
+    def _value(self, assets: int) -> int:
+        return int(assets * self.asset_price)
+
+    def plan_collect(self, pool: str, gas_price: int) -> Plan | None:
+        """
+        most profitable collect_interest_many() batch for pool. positions are added by interest while their
+        collector fee beats their marginal gas
+        """
+        fee = self.pools[pool].collector_fee
+        candidates = sorted(
+            ((self.interest[p], p) for p in self.positions[pool] if self.interest[p] > 0),
+            key=lambda c: c[0], reverse=True,
+        )[:MAX_BATCH_SIZE]
+        marginal_gas = COLLECT_POSITION_GAS * gas_price
+        batch = [(interest, p) for interest, p in candidates if self._value(interest * fee // FEE_COEFFICIENT) > marginal_gas]
+        if not batch:
+            return None
+        interest = sum(i for i, _ in batch)
+        return Plan(
+            pool, tuple(p for _, p in batch), interest, self._value(interest * fee // FEE_COEFFICIENT),
+            COLLECT_BASE_GAS + COLLECT_POSITION_GAS * len(batch), gas_price,
+        )
+
+    def plan_unlock(self, pool: str, gas_price: int) -> Plan | None:
+        flash_fees = self.pools[pool].pending_flash_fees
+        if flash_fees == 0 or self._value(flash_fees) < self.unlock_multiple * UNLOCK_GAS * gas_price:
+            return None
+        return Plan(pool, (), 0, 0, UNLOCK_GAS, gas_price)
+
+    def schedule(self, gas_price: int) -> List[Plan]:
+        """
+        at most one tx per pool. collecting also unlocks profits so unlock_profits() only runs without a collect
+        """
+        plans = []
+        for pool in self.pools:
+            collect = self.plan_collect(pool, gas_price)
+            if collect is not None and collect.profit >= self.min_profit:
+                plans.append(collect)
+            elif (unlock := self.plan_unlock(pool, gas_price)) is not None:
+                plans.append(unlock)
+        return plans
+
+    ### Execution
+
+    async def _send(self, plan: Plan) -> PlanResult:
+        try:
+            tx_hash = await self.rpc.send(plan.pool, plan.calldata())
+        except Exception as e:
+            log.warning("%s on %s failed: %s", "collect" if plan.positions else "unlock", plan.pool, e)
+            # local state is probably stale
+            for position in plan.positions:
+                self.mark_dirty(position)
+            return PlanResult(plan, error=str(e))
+        # outcome is known so no need to read it back
+        for position in plan.positions:
+            self.interest[position] = 0
+        self.pools[plan.pool].pending_flash_fees = 0
+        return PlanResult(plan, tx_hash)
+
+    async def poll(self) -> List[PlanResult]:
+        """
+        one keeper round
+        """
+        await self.refresh()
+        plans = self.schedule(await self.client.gas_price())
+        return list(await asyncio.gather(*(self._send(plan) for plan in plans)))
+
+    async def run(self, interval: float = 12, stop: asyncio.Event | None = None):
+        """
+        poll every `interval` seconds until `stop` is set
+        """
+        stop = stop or asyncio.Event()
+        while not stop.is_set():
+            for result in await self.poll():
+                action = f"collect {len(result.plan.positions)} positions" if result.plan.positions else "unlock"
+                log.info("%s on %s for %s wei: %s", action, result.plan.pool, result.plan.profit, result.tx_hash or result.error)
+            try:
+                await asyncio.wait_for(stop.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
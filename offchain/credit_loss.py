@@ -0,0 +1,363 @@
+import math
+import numpy as np
+from itertools import repeat
+from dataclasses import dataclass, field, fields
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, Tuple
+from .pool_model import PoolModel, FEE_COEFFICIENT, MAX_UINT, uints
+
+# Monte Carlo credit losses for pools lending to portfolios of lines. Every path gets random line sizes, rates,
+# draws, repayments and defaults and runs them through the exact pool accounting in offchain/pool_model.py
+# (impair, reduce_credit, collect_interest_many) so loss, delegate fee burn and share price drawdowns can be
+# sized from distributions instead of single test cases.
+#
+#   losses = simulate(Portfolio(default_probability=0.1), paths=100_000)
+#   losses.summary()["net_loss"]["99%"]
+
+# tests/mocks/MockLine.vy. 100% in bps * 365.25 days in seconds
+INTEREST_RATE_COEFFICIENT = 315576000000
+ONE_YEAR_IN_SEC = 60 * 60 * 24 * 365.25
+# DebtDAOPool.SNITCH_FEE
+SNITCH_FEE = 500
+
+LINE_STATE = ('deposit', 'principal', 'interest_accrued', 'interest_repaid', 'drate', 'frate', 'last_accrued')
+
+class LinePortfolio:
+    """
+    MockLine positions for each scenario in `pool` as (size, lines) exact int arrays, with the pool's line accounting
+    on top. Same rules as PoolModel: every action returns `ok` and scenarios where the EVM would revert are untouched.
+
+    Impairment records are only used to block replays. Principal recovered after an impairment is not modelled.
+    """
+    def __init__(self, pool: PoolModel, lines: int):
+        self.pool = pool
+        self.lines = lines
+        for name in LINE_STATE:
+            setattr(self, name, np.zeros((pool.size, lines), dtype=object))
+        self.insolvent = np.zeros((pool.size, lines), dtype=bool)
+        self.impaired = np.zeros((pool.size, lines), dtype=bool)
+
+    def _apply(self, mask, action: Callable[[PoolModel], Dict[Tuple[str, int], np.ndarray]]) -> np.ndarray:
+        """
+        run `action` for scenarios in `mask`. action returns new line state as { (name, line): values }
+        """
+        pool = self.pool._fork()
+        pool._check(np.broadcast_to(np.asarray(mask, dtype=bool), (pool.size,)))
+        updates = action(pool)
+        ok = self.pool._merge(pool)
+        for (name, j), values in updates.items():
+            column = getattr(self, name)
+            column[:, j] = np.where(ok, values, column[:, j])
+        return ok
+
+    @staticmethod
+    def _when(pool: PoolModel, condition, branch: Callable[[PoolModel], object]):
+        """
+        `if condition: branch(pool)` per scenario. reverts inside the branch revert the scenario
+        """
+        sub = pool._fork()
+        sub._check(condition)
+        result = branch(sub)
+        ok = pool._merge(sub)
+        pool._check(~condition | ok)
+        return result
+
+    ### MockLine.vy
+
+    def _accrue(self, pool: PoolModel, j: int) -> np.ndarray:
+        principal, undrawn = self.principal[:, j], self.deposit[:, j] - self.principal[:, j]
+        timespan = pool._sub(pool.timestamp, self.last_accrued[:, j])
+        return (
+            self.interest_accrued[:, j]
+            + principal * timespan * self.drate[:, j] // INTEREST_RATE_COEFFICIENT
+            + undrawn * timespan * self.frate[:, j] // INTEREST_RATE_COEFFICIENT
+        )
+
+    def owed(self, j: int) -> np.ndarray:
+        """
+        principal + interest borrower must repay to close line `j` now
+        """
+        return self.principal[:, j] + self._accrue(self.pool, j)
+
+    def _line_withdraw(self, pool: PoolModel, j: int, amount) -> Dict[Tuple[str, int], np.ndarray]:
+        repaid = self.interest_repaid[:, j]
+        pool._check(amount <= self.deposit[:, j] + repaid - self.principal[:, j])
+        from_deposit = amount > repaid
+        return {
+            ('interest_accrued', j): self._accrue(pool, j),
+            ('last_accrued', j): pool.timestamp,
+            ('deposit', j): np.where(from_deposit, self.deposit[:, j] - np.where(from_deposit, amount - repaid, 0), self.deposit[:, j]),
+            ('interest_repaid', j): np.where(from_deposit, 0, repaid - np.where(from_deposit, 0, amount)),
+        }
+
+    def borrow(self, j: int, amount, mask=True) -> np.ndarray:
+        amount = uints(amount, self.pool.size)
+        def borrow(pool):
+            pool._check(amount <= self.deposit[:, j] - self.principal[:, j])
+            return {
+                ('interest_accrued', j): self._accrue(pool, j),
+                ('last_accrued', j): pool.timestamp,
+                ('principal', j): self.principal[:, j] + amount,
+            }
+        return self._apply(mask, borrow)
+
+    def repay(self, j: int, amount, mask=True) -> np.ndarray:
+        """
+        depositAndRepay. interest is paid off before principal
+        """
+        amount = uints(amount, self.pool.size)
+        def repay(pool):
+            accrued = self._accrue(pool, j)
+            pool._check(amount <= self.principal[:, j] + accrued)
+            pays_principal = amount > accrued
+            return {
+                ('last_accrued', j): pool.timestamp,
+                ('interest_repaid', j): self.interest_repaid[:, j] + np.where(pays_principal, accrued, amount),
+                ('principal', j): self.principal[:, j] - np.where(pays_principal, amount - accrued, 0),
+                ('interest_accrued', j): np.where(pays_principal, 0, accrued - np.where(pays_principal, 0, amount)),
+            }
+        return self._apply(mask, repay)
+
+    def declare_insolvent(self, mask):
+        self.insolvent |= np.asarray(mask, dtype=bool)
+
+    ### DebtDAOPool line accounting
+
+    def add_credit(self, j: int, amount, drate, frate, mask=True) -> np.ndarray:
+        amount = uints(amount, self.pool.size)
+        def add_credit(pool):
+            pool._check(pool._sub(pool.total_assets, pool.total_deployed) >= amount)
+            pool.total_deployed = pool._add(pool.total_deployed, amount)
+            zero = uints(0, pool.size)
+            return {
+                ('deposit', j): amount, ('principal', j): zero, ('interest_accrued', j): zero, ('interest_repaid', j): zero,
+                ('drate', j): uints(drate, pool.size), ('frate', j): uints(frate, pool.size), ('last_accrued', j): pool.timestamp,
+            }
+        return self._apply(mask, add_credit)
+
+    def _withdraw_from_line(self, pool: PoolModel, j: int, amount) -> Tuple[np.ndarray, np.ndarray, dict]:
+        """
+        @param amount - 0 for all interest, MAX_UINT for everything withdrawable
+        @return (deposit withdrawn, interest withdrawn, line updates)
+        """
+        undrawn, interest = self.deposit[:, j] - self.principal[:, j], self.interest_repaid[:, j]
+        withdrawable = np.where(amount == 0, interest, np.where(amount == MAX_UINT, undrawn + interest, amount))
+        interest = np.where(withdrawable < interest, withdrawable, interest)
+        deposit = withdrawable - interest
+        pool.total_deployed = pool._sub(pool.total_deployed, deposit)
+        # (0, 0) withdrawals dont call line so interest isnt accrued
+        updates = {
+            (name, k): np.where(withdrawable != 0, values, getattr(self, name)[:, k])
+            for (name, k), values in self._line_withdraw(pool, j, withdrawable).items()
+        }
+        return deposit, interest, updates
+
+    def collect_interest(self, by_owner=False, mask=True) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        collect_interest_many over every line
+        @return (total interest, ok)
+        """
+        total = uints(0, self.pool.size)
+        def collect_interest(pool):
+            nonlocal total
+            updates = {}
+            for j in range(self.lines):
+                _, interest, line_updates = self._withdraw_from_line(pool, j, 0)
+                updates.update(line_updates)
+                total = total + interest
+            pool._check(total != 0)
+            pool._update_shares(total)
+            pool._take_performance_fee(total, by_owner)
+            return updates
+        ok = self._apply(mask, collect_interest)
+        return np.where(ok, total, 0), ok
+
+    def reduce_credit(self, j: int, amount=MAX_UINT, by_owner=True, mask=True) -> Tuple[Tuple[np.ndarray, np.ndarray], np.ndarray]:
+        """
+        @return ((deposit withdrawn, interest earned), ok)
+        """
+        result = [uints(0, self.pool.size)] * 2
+        def reduce_credit(pool):
+            deposit, interest, updates = self._withdraw_from_line(pool, j, uints(amount, pool.size))
+            pool._check(deposit + interest > 0)
+            def book_interest(sub):
+                sub._update_shares(interest)
+                sub._take_performance_fee(interest, by_owner)
+            self._when(pool, interest != 0, book_interest)
+            result[:] = deposit, interest
+            return updates
+        ok = self._apply(mask, reduce_credit)
+        return (np.where(ok, result[0], 0), np.where(ok, result[1], 0)), ok
+
+    def impair(self, j: int, by_owner=False, mask=True) -> Tuple[Tuple[np.ndarray, np.ndarray, np.ndarray], np.ndarray]:
+        """
+        @return ((pool net loss, owner shares burned, snitch fee paid in assets), ok)
+        """
+        size = self.pool.size
+        result = [uints(0, size)] * 3
+        def impair(pool):
+            principal, interest = self.principal[:, j], self.interest_repaid[:, j]
+            pool._check(self.insolvent[:, j] & ~self.impaired[:, j] & (principal != 0))
+            recovered = self.deposit[:, j] - principal
+
+            profit = interest > principal
+            self._when(pool, profit, lambda sub: sub._update_shares(interest - np.where(profit, principal, 0)))
+            def realize_loss(sub):
+                lost, burned = sub._update_shares(np.where(profit, 0, principal - interest), True)
+                snitched = (burned != 0) & ~np.asarray(by_owner, dtype=bool)
+                # paid out of pool balance without touching total_assets, same as contract
+                snitch_fee = np.where(snitched, sub._to_assets(sub._calc_fee(burned, SNITCH_FEE), sub._virtual_price()), 0)
+                return lost, burned, snitch_fee
+            losses = self._when(pool, ~profit, realize_loss)
+            result[:] = (np.where(profit, 0, value) for value in losses)
+
+            pool.total_deployed = pool._sub(pool.total_deployed, recovered)
+            return self._line_withdraw(pool, j, recovered + interest)
+        ok = self._apply(mask, impair)
+        self.impaired[:, j] |= ok
+        return tuple(np.where(ok, value, 0) for value in result), ok
+
+### Simulation
+
+@dataclass(frozen=True)
+class Portfolio:
+    """
+    How each simulated pool lends. (low, high) ranges are inclusive and drawn per path + line.
+    Amounts are in asset base units, rates and shares in bps.
+    """
+    lines: int = 5
+    pool_assets: int = 10**6 * 10**18               # LP deposits
+    delegate_stake: int = 5 * 10**4 * 10**18        # first loss stake_assets
+    utilization: Tuple[int, int] = (5000, 9000)     # share of pool assets lent across all lines
+    drate: Tuple[int, int] = (500, 2500)            # interest on drawn credit
+    frate: Tuple[int, int] = (0, 500)               # interest on undrawn credit
+    draw: Tuple[int, int] = (0, 5000)               # share of undrawn credit borrowed each period
+    amortization: int = 500                         # share of principal repaid each period with interest
+    repay_probability: float = 0.9                  # borrower makes their payment in a period
+    default_probability: float = 0.05               # line goes insolvent within a year
+    snitched: bool = True                           # impair called by a snitch instead of the delegate
+    periods: int = 12
+    period: int = 30 * 24 * 60 * 60
+    fees: Dict[str, int] = field(default_factory=lambda: { 'performance': 1000, 'collector': 100 })
+
+@dataclass
+class CreditLosses:
+    """
+    Per path outcomes in asset base units. floats since they are only used for distributions
+    """
+    net_loss: np.ndarray        # losses socialized across depositors after burning delegate stake + fees
+    gross_loss: np.ndarray      # principal - interest on impaired lines
+    fees_burned: np.ndarray     # delegate stake + accrued fee shares burned to cover losses
+    snitch_fees: np.ndarray     # assets paid to snitches
+    defaults: np.ndarray        # lines impaired
+    max_drawdown: np.ndarray    # worst peak to trough share price drop over the path. 0.1 = 10%
+    final_price: np.ndarray     # share price after every line is closed and profits vested
+
+    @classmethod
+    def concat(cls, results: Iterable['CreditLosses']) -> 'CreditLosses':
+        results = list(results)
+        return cls(**{ f.name: np.concatenate([getattr(r, f.name) for r in results]) for f in fields(cls) })
+
+    def summary(self, quantiles: Iterable[float] = (0.5, 0.9, 0.99, 0.999)) -> Dict[str, Dict[str, float]]:
+        """
+        mean + quantiles of every outcome e.g. summary()["net_loss"]["99.9%"] is 1 in 1000 path loss
+        """
+        quantiles = tuple(quantiles)
+        return {
+            f.name: {
+                'mean': float(np.mean(values)),
+                **{ f"{q:.1%}".replace(".0%", "%"): float(v) for q, v in zip(quantiles, np.quantile(values, quantiles)) },
+            }
+            for f in fields(self)
+            for values in (getattr(self, f.name),)
+        }
+
+def _ranged(rng: np.random.Generator, bounds: Tuple[int, int], shape) -> np.ndarray:
+    return uints(rng.integers(bounds[0], bounds[1] + 1, shape))
+
+def simulate_paths(portfolio: Portfolio, size: int, seed=None) -> CreditLosses:
+    """
+    `size` paths batched into one PoolModel
+    """
+    rng = np.random.default_rng(seed)
+    pool = PoolModel(size, portfolio.fees)
+    pool.deposit(portfolio.pool_assets)
+    pool.stake_assets(portfolio.delegate_stake)
+    lines = LinePortfolio(pool, portfolio.lines)
+    by_owner = not portfolio.snitched
+
+    # split lent assets across lines by random weights
+    lent = uints(portfolio.pool_assets + portfolio.delegate_stake, size) * _ranged(rng, portfolio.utilization, size) // FEE_COEFFICIENT
+    weights = _ranged(rng, (1, 100), (size, portfolio.lines))
+    for j in range(portfolio.lines):
+        amount = lent * weights[:, j] // weights.sum(axis=1)
+        lines.add_credit(j, amount, _ranged(rng, portfolio.drate, size), _ranged(rng, portfolio.frate, size))
+
+    # per period hazard from annual default probability
+    hazard = 1 - (1 - portfolio.default_probability) ** (portfolio.period / ONE_YEAR_IN_SEC)
+    net_loss, gross_loss, fees_burned, snitch_fees = (uints(0, size) for _ in range(4))
+    defaults = np.zeros(size, dtype=np.int64)
+    prices = [pool.price()]
+
+    for _ in range(portfolio.periods):
+        healthy = ~lines.insolvent
+        draws = _ranged(rng, portfolio.draw, (size, portfolio.lines))
+        for j in range(portfolio.lines):
+            lines.borrow(j, (lines.deposit[:, j] - lines.principal[:, j]) * draws[:, j] // FEE_COEFFICIENT, healthy[:, j])
+
+        pool.warp(portfolio.period)
+        pays = healthy & (rng.random((size, portfolio.lines)) < portfolio.repay_probability)
+        for j in range(portfolio.lines):
+            interest = lines.owed(j) - lines.principal[:, j]
+            lines.repay(j, interest + lines.principal[:, j] * portfolio.amortization // FEE_COEFFICIENT, pays[:, j])
+
+        insolvent = healthy & (rng.random((size, portfolio.lines)) < hazard)
+        lines.declare_insolvent(insolvent)
+        for j in range(portfolio.lines):
+            principal, interest = lines.principal[:, j], lines.interest_repaid[:, j]
+            (lost, burned, snitch_fee), ok = lines.impair(j, by_owner, insolvent[:, j])
+            gross_loss += np.where(ok & (principal > interest), principal - interest, 0)
+            net_loss += lost
+            fees_burned += burned
+            snitch_fees += snitch_fee
+            defaults += ok
+
+        # keeper collects interest every period
+        lines.collect_interest()
+        prices.append(pool.price())
+
+    # healthy borrowers pay off everything and pool exits every line.
+    # lines that defaulted without being drawn have nothing to impair and are closed like normal
+    for j in range(portfolio.lines):
+        lines.repay(j, lines.owed(j), ~lines.insolvent[:, j])
+        lines.reduce_credit(j, mask=~lines.impaired[:, j])
+    # let all profits vest. 100% / vesting rate seconds
+    pool.warp(10**18 // np.maximum(pool.vesting_rate, 1))
+    pool.unlock_profits()
+    prices.append(pool.price())
+
+    prices = np.array(prices, dtype=float)
+    drawdowns = 1 - prices / np.maximum.accumulate(prices, axis=0)
+    return CreditLosses(
+        net_loss=net_loss.astype(float),
+        gross_loss=gross_loss.astype(float),
+        fees_burned=fees_burned.astype(float),
+        snitch_fees=snitch_fees.astype(float),
+        defaults=defaults,
+        max_drawdown=drawdowns.max(axis=0),
+        final_price=prices[-1],
+    )
+
+def simulate(portfolio: Portfolio, paths: int = 100_000, batch_size: int = 2_000, workers: int | None = None, seed: int = 0) -> CreditLosses:
+    """
+    fan `paths` out across processes in batches. same seed = same results regardless of `workers`.
+    PoolModel math runs at python int speed so processes are what actually parallelizes the work
+    @param workers - processes to use. defaults to cpu count. 1 runs in this process
+    """
+    batches = math.ceil(paths / batch_size)
+    sizes = [min(batch_size, paths - i * batch_size) for i in range(batches)]
+    seeds = np.random.SeedSequence(seed).spawn(batches)
+    if workers == 1:
+        return CreditLosses.concat(map(simulate_paths, repeat(portfolio), sizes, seeds))
+    with ProcessPoolExecutor(workers) as executor:
+        return CreditLosses.concat(executor.map(simulate_paths, repeat(portfolio), sizes, seeds))
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Set
+from eth_abi import decode, encode
+from eth_utils import function_signature_to_4byte_selector
+from .rpc import BatchCaller, ChainClient
+
+# Watches credit positions held by pools and calls DebtDAOPool.impair() as soon as their line goes insolvent.
+# Anyone can impair and snitches get SNITCH_FEE of delegate fees burned, so being first matters.
+#
+# Every round, status() of each tracked line is read in batched eth_calls with bounded concurrency. Insolvent lines
+# are permanent so they are never polled again. Positions on them have impair() simulated first and only the ones
+# that wouldnt revert are sent.
+#
+#   keeper = ImpairKeeper(JsonRpcClient(url, sender=KEEPER), positions)
+#   await keeper.run()
+
+# ISecuredLine.status() values
+STATUS_ACTIVE, STATUS_INSOLVENT = 1, 4
+# DebtDAOPool constants
+FEE_COEFFICIENT = 10000
+SNITCH_FEE = 500
+
+STATUS_SELECTOR = function_signature_to_4byte_selector("status()")
+IMPAIR_SELECTOR = function_signature_to_4byte_selector("impair(address,bytes32)")
+
+log = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class Position:
+    pool: str   # lowercase hex
+    line: str   # lowercase hex
+    id: bytes   # 32 byte credit position id on line
+
+    @classmethod
+    def of(cls, pool: str, line: str, id: bytes | str) -> 'Position':
+        return cls(pool.lower(), line.lower(), bytes.fromhex(id[2:]) if isinstance(id, str) else bytes(id))
+
+    def impair_calldata(self) -> bytes:
+        return IMPAIR_SELECTOR + encode(["address", "bytes32"], [self.line, self.id])
+
+@dataclass(frozen=True)
+class ImpairResult:
+    position: Position
+    pool_net_loss: int = 0
+    fees_burned: int = 0        # delegate shares burned
+    tx_hash: str | None = None  # None if simulation reverted or send failed
+    error: str | None = None
+
+    @property
+    def snitch_fee(self) -> int:
+        # shares paid to keeper. owner never gets paid to snitch on itself
+        return self.fees_burned * SNITCH_FEE // FEE_COEFFICIENT
+
+class ImpairKeeper:
+    def __init__(
+        self, client: ChainClient, positions: Iterable[Position] = (),
+        concurrency: int = 8, batch_size: int = 100, min_snitch_fee: int = 0,
+    ):
+        """
+        @param concurrency - max RPC requests in flight
+        @param batch_size - max eth_calls per request
+        @param min_snitch_fee - skip impairs paying less snitch fee shares. 0 impairs everything, which also protects
+            depositors from the delegate sitting on a loss
+        """
+        self.client = client
+        self.rpc = BatchCaller(client, concurrency, batch_size)
+        self.min_snitch_fee = min_snitch_fee
+        self.positions: Dict[str, Set[Position]] = {}   # line -> positions on it
+        self.insolvent: Set[str] = set()                # lines known to be insolvent. status never goes back
+        for position in positions:
+            self.track(position)
+
+    def track(self, position: Position):
+        self.positions.setdefault(position.line, set()).add(position)
+
+    def untrack(self, position: Position):
+        positions = self.positions.get(position.line, set())
+        positions.discard(position)
+        if not positions:
+            self.positions.pop(position.line, None)
+            self.insolvent.discard(position.line)
+
+    async def check_lines(self) -> List[str]:
+        """
+        poll status() of every tracked line not already insolvent
+        @return lines that just went insolvent
+        """
+        lines = [line for line in self.positions if line not in self.insolvent]
+        outputs = await self.rpc.call_many([(line, STATUS_SELECTOR) for line in lines])
+        insolvent = [
+            line for line, output in zip(lines, outputs)
+            if output is not None and decode(["uint8"], output)[0] == STATUS_INSOLVENT
+        ]
+        self.insolvent.update(insolvent)
+        return insolvent
+
+    async def _send(self, result: ImpairResult) -> ImpairResult:
+        position = result.position
+        try:
+            tx_hash = await self.rpc.send(position.pool, position.impair_calldata())
+        except Exception as e:
+            log.warning("impair %s on %s failed: %s", position.id.hex(), position.line, e)
+            return ImpairResult(position, result.pool_net_loss, result.fees_burned, error=str(e))
+        self.untrack(position)
+        return ImpairResult(position, result.pool_net_loss, result.fees_burned, tx_hash)
+
+    async def impair_insolvent(self) -> List[ImpairResult]:
+        """
+        simulate impair() for every position on an insolvent line and send the ones that pass
+        """
+        positions = [p for line in self.insolvent for p in self.positions.get(line, ())]
+        outputs = await self.rpc.call_many([(p.pool, p.impair_calldata()) for p in positions])
+
+        results, sends = [], []
+        for position, output in zip(positions, outputs):
+            if output is None:
+                # line is insolvent forever so it reverts because position was already impaired, is empty or not
+                # owned by pool. none of those change so stop tracking
+                self.untrack(position)
+                results.append(ImpairResult(position, error="impair reverted"))
+                continue
+            result = ImpairResult(position, *decode(["uint256", "uint256"], output))
+            if result.snitch_fee < self.min_snitch_fee:
+                results.append(ImpairResult(position, result.pool_net_loss, result.fees_burned, error="snitch fee too low"))
+            else:
+                sends.append(self._send(result))
+        return results + list(await asyncio.gather(*sends))
+
+    async def poll(self) -> List[ImpairResult]:
+        """
+        one keeper round
+        """
+        insolvent = await self.check_lines()
+        if insolvent:
+            log.info("lines went insolvent: %s", insolvent)
+        return await self.impair_insolvent() if self.insolvent else []
+
+    async def run(self, interval: float = 12, stop: asyncio.Event | None = None):
+        """
+        poll every `interval` seconds until `stop` is set
+        """
+        stop = stop or asyncio.Event()
+        while not stop.is_set():
+            for result in await self.poll():
+                log.info("impair %s on %s: %s", result.position.id.hex(), result.position.line, result.tx_hash or result.error)
+            try:
+                await asyncio.wait_for(stop.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
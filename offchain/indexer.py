@@ -0,0 +1,317 @@
+import os
+import re
+import json
+import vyper
+import urllib.request
+import numpy as np
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Protocol, Tuple
+from eth_abi import decode
+from eth_utils import event_abi_to_log_topic
+
+# Indexes pool history off-chain. Pools are discovered from PoolFactory.DeployPool logs then their logs are
+# pulled in block range chunks, decoded and appended to columnar files per event.
+# A cursor file tracks the next block to index so `sync()` can be stopped/restarted at any point.
+#
+#   indexer = PoolIndexer(JsonRpcSource("http://127.0.0.1:8555"), "data/pools", factory=FACTORY_ADDRESS)
+#   indexer.sync()
+#   deposits = indexer.load("Deposit") # { column: np.ndarray }
+
+# Transfer + UpdateProfitVestingRate are needed to replay share supply and vesting in offchain.share_price
+POOL_EVENTS = (
+    "Deposit", "Withdraw", "RevenueGenerated", "UnlockProfits", "Impair", "InvestVault", "DivestVault", "TrackSharePrice",
+    "Transfer", "UpdateProfitVestingRate",
+)
+POOL_SOURCE = Path(__file__).parent.parent / "contracts" / "DebtDAOPool.vy"
+FACTORY_SOURCE = Path(__file__).parent.parent / "contracts" / "PoolFactory.vy"
+# stored with every event
+META_COLUMNS = (("block_number", "uint64"), ("timestamp", "uint64"), ("log_index", "uint32"), ("address", "address"))
+# most RPCs cap addresses per eth_getLogs filter
+MAX_FILTER_ADDRESSES = 1000
+
+@dataclass(frozen=True)
+class Log:
+    address: str        # lowercase hex
+    topics: List[bytes] # 32 byte topics. topics[0] is event id
+    data: bytes
+    block_number: int
+    log_index: int
+
+class LogSource(Protocol):
+    def block_number(self) -> int: ...
+    def block_timestamp(self, block_number: int) -> int: ...
+    def get_logs(self, from_block: int, to_block: int, addresses: List[str], topics: List[bytes]) -> List[Log]:
+        """
+        logs from any of `addresses` whose first topic is any of `topics`. inclusive block range
+        """
+        ...
+
+class JsonRpcSource:
+    """
+    eth_getLogs over plain JSON-RPC e.g. local anvil from `ape-config.yaml` or any node
+    """
+    def __init__(self, url: str = "http://127.0.0.1:8555", timeout: int = 30):
+        self.url = url
+        self.timeout = timeout
+        self._id = 0
+
+    def _call(self, method: str, params: list):
+        self._id += 1
+        body = json.dumps({ "jsonrpc": "2.0", "id": self._id, "method": method, "params": params }).encode()
+        request = urllib.request.Request(self.url, body, { "Content-Type": "application/json" })
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            result = json.loads(response.read())
+        if "error" in result:
+            raise RuntimeError(f"{method} failed: {result['error']}")
+        return result["result"]
+
+    def block_number(self) -> int:
+        return int(self._call("eth_blockNumber", []), 16)
+
+    def block_timestamp(self, block_number: int) -> int:
+        return int(self._call("eth_getBlockByNumber", [hex(block_number), False])["timestamp"], 16)
+
+    def get_logs(self, from_block: int, to_block: int, addresses: List[str], topics: List[bytes]) -> List[Log]:
+        logs = self._call("eth_getLogs", [{
+            "fromBlock": hex(from_block),
+            "toBlock": hex(to_block),
+            "address": addresses,
+            "topics": [["0x" + t.hex() for t in topics]],
+        }])
+        return [
+            Log(
+                l["address"].lower(),
+                [bytes.fromhex(t[2:]) for t in l["topics"]],
+                bytes.fromhex(l["data"][2:]),
+                int(l["blockNumber"], 16),
+                int(l["logIndex"], 16),
+            )
+            for l in logs
+        ]
+
+def load_abi(path: Path) -> List[dict]:
+    """
+    ABI from a json file or by compiling a vyper contract
+    """
+    path = Path(path)
+    if path.suffix == ".json":
+        return json.loads(path.read_text())
+    return vyper.compile_code(path.read_text(), ["abi"])["abi"]
+
+@dataclass(frozen=True)
+class EventSpec:
+    name: str
+    topics: Tuple[Tuple[str, str], ...] # indexed (name, type) in order
+    data: Tuple[Tuple[str, str], ...]   # non indexed (name, type) in order
+
+    @property
+    def columns(self) -> Tuple[Tuple[str, str], ...]:
+        return META_COLUMNS + self.topics + self.data
+
+class EventTable:
+    """
+    event id (topic0) -> EventSpec lookups precomputed from an ABI so decoding is a dict lookup + abi decode
+    """
+    def __init__(self, abi: List[dict], names: Iterable[str] = None):
+        names = set(names) if names is not None else None
+        self.specs: Dict[bytes, EventSpec] = {}
+        for item in abi:
+            if item["type"] != "event" or item.get("anonymous") or (names is not None and item["name"] not in names):
+                continue
+            spec = EventSpec(
+                item["name"],
+                tuple((i["name"], i["type"]) for i in item["inputs"] if i["indexed"]),
+                tuple((i["name"], i["type"]) for i in item["inputs"] if not i["indexed"]),
+            )
+            self.specs[event_abi_to_log_topic(item)] = spec
+        self.by_name = { spec.name: spec for spec in self.specs.values() }
+
+    @property
+    def topics(self) -> List[bytes]:
+        return list(self.specs)
+
+    def decode(self, log: Log, timestamp: int = 0) -> Tuple[EventSpec, dict] | None:
+        spec = self.specs.get(log.topics[0]) if log.topics else None
+        if spec is None:
+            return None
+
+        row = { "block_number": log.block_number, "timestamp": timestamp, "log_index": log.log_index, "address": log.address }
+        for (name, typ), topic in zip(spec.topics, log.topics[1:]):
+            # dynamic types are hashed into topics so only the hash is recoverable
+            row[name] = topic if _is_dynamic(typ) else _normalize(typ, decode([typ], topic)[0])
+        values = decode([typ for _, typ in spec.data], log.data)
+        for (name, typ), value in zip(spec.data, values):
+            row[name] = _normalize(typ, value)
+        return spec, row
+
+def _is_dynamic(typ: str) -> bool:
+    return typ in ("string", "bytes") or typ.endswith("]") or typ.startswith("(")
+
+def _normalize(typ: str, value):
+    return value.lower() if typ == "address" else value
+
+def _bits(typ: str) -> int:
+    return int(re.sub(r"^u?int", "", typ) or 256)
+
+def _to_column(typ: str, values: list) -> np.ndarray:
+    """
+    fixed width numpy columns. (u)ints over 64 bits are stored as rows of 32 big endian bytes so they stay exact
+    """
+    if typ == "address":
+        return np.array(values, dtype="U42")
+    if typ == "bool":
+        return np.array(values, dtype=bool)
+    if typ.startswith(("uint", "int")):
+        signed = not typ.startswith("u")
+        if _bits(typ) <= 64:
+            return np.array(values, dtype=np.int64 if signed else np.uint64)
+        raw = b"".join(v.to_bytes(32, "big", signed=signed) for v in values)
+        return np.frombuffer(raw, dtype=np.uint8).reshape(len(values), 32)
+    if typ == "string":
+        return np.array(values, dtype=str)
+    return np.array(values, dtype=bytes)
+
+def _from_column(typ: str, column: np.ndarray) -> np.ndarray:
+    if typ.startswith(("uint", "int")) and _bits(typ) > 64:
+        signed = not typ.startswith("u")
+        # exact ints in object arrays, same as offchain/pool_model.py
+        ints = np.empty(len(column), dtype=object)
+        ints[:] = [int.from_bytes(row.tobytes(), "big", signed=signed) for row in column]
+        return ints
+    if re.fullmatch(r"bytes\d+", typ):
+        # numpy drops trailing null bytes from fixed width bytes
+        size = int(typ[5:])
+        values = np.empty(len(column), dtype=object)
+        values[:] = [v.ljust(size, b"\0") for v in column]
+        return values
+    return column
+
+class ColumnStore:
+    """
+    Append only columnar files. One dir per event and one .npz chunk per indexed block range e.g.
+    Deposit/000000000100-000000000199.npz with an array per column.
+    """
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def write(self, spec: EventSpec, from_block: int, to_block: int, rows: List[dict]):
+        path = self.root / spec.name / f"{from_block:012d}-{to_block:012d}.npz"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".unfinished.npz")
+        np.savez(tmp, **{ name: _to_column(typ, [r[name] for r in rows]) for name, typ in spec.columns })
+        os.replace(tmp, path)
+
+    def _chunks(self, event: str) -> List[Path]:
+        # zero padded so lexical order is block order. skips .unfinished files
+        return sorted((self.root / event).glob("*-*[0-9].npz"))
+
+    def truncate(self, from_block: int):
+        """
+        drop chunks starting at or after `from_block`. left behind if a crash happened before the cursor moved
+        """
+        for event in self.root.glob("*"):
+            for chunk in self._chunks(event.name):
+                if int(chunk.name.split("-")[0]) >= from_block:
+                    chunk.unlink()
+
+    def read(self, spec: EventSpec) -> Dict[str, np.ndarray]:
+        chunks = self._chunks(spec.name)
+        columns = {}
+        for name, typ in spec.columns:
+            parts = []
+            for chunk in chunks:
+                with np.load(chunk) as arrays:
+                    parts.append(arrays[name])
+            column = np.concatenate(parts) if parts else _to_column(typ, [])
+            columns[name] = _from_column(typ, column)
+        return columns
+
+class PoolIndexer:
+    """
+    @param source       where to pull logs from
+    @param root         dir for the cursor and column files
+    @param factory      PoolFactory to discover pools from. optional if all `pools` are known upfront
+    @param pools        pools to index in addition to factory deployments
+    @param start_block  first block to index on a fresh `root` e.g. factory deployment block
+    @param chunk_size   max blocks per eth_getLogs call
+    @param confirmations blocks behind head to stay so reorgs/unfinished blocks are never indexed
+    """
+    def __init__(
+        self, source: LogSource, root: Path,
+        factory: str = None, pools: Iterable[str] = (),
+        start_block: int = 0, chunk_size: int = 2000, confirmations: int = 0,
+        events: Iterable[str] = POOL_EVENTS, pool_abi: List[dict] = None, factory_abi: List[dict] = None,
+    ):
+        self.source = source
+        self.root = Path(root)
+        self.factory = factory.lower() if factory else None
+        self.chunk_size = chunk_size
+        self.confirmations = confirmations
+        self.pool_events = EventTable(pool_abi or load_abi(POOL_SOURCE), events)
+        self.factory_events = EventTable(factory_abi or load_abi(FACTORY_SOURCE), ["DeployPool"]) if factory else None
+        self.store = ColumnStore(self.root / "events")
+
+        self.cursor_path = self.root / "cursor.json"
+        cursor = json.loads(self.cursor_path.read_text()) if self.cursor_path.exists() else {}
+        self.next_block: int = cursor.get("next_block", start_block)
+        # insertion ordered set
+        self.pools: Dict[str, None] = dict.fromkeys(cursor.get("pools", []))
+        self.pools.update(dict.fromkeys(p.lower() for p in pools))
+
+    def _save_cursor(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.cursor_path.with_suffix(".unfinished")
+        tmp.write_text(json.dumps({ "next_block": self.next_block, "pools": list(self.pools) }))
+        os.replace(tmp, self.cursor_path)
+
+    def _get_logs(self, from_block: int, to_block: int, addresses: List[str], table: EventTable) -> List[Log]:
+        logs = []
+        for i in range(0, len(addresses), MAX_FILTER_ADDRESSES):
+            logs += self.source.get_logs(from_block, to_block, addresses[i:i + MAX_FILTER_ADDRESSES], table.topics)
+        return logs
+
+    def index_range(self, from_block: int, to_block: int) -> int:
+        """
+        index one block range and move cursor past it. returns # of pool events indexed
+        """
+        if self.factory:
+            for log in self._get_logs(from_block, to_block, [self.factory], self.factory_events):
+                _, row = self.factory_events.decode(log)
+                self.pools[row["pool"]] = None
+
+        rows: Dict[str, List[dict]] = {}
+        if self.pools:
+            logs = self._get_logs(from_block, to_block, list(self.pools), self.pool_events)
+            # logs dont include block time. one lookup per block with pool activity
+            timestamps = { b: self.source.block_timestamp(b) for b in sorted({ l.block_number for l in logs }) }
+            for log in sorted(logs, key=lambda l: (l.block_number, l.log_index)):
+                decoded = self.pool_events.decode(log, timestamps[log.block_number])
+                if decoded:
+                    rows.setdefault(decoded[0].name, []).append(decoded[1])
+
+        self.store.truncate(from_block)
+        for name, event_rows in rows.items():
+            self.store.write(self.pool_events.by_name[name], from_block, to_block, event_rows)
+
+        # only move cursor after data is on disk so a crash replays this range
+        self.next_block = to_block + 1
+        self._save_cursor()
+        return sum(len(r) for r in rows.values())
+
+    def sync(self, to_block: int = None) -> int:
+        """
+        index from cursor up to `to_block` (default chain head - confirmations). returns # of pool events indexed
+        """
+        head = self.source.block_number() - self.confirmations
+        to_block = head if to_block is None else min(to_block, head)
+        indexed = 0
+        while self.next_block <= to_block:
+            indexed += self.index_range(self.next_block, min(self.next_block + self.chunk_size - 1, to_block))
+        return indexed
+
+    def load(self, event: str) -> Dict[str, np.ndarray]:
+        """
+        every indexed `event` across all pools in (block_number, log_index) order
+        """
+        return self.store.read(self.pool_events.by_name[event])
@@ -0,0 +1,123 @@
+import numpy as np
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List
+from eth_abi import decode, encode
+from eth_utils import function_signature_to_4byte_selector
+from .indexer import load_abi
+from .rpc import BatchCaller, ChainClient
+
+# Decodes PoolLens views so a dashboard row or indexer snapshot of a pool costs one eth_call.
+#
+#   lens = PoolLensReader(JsonRpcClient(url), LENS_ADDRESS)
+#   states = await lens.pool_states(pools)   # { pool: { "price": ..., "fees": { "performance": ... }, ... } }
+#   columns = to_columns(states.values())    # same layout as PoolIndexer.load()
+#   holders = await lens.accounts_state(pool, accounts)  # { account: { "balance": ..., "max_withdraw": ... } }
+
+LENS_SOURCE = Path(__file__).parent.parent / "contracts" / "PoolLens.vy"
+# PoolLens.MAX_POOLS, PoolLens.MAX_ACCOUNTS
+MAX_POOLS = 100
+MAX_ACCOUNTS = 500
+ZERO_ADDRESS = "0x" + "00" * 20
+
+POOL_STATE_SELECTOR = function_signature_to_4byte_selector("pool_state(address)")
+POOL_STATES_SELECTOR = function_signature_to_4byte_selector("pool_states(address[])")
+ACCOUNTS_STATE_SELECTOR = function_signature_to_4byte_selector("accounts_state(address,address[],address)")
+
+def _abi_type(param: dict) -> str:
+    # eth_abi type string for an ABI param. structs are tuples of their components
+    typ = param["type"]
+    if typ.startswith("tuple"):
+        return "(" + ",".join(_abi_type(c) for c in param["components"]) + ")" + typ[len("tuple"):]
+    return typ
+
+def _named(param: dict, value):
+    # nest decoded tuples into dicts keyed by struct field names
+    if param["type"] == "tuple":
+        return { c["name"]: _named(c, v) for c, v in zip(param["components"], value) }
+    if param["type"] == "tuple[]":
+        return [_named({ **param, "type": "tuple" }, v) for v in value]
+    if param["type"] == "address":
+        return value.lower()
+    return value
+
+@lru_cache
+def _outputs(function: str, source: Path = LENS_SOURCE) -> dict:
+    abi = { f["name"]: f for f in load_abi(source) if f.get("type") == "function" }
+    return abi[function]["outputs"][0]
+
+def decode_output(function: str, data: bytes) -> dict | list:
+    """
+    decode return data of a PoolLens view into dicts keyed by struct field names
+    """
+    output = _outputs(function)
+    return _named(output, decode([_abi_type(output)], data)[0])
+
+def decode_pool_state(data: bytes) -> dict:
+    return decode_output("pool_state", data)
+
+def decode_pool_states(data: bytes) -> List[dict]:
+    return decode_output("pool_states", data)
+
+def decode_accounts_state(data: bytes) -> dict:
+    return decode_output("accounts_state", data)
+
+def to_columns(states: Iterable[dict]) -> Dict[str, np.ndarray]:
+    """
+    pool states as columns. nested structs are flattened to `struct_field` and uint256 stay exact python ints
+    """
+    rows = [_flatten(state) for state in states]
+    if not rows:
+        return {}
+    return { name: np.array([row[name] for row in rows], dtype=object) for name in rows[0] }
+
+def _flatten(state: dict, prefix: str = "") -> dict:
+    flat = {}
+    for name, value in state.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{name}_"))
+        else:
+            flat[prefix + name] = value
+    return flat
+
+class PoolLensReader:
+    def __init__(self, client: ChainClient, lens: str, concurrency: int = 8, batch_size: int = 10):
+        """
+        @param batch_size - pool_states() calls per request. each reads up to MAX_POOLS pools
+        """
+        self.lens = lens
+        self.rpc = BatchCaller(client, concurrency, batch_size)
+
+    async def pool_states(self, pools: Iterable[str]) -> Dict[str, dict]:
+        """
+        pool_state() of every pool keyed by lowercase address. pools that revert (e.g. not a pool) are left out
+        """
+        pools = [p.lower() for p in pools]
+        chunks = [pools[i:i + MAX_POOLS] for i in range(0, len(pools), MAX_POOLS)]
+        outputs = await self.rpc.call_many([
+            (self.lens, POOL_STATES_SELECTOR + encode(["address[]"], [chunk])) for chunk in chunks
+        ])
+        states = {}
+        for chunk, output in zip(chunks, outputs):
+            if output is not None:
+                states.update((state["pool"], state) for state in decode_pool_states(output))
+                continue
+            # one bad pool reverts its whole chunk so retry them one by one
+            singles = await self.rpc.call_many([(self.lens, POOL_STATE_SELECTOR + encode(["address"], [p])) for p in chunk])
+            states.update((p, decode_pool_state(o)) for p, o in zip(chunk, singles) if o is not None)
+        return states
+
+    async def accounts_state(self, pool: str, accounts: Iterable[str], spender: str = ZERO_ADDRESS) -> Dict[str, dict]:
+        """
+        accounts_state() rows for every account keyed by lowercase address. chunks are sent in the same batch so
+        they are read at the same block on nodes that serve a batch from one state
+        """
+        accounts = [a.lower() for a in accounts]
+        chunks = [accounts[i:i + MAX_ACCOUNTS] for i in range(0, len(accounts), MAX_ACCOUNTS)]
+        outputs = await self.rpc.call_many([
+            (self.lens, ACCOUNTS_STATE_SELECTOR + encode(["address", "address[]", "address"], [pool, chunk, spender]))
+            for chunk in chunks
+        ])
+        if any(output is None for output in outputs):
+            raise RuntimeError(f"accounts_state reverted for {pool}. not a pool?")
+        return { row["account"]: row for output in outputs for row in decode_accounts_state(output)["accounts"] }
@@ -0,0 +1,324 @@
+import numpy as np
+from typing import Dict, Tuple
+
+# DebtDAOPool constants
+MAX_UINT = 2**256 - 1
+FEE_COEFFICIENT = 10000 # 100% in bps
+VESTING_RATE_COEFFICIENT = 10**18
+# DebtDAOPool.PRICE_DECIMALS. NOT tests/boa/conftest.POOL_PRICE_DECIMALS
+PRICE_DECIMALS = 10**8
+UINT128_MASK = 2**128 - 1
+FOUR_EEKS_VESTING_RATE = (VESTING_RATE_COEFFICIENT // (4 * 32 * 2048 * 12)) // 10**6
+# NOTE: MUST be same order as Fees struct
+FEE_TYPES = ('performance', 'deposit', 'withdraw', 'flash', 'collector', 'referral')
+
+def uints(values, size: int | None = None) -> np.ndarray:
+    """
+    Exact integer array for the model. Token amounts are uint256 and overflow int64/uint64 after ~9 tokens
+    at 18 decimals so everything is stored as python ints in object arrays. NOT vectorized math, numpy
+    loops over every element in python. Arrays only batch scenarios behind one API, runtime is still
+    linear in `size` at roughly python int speed.
+    """
+    values = np.asarray(values)
+    arr = values.astype(object) if values.dtype != object else values
+    if size is not None:
+        arr = np.broadcast_to(arr, (size,))
+    return arr.copy()
+
+class PoolModel:
+    """
+    Reference model of DebtDAOPool accounting over `size` independent scenarios batched into arrays.
+    Mirrors contract integer math exactly, including rounding and the order fees are taken in.
+
+    Every action returns `(result, ok)`. `ok` is False for scenarios where the EVM would revert
+    (failed asserts, uint256 over/underflow) and their state is left untouched like a reverted tx.
+
+    Only pool level accounting is modelled. Account balances/allowances, owner only functions,
+    line/vault bookkeeping and snitch fees paid on impairment are not.
+    Fees minted to owner are always tracked in accrued_fees and referrers are never the owner.
+    """
+    STATE = (
+        'total_assets', 'total_supply', 'locked_profits', 'total_deployed',
+        'accrued_fees', 'delegate_stake', 'last_report', 'vesting_rate', 'pending_flash_fees',
+        'timestamp', 'min_deposit', 'max_assets',
+    )
+
+    def __init__(self, size: int, fees: Dict[str, object] | None = None, **state):
+        self.size = size
+        defaults = { 'vesting_rate': FOUR_EEKS_VESTING_RATE, 'min_deposit': 1, 'max_assets': MAX_UINT }
+        for name in self.STATE:
+            setattr(self, name, uints(state.get(name, defaults.get(name, 0)), size))
+        self.fees = { name: uints((fees or {}).get(name, 0), size) for name in FEE_TYPES }
+        self._ok = np.ones(size, dtype=bool)
+
+    ### State management
+
+    def _fork(self) -> 'PoolModel':
+        # arrays are never mutated in place so forks can share them until they are reassigned
+        pool = PoolModel.__new__(PoolModel)
+        pool.__dict__.update(self.__dict__)
+        pool._ok = np.ones(self.size, dtype=bool)
+        return pool
+
+    def _merge(self, pool: 'PoolModel') -> np.ndarray:
+        """
+        Apply state changes from `pool` for every scenario that didn't revert.
+        All math goes through _add/_sub/_mul so over/underflows are already in `pool._ok`
+        """
+        ok = pool._ok
+        for name in self.STATE:
+            value = getattr(pool, name)
+            if value is not getattr(self, name):
+                setattr(self, name, value if ok.all() else np.where(ok, value, getattr(self, name)))
+        return ok
+
+    def _check(self, condition) -> np.ndarray:
+        self._ok = self._ok & np.asarray(condition, dtype=bool)
+        return self._ok
+
+    def _add(self, a, b) -> np.ndarray:
+        result = a + b
+        self._check(result <= MAX_UINT)
+        return result
+
+    def _sub(self, a, b) -> np.ndarray:
+        self._check(a >= b)
+        return a - b
+
+    def _mul(self, a, b) -> np.ndarray:
+        result = a * b
+        self._check(result <= MAX_UINT)
+        return result
+
+    def _div(self, a, b) -> np.ndarray:
+        # callers guard against 0 like the contract does. avoid ZeroDivisionError in masked lanes
+        return a // np.where(b == 0, 1, b)
+
+    def warp(self, seconds):
+        self.timestamp = self.timestamp + uints(seconds, self.size)
+
+    ### Price math
+
+    def _calc_locked_profit(self) -> np.ndarray:
+        pct_profit_locked = self._mul(self._sub(self.timestamp, self.last_report), self.vesting_rate)
+        locking = pct_profit_locked < VESTING_RATE_COEFFICIENT
+        # contract skips the multiplication once everything has vested
+        vested = self._div(self._mul(np.where(locking, pct_profit_locked, 0), self.locked_profits), VESTING_RATE_COEFFICIENT)
+        return np.where(locking, self.locked_profits - vested, 0)
+
+    def _vault_assets(self) -> np.ndarray:
+        return self._sub(self.total_assets, self._calc_locked_profit())
+
+    def _virtual_price(self) -> np.ndarray:
+        assets = self._vault_assets()
+        price = self._div(self._mul(assets, PRICE_DECIMALS), np.maximum(1, self.total_supply))
+        return np.where(assets == 0, PRICE_DECIMALS, price)
+
+    def _max_liquid_assets(self) -> np.ndarray:
+        free_assets = self._sub(self.total_assets, self._calc_locked_profit())
+        return np.where(self.total_deployed > free_assets, 0, free_assets - self.total_deployed)
+
+    def _to_shares(self, assets, price) -> np.ndarray:
+        return np.where(price == 0, 0, self._div(self._mul(np.where(price == 0, 0, assets), PRICE_DECIMALS), price))
+
+    def _to_assets(self, shares, price) -> np.ndarray:
+        return self._mul(shares, price) // PRICE_DECIMALS
+
+    def _calc_fee(self, shares, fee) -> np.ndarray:
+        return self._mul(shares, fee) // FEE_COEFFICIENT
+
+    # views. same names as contract
+
+    def price(self) -> np.ndarray:
+        return self._virtual_price()
+
+    def totalAssets(self) -> np.ndarray:
+        return self.total_assets + self.pending_flash_fees
+
+    def locked_profit(self) -> np.ndarray:
+        return self._calc_locked_profit()
+
+    def liquid_assets(self) -> np.ndarray:
+        return self._max_liquid_assets()
+
+    def flashFee(self, amount) -> np.ndarray:
+        return self._calc_fee(np.minimum(uints(amount, self.size), self._max_liquid_assets()), self.fees['flash'])
+
+    ### Internal accounting
+
+    def _unlock_profits(self) -> np.ndarray:
+        locked_profit = self._calc_locked_profit()
+        vested_profits = self.locked_profits - locked_profit
+        self.locked_profits = locked_profit
+        # lock flash fees earned since last update
+        self.total_assets = self._add(self.total_assets, self.pending_flash_fees)
+        self.locked_profits = self._add(self.locked_profits, self.pending_flash_fees)
+        self.pending_flash_fees = uints(0, self.size)
+        self.last_report = self.timestamp
+        return vested_profits
+
+    def _calc_and_mint_fee(self, shares, fee, to_owner: bool = True) -> np.ndarray:
+        fees = self._calc_fee(shares, fee)
+        self.total_supply = self._add(self.total_supply, fees)
+        if to_owner:
+            self.accrued_fees = self._add(self.accrued_fees, fees)
+        return fees
+
+    def _deposit(self, assets, shares, referred) -> np.ndarray:
+        self._check(shares > 0)
+        self._check(assets >= self.min_deposit)
+        self._check(self._add(self.total_assets, assets) <= self.max_assets)
+
+        self._calc_and_mint_fee(shares, self.fees['deposit'])
+        self._calc_and_mint_fee(np.where(referred, shares, 0), self.fees['referral'], to_owner=False)
+
+        self.total_assets = self._add(self.total_assets, assets)
+        self.total_supply = self._add(self.total_supply, shares)
+        return shares
+
+    def _burn_and_withdraw(self, shares, assets):
+        self._check(shares <= self.total_supply)
+        self._check(assets <= self._max_liquid_assets())
+        remaining_assets = self._sub(self.total_assets, assets)
+        self._check((remaining_assets == 0) | (remaining_assets >= self.min_deposit))
+
+        self.total_assets = remaining_assets
+        self.total_supply = self._sub(self.total_supply, shares)
+
+    def _update_shares(self, assets, impair=False) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        @return diff in pool assets (earned or lost), owner fees burned
+        """
+        self._unlock_profits()
+        impair = np.broadcast_to(np.asarray(impair, dtype=bool), (self.size,))
+        # profit and loss branches are no-ops for 0 assets so run both over their own lanes
+        profit = np.where(impair, 0, assets)
+        self.total_assets = self._add(self.total_assets, profit)
+        self.locked_profits = self._add(self.locked_profits, profit)
+
+        loss = np.where(impair, assets, 0)
+        stake_to_burn = self._add(self.delegate_stake, self.accrued_fees)
+        price = self._virtual_price()
+        stake_to_burn = np.minimum(stake_to_burn, self._to_shares(loss, price))
+        burned_assets = self._to_assets(stake_to_burn, price)
+
+        self.total_assets = self._sub(self.total_assets, loss)
+
+        # accrued fees are burned first and the rest comes out of delegate_stake
+        burn_stake = stake_to_burn > self.accrued_fees
+        self.delegate_stake = self._sub(self.delegate_stake, np.where(burn_stake, stake_to_burn - np.minimum(stake_to_burn, self.accrued_fees), 0))
+        self.accrued_fees = np.where(burn_stake, 0, self._sub(self.accrued_fees, np.where(burn_stake, 0, stake_to_burn)))
+        self.total_supply = self._sub(self.total_supply, stake_to_burn)
+
+        pool_assets_lost = self._sub(loss, burned_assets)
+        self.locked_profits = np.where(self.locked_profits >= pool_assets_lost, self.locked_profits - pool_assets_lost, 0)
+
+        return np.where(impair, pool_assets_lost, profit), stake_to_burn
+
+    def _take_performance_fee(self, interest_earned, by_owner=False) -> np.ndarray:
+        price = self._virtual_price()
+        performance_fee = self._calc_and_mint_fee(self._to_shares(interest_earned, price), self.fees['performance'])
+
+        collector_assets = self._calc_fee(interest_earned, self.fees['collector'])
+        paid = (collector_assets != 0) & ~np.asarray(by_owner, dtype=bool)
+        self.total_assets = self._sub(self.total_assets, np.where(paid, collector_assets, 0))
+        return performance_fee + np.where(paid, self._to_shares(collector_assets, price), 0)
+
+    ### Actions. Same names and return values as contract functions
+
+    def _apply(self, action) -> Tuple[np.ndarray, np.ndarray]:
+        pool = self._fork()
+        result = action(pool)
+        ok = self._merge(pool)
+        return np.where(ok, result, 0), ok
+
+    def unlock_profits(self) -> Tuple[np.ndarray, np.ndarray]:
+        return self._apply(lambda pool: pool._unlock_profits())
+
+    def deposit(self, assets, referred=False) -> Tuple[np.ndarray, np.ndarray]:
+        assets = uints(assets, self.size)
+        def deposit(pool):
+            pool._unlock_profits()
+            return pool._deposit(assets, pool._to_shares(assets, pool._virtual_price()), referred)
+        return self._apply(deposit)
+
+    def mint(self, shares, referred=False) -> Tuple[np.ndarray, np.ndarray]:
+        shares = uints(shares, self.size)
+        def mint(pool):
+            pool._unlock_profits()
+            # price before minflation fees
+            assets = pool._to_assets(shares, pool._virtual_price())
+            pool._deposit(assets, shares, referred)
+            return assets
+        return self._apply(mint)
+
+    def stake_assets(self, assets) -> Tuple[np.ndarray, np.ndarray]:
+        assets = uints(assets, self.size)
+        def stake_assets(pool):
+            pool._check(assets != 0)
+            # no _unlock_profits. uses stale price same as contract
+            shares = pool._deposit(assets, pool._to_shares(assets, pool._virtual_price()), False)
+            pool.delegate_stake = pool._add(pool.delegate_stake, shares)
+            return shares
+        return self._apply(stake_assets)
+
+    def withdraw(self, assets) -> Tuple[np.ndarray, np.ndarray]:
+        assets = uints(assets, self.size)
+        def withdraw(pool):
+            pool._unlock_profits()
+            price = pool._virtual_price()
+            shares = pool._to_shares(assets, price)
+            # withdrawer burns extra shares as fee, assets stay constant
+            burned_shares = pool._add(shares, pool._calc_fee(shares, pool.fees['withdraw']))
+            pool._burn_and_withdraw(burned_shares, assets)
+            return burned_shares
+        return self._apply(withdraw)
+
+    def redeem(self, shares) -> Tuple[np.ndarray, np.ndarray]:
+        shares = uints(shares, self.size)
+        def redeem(pool):
+            pool._unlock_profits()
+            price = pool._virtual_price()
+            withdraw_fee = pool._calc_fee(shares, pool.fees['withdraw'])
+            # receive less assets than shares bc of withdraw fee
+            assets_minus_fees = pool._sub(pool._to_assets(shares, price), pool._to_assets(withdraw_fee, price))
+            pool._burn_and_withdraw(shares, assets_minus_fees)
+            return assets_minus_fees
+        return self._apply(redeem)
+
+    def update_shares(self, assets, impair=False) -> Tuple[Tuple[np.ndarray, np.ndarray], np.ndarray]:
+        """
+        Book a profit or realize a loss the same as `self._update_shares()` without any line/vault accounting
+        @return ((diff in pool assets, owner fees burned), ok)
+        """
+        assets = uints(assets, self.size)
+        pool = self._fork()
+        diff, burned = pool._update_shares(assets, impair)
+        ok = self._merge(pool)
+        return (np.where(ok, diff, 0), np.where(ok, burned, 0)), ok
+
+    def collect_interest(self, interest, by_owner=False) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Interest claimed from a line like `_reduce_credit()`. Books profit then takes performance + collector fees
+        """
+        interest = uints(interest, self.size)
+        def collect_interest(pool):
+            pool._check(interest != 0)
+            pool._update_shares(interest)
+            pool._take_performance_fee(interest, by_owner)
+            return interest
+        return self._apply(collect_interest)
+
+    def flashLoan(self, amount) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        @return (fee paid, ok)
+        """
+        amount = uints(amount, self.size)
+        def flash_loan(pool):
+            liquid_assets = pool._max_liquid_assets()
+            pool._check(amount <= liquid_assets)
+            fee = pool._calc_fee(np.minimum(amount, liquid_assets), pool.fees['flash'])
+            pool.pending_flash_fees = pool._add(pool.pending_flash_fees, fee)
+            pool._check(pool.pending_flash_fees <= UINT128_MASK)
+            return fee
+        return self._apply(flash_loan)
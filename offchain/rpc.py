@@ -0,0 +1,101 @@
+import json
+import asyncio
+import urllib.request
+from typing import Dict, List, Protocol, Sequence, Tuple
+
+# Async chain access shared by keepers. Clients batch many eth_calls into one request and BatchCaller
+# splits large call lists into batches and bounds how many requests are in flight at once.
+
+class ChainClient(Protocol):
+    async def call_many(self, calls: Sequence[Tuple[str, bytes]]) -> List[bytes | None]:
+        """
+        eth_call every (to, data) from the keeper in one request. None for calls that revert
+        """
+        ...
+
+    async def send(self, to: str, data: bytes) -> str:
+        """
+        send tx from keeper and return its hash
+        """
+        ...
+
+    async def gas_price(self) -> int:
+        ...
+
+class JsonRpcClient:
+    """
+    Batched JSON-RPC. Transactions go through eth_sendTransaction so `sender` must be unlocked on the node
+    e.g. a local anvil from `ape-config.yaml` or a node with the keeper key loaded
+    """
+    def __init__(self, url: str = "http://127.0.0.1:8555", sender: str | None = None, timeout: int = 30):
+        self.url = url
+        self.sender = sender
+        self.timeout = timeout
+        self._id = 0
+
+    def _post(self, body) -> list | dict:
+        request = urllib.request.Request(self.url, json.dumps(body).encode(), { "Content-Type": "application/json" })
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    def _tx(self, to: str, data: bytes) -> dict:
+        tx = { "to": to, "data": "0x" + data.hex() }
+        return { "from": self.sender, **tx } if self.sender else tx
+
+    def _request(self, method: str, params: list) -> dict:
+        self._id += 1
+        return { "jsonrpc": "2.0", "id": self._id, "method": method, "params": params }
+
+    async def _call(self, method: str, params: list):
+        # urllib blocks so run off the event loop
+        response = await asyncio.to_thread(self._post, self._request(method, params))
+        if "error" in response:
+            raise RuntimeError(f"{method} failed: {response['error']}")
+        return response["result"]
+
+    async def call_many(self, calls: Sequence[Tuple[str, bytes]]) -> List[bytes | None]:
+        if not calls:
+            return []
+        requests = [self._request("eth_call", [self._tx(to, data), "latest"]) for to, data in calls]
+        # responses can come back in any order
+        responses = { r["id"]: r for r in await asyncio.to_thread(self._post, requests) }
+        return [
+            bytes.fromhex(responses[r["id"]]["result"][2:]) if "result" in responses[r["id"]] else None
+            for r in requests
+        ]
+
+    async def send(self, to: str, data: bytes) -> str:
+        return await self._call("eth_sendTransaction", [self._tx(to, data)])
+
+    async def gas_price(self) -> int:
+        return int(await self._call("eth_gasPrice", []), 16)
+
+class BatchCaller:
+    def __init__(self, client: ChainClient, concurrency: int = 8, batch_size: int = 100):
+        """
+        @param concurrency - max RPC requests in flight
+        @param batch_size - max eth_calls per request
+        """
+        self.client = client
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self._semaphores: Dict[asyncio.AbstractEventLoop, asyncio.Semaphore] = {}
+
+    def _limit(self) -> asyncio.Semaphore:
+        # semaphores are bound to the loop they are first used in
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores = { loop: asyncio.Semaphore(self.concurrency) }
+        return self._semaphores[loop]
+
+    async def call_many(self, calls: Sequence[Tuple[str, bytes]]) -> List[bytes | None]:
+        batches = [calls[i:i + self.batch_size] for i in range(0, len(calls), self.batch_size)]
+        async def call(batch):
+            async with self._limit():
+                return await self.client.call_many(batch)
+        results = await asyncio.gather(*(call(batch) for batch in batches))
+        return [output for batch in results for output in batch]
+
+    async def send(self, to: str, data: bytes) -> str:
+        async with self._limit():
+            return await self.client.send(to, data)
@@ -0,0 +1,258 @@
+import numpy as np
+from typing import Dict, List, Tuple
+from .indexer import PoolIndexer
+
+# Rebuilds DebtDAOPool share price history from its indexed events alone so yield can be charted without
+# polling price() on a node. Events are replayed into the storage vars behind _virtual_price()
+# (total_assets, total_supply, locked_profits, last_report, vesting_rate) and every query runs the same
+# integer math as _calc_locked_profit/_virtual_price batched over timestamps.
+#
+#   history = SharePriceHistory.from_indexer(indexer, pool)
+#   history.price(np.arange(start, end)) # exact price every second
+#   history.apr(end - 7 * 86400, end)     # trailing 7 day APR in bps
+
+# DebtDAOPool constants
+PRICE_DECIMALS = 10**8
+VESTING_RATE_COEFFICIENT = 10**18
+# FEE_TYPES enum values emitted as RevenueGenerated.fee_type
+PERFORMANCE_FEE, FLASH_FEE, COLLECTOR_FEE = 1, 8, 16
+ZERO_ADDRESS = "0x" + "00" * 20
+BPS = 10_000
+ONE_YEAR_IN_SEC = 60 * 60 * 24 * 365
+
+# every event that moves pool storage used for share price
+REPLAY_EVENTS = ("Deposit", "Withdraw", "Transfer", "RevenueGenerated", "UnlockProfits", "UpdateProfitVestingRate", "Impair", "DivestVault")
+STATE = ("total_assets", "total_supply", "locked_profits", "last_report", "vesting_rate")
+
+def merge_events(events: Dict[str, Dict[str, np.ndarray]], pool: str) -> List[Tuple[str, dict]]:
+    """
+    (event name, row) for every event emitted by `pool` in chain order from per event columns like PoolIndexer.load()
+    """
+    pool = pool.lower()
+    rows = []
+    for name, columns in events.items():
+        for i in np.flatnonzero(columns["address"] == pool):
+            row = { column: values[i] for column, values in columns.items() }
+            rows.append((int(row["block_number"]), int(row["log_index"]), name, row))
+    rows.sort(key=lambda r: r[:2])
+    return [(name, row) for _, _, name, row in rows]
+
+def _ints(values) -> np.ndarray:
+    # uint256 math overflows int64 so keep exact python ints. same as offchain/pool_model.py
+    values = np.asarray(values)
+    return values.astype(object) if values.dtype != object else values
+
+class SharePriceHistory:
+    """
+    Pool storage after every event it emitted.
+
+    Interest collected from lines has no event with the exact amount. It is backed out of the next UnlockProfits
+    (locked_profits before unlocking = amount + remaining - pending flash fees) and added to every state since the
+    previous unlock, which is the tx it was collected in. Until the next unlock, interest is estimated from the
+    performance fee RevenueGenerated event so prices after `settled_until` can be off by rounding dust.
+
+    Events MUST start from pool deployment, replaying from the middle of pool history has no starting state.
+    """
+    def __init__(self, pool: str, events: List[Tuple[str, dict]]):
+        self.pool = pool.lower()
+        # state before first event. no assets is always PRICE_DECIMALS
+        self.total_assets = self.total_supply = self.locked_profits = self.last_report = self.vesting_rate = 0
+        self.pending_flash_fees = 0
+        # interest booked from performance fees that an exact amount may replace later in the same tx
+        self._estimated_interest = 0
+        # price + shares of the last delegate stake/fees burned to cover a loss. needed to split vault losses
+        self._loss_burn = (0, 0)
+
+        self._timestamps: List[int] = [0]
+        self._states: Dict[str, List[int]] = { name: [0] for name in STATE }
+        self._last_unlock = 0
+        self.settled_until = 0
+        # state index -> profit locked there. line interest, flash fees and vault gains
+        self._profits: Dict[int, int] = {}
+
+        for name, row in events:
+            getattr(self, f"_on_{name}", self._on_other)(row)
+            self._timestamps.append(int(row["timestamp"]))
+            for var in STATE:
+                self._states[var].append(getattr(self, var))
+
+        self.timestamps = np.array(self._timestamps, dtype=np.int64)
+        self.states = { name: _ints(values) for name, values in self._states.items() }
+
+    @classmethod
+    def from_indexer(cls, indexer: PoolIndexer, pool: str) -> 'SharePriceHistory':
+        return cls(pool, merge_events({ name: indexer.load(name) for name in REPLAY_EVENTS }, pool))
+
+    ### Replay
+
+    def _price(self) -> int:
+        # _virtual_price() at the time of the current event. only called right after an unlock so nothing has vested
+        assets = self.total_assets - self.locked_profits
+        return PRICE_DECIMALS if assets == 0 else assets * PRICE_DECIMALS // max(1, self.total_supply)
+
+    def _book_profit(self, assets: int):
+        """
+        _update_shares(assets) for profits. always called right after an unlock in the same tx so it also applies to
+        every state since then
+        """
+        for i in range(self._last_unlock, len(self._timestamps)):
+            self._states["total_assets"][i] += assets
+            self._states["locked_profits"][i] += assets
+        self._profits[self._last_unlock] = self._profits.get(self._last_unlock, 0) + assets
+        self.total_assets += assets
+        self.locked_profits += assets
+
+    def _book_loss(self, assets: int, pool_assets_lost: int):
+        # _update_shares(assets, True)
+        self.total_assets -= assets
+        self.locked_profits = self.locked_profits - pool_assets_lost if self.locked_profits >= pool_assets_lost else 0
+
+    def _on_UnlockProfits(self, row: dict):
+        # line interest since last unlock. estimates round down so this is never negative
+        unbooked = row["amount"] + row["remaining"] - self.pending_flash_fees - self.locked_profits
+        if unbooked < 0:
+            raise ValueError(f"pool {self.pool} lost track of locked profits at block {row['block_number']}. missing events?")
+        if unbooked != 0:
+            self._book_profit(unbooked)
+
+        self.total_assets += self.pending_flash_fees
+        if self.pending_flash_fees:
+            i = len(self._timestamps)
+            self._profits[i] = self._profits.get(i, 0) + self.pending_flash_fees
+        self.locked_profits = row["remaining"]
+        self.last_report = int(row["timestamp"])
+        self.vesting_rate = int(row["vesting_rate"])
+        self.pending_flash_fees = self._estimated_interest = 0
+        self._last_unlock = len(self._timestamps)
+        self.settled_until = self.last_report
+
+    def _on_UpdateProfitVestingRate(self, row: dict):
+        # last_report is unchanged so new rate applies to time already elapsed
+        self.vesting_rate = int(row["degredation"])
+
+    def _on_Deposit(self, row: dict):
+        self.total_assets += row["assets"]
+
+    def _on_Withdraw(self, row: dict):
+        self.total_assets -= row["assets"]
+
+    def _on_Transfer(self, row: dict):
+        if row["sender"] == ZERO_ADDRESS:
+            self.total_supply += row["amount"]
+        elif row["receiver"] == ZERO_ADDRESS:
+            if row["sender"] == self.pool:
+                # only _update_shares burns pool owned shares
+                self._loss_burn = (self._price(), row["amount"])
+            self.total_supply -= row["amount"]
+
+    def _on_RevenueGenerated(self, row: dict):
+        fee_type = int(row["fee_type"])
+        if fee_type == FLASH_FEE:
+            self.pending_flash_fees += row["revenue"]
+        elif fee_type == PERFORMANCE_FEE and row["payer"] == self.pool:
+            # amount is interest in shares at the post profit price, which profit doesnt change bc its all locked
+            estimate = row["amount"] * self._price() // PRICE_DECIMALS
+            self._book_profit(estimate - self._estimated_interest)
+            self._estimated_interest = estimate
+        elif fee_type == COLLECTOR_FEE:
+            # amount is exact interest
+            self._book_profit(row["amount"] - self._estimated_interest)
+            self._estimated_interest = row["amount"]
+            self.total_assets -= row["revenue"]
+
+    def _on_Impair(self, row: dict):
+        interest, principal = row["interest_earned"], row["realized_loss"]
+        if interest > principal:
+            self._book_profit(interest - principal)
+        else:
+            self._book_loss(principal - interest, row["net_asset_loss"])
+
+    def _on_DivestVault(self, row: dict):
+        net = row["profit_or_loss"]
+        # NOTE: `is_profit` is logged with is_loss
+        if row["is_profit"]:
+            price, burned_shares = self._loss_burn
+            self._book_loss(net, net - burned_shares * price // PRICE_DECIMALS)
+        elif net != 0:
+            # performance fee on divested profit was already estimated as line interest
+            self._book_profit(net - self._estimated_interest)
+            self._estimated_interest = net
+
+    def _on_other(self, row: dict):
+        pass
+
+    ### Queries
+
+    def state_at(self, timestamps) -> Dict[str, np.ndarray]:
+        """
+        pool storage at the end of the block with each timestamp. always 1d
+        """
+        # 1d so object arrays never collapse to python ints that numpy casts back to int64
+        i = np.searchsorted(self.timestamps, np.atleast_1d(np.asarray(timestamps, dtype=np.int64)), side="right") - 1
+        return { name: values[i] for name, values in self.states.items() }
+
+    def locked_profit(self, timestamps) -> np.ndarray:
+        """
+        _calc_locked_profit() at each timestamp
+        """
+        state = self.state_at(timestamps)
+        pct_profit_locked = (_ints(np.atleast_1d(timestamps)) - state["last_report"]) * state["vesting_rate"]
+        locked = state["locked_profits"]
+        locked = np.where(pct_profit_locked < VESTING_RATE_COEFFICIENT, locked - pct_profit_locked * locked // VESTING_RATE_COEFFICIENT, 0)
+        return locked.reshape(np.shape(timestamps))
+
+    def free_profit(self, timestamps) -> np.ndarray:
+        """
+        profit vested since last report that unlock_profits() would release at each timestamp
+        """
+        return self.state_at(timestamps)["locked_profits"].reshape(np.shape(timestamps)) - self.locked_profit(timestamps)
+
+    def price(self, timestamps) -> np.ndarray:
+        """
+        _virtual_price() at each timestamp
+        """
+        state = self.state_at(timestamps)
+        assets = state["total_assets"] - self.locked_profit(timestamps).ravel()
+        price = np.where(assets == 0, PRICE_DECIMALS, assets * PRICE_DECIMALS // np.maximum(1, state["total_supply"]))
+        return price.reshape(np.shape(timestamps))
+
+    def apr(self, start, end) -> np.ndarray:
+        """
+        realized share price growth from `start` to `end` annualized in bps. + for good boi, - for bad gurl
+        """
+        start, end = np.asarray(start, dtype=np.int64), np.asarray(end, dtype=np.int64)
+        p0, p1 = self.price(start).astype(float), self.price(end).astype(float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return (p1 - p0) / p0 * BPS * ONE_YEAR_IN_SEC / (end - start)
+
+    def revenue(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        profit booked into locked_profits per timestamp and total_assets before it was booked.
+        input for offchain/vesting.py sweeps
+        """
+        revenue: Dict[int, List[int]] = {}
+        for i, profit in sorted(self._profits.items()):
+            if profit <= 0:
+                continue
+            timestamp = int(self.timestamps[i])
+            if timestamp not in revenue:
+                revenue[timestamp] = [0, self.states["total_assets"][i] - profit]
+            revenue[timestamp][0] += profit
+        timestamps = np.array(list(revenue), dtype=np.int64)
+        return timestamps, _ints([r[0] for r in revenue.values()]), _ints([r[1] for r in revenue.values()])
+
+    def series(self, start: int, end: int, step: int = 1) -> Dict[str, np.ndarray]:
+        """
+        price and profits every `step` seconds in [start, end)
+        """
+        timestamps = np.arange(start, end, step, dtype=np.int64)
+        locked = self.locked_profit(timestamps)
+        state = self.state_at(timestamps)
+        return {
+            "timestamp": timestamps,
+            "price": self.price(timestamps),
+            "locked_profit": locked,
+            "free_profit": state["locked_profits"] - locked,
+            "total_assets": state["total_assets"],
+            "total_supply": state["total_supply"],
+        }
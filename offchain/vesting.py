@@ -0,0 +1,142 @@
+import numpy as np
+from dataclasses import dataclass, fields
+from typing import Dict, Tuple
+from .pool_model import PoolModel, FEE_COEFFICIENT, VESTING_RATE_COEFFICIENT, uints
+from .share_price import SharePriceHistory, ONE_YEAR_IN_SEC, BPS
+
+# Sweeps profit vesting rates against a revenue stream to pick set_vesting_rate() per pool.
+# Fast vesting passes yield to depositors sooner but makes price jump when profits are booked so
+# just-in-time deposits can skim locked_profits. Slow vesting is smooth but holds yield back.
+# Every candidate rate is a lane in one PoolModel so thousands of rates run in a single replay of the revenue.
+#
+#   sweep = sweep_vesting_rates(*history.revenue(), fees=deposit_fee + withdraw_fee)
+#   sweep.recommend() # fastest rate where JIT deposits dont pay
+#
+# Revenue streams come from indexed pool history (SharePriceHistory.revenue) or simulate_revenue()
+
+BLOCK_TIME = 12
+ONE_DAY_IN_SEC = 60 * 60 * 24
+# pool size revenue is replayed on. only ratios are measured so any size with enough precision works
+BASE_ASSETS = 10**27
+
+def candidate_rates(fastest: int = 60 * 60, slowest: int = 365 * ONE_DAY_IN_SEC, count: int = 2000) -> np.ndarray:
+    """
+    `count` vesting rates log spaced between fully vesting in `fastest` and `slowest` seconds
+    """
+    rates = np.geomspace(VESTING_RATE_COEFFICIENT // slowest, VESTING_RATE_COEFFICIENT // fastest, count)
+    return np.unique(rates.astype(np.int64))
+
+def simulate_revenue(
+    apr: int = 1000, interval: int = ONE_DAY_IN_SEC, periods: int = 365,
+    jitter: float = 0.5, skip_probability: float = 0.1, seed=None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    interest collected every `interval` seconds earning `apr` bps on BASE_ASSETS. keepers dont always collect on
+    time (`skip_probability`) and amounts vary by +-`jitter`
+    @return (timestamps, profits)
+    """
+    rng = np.random.default_rng(seed)
+    collected = rng.random(periods) >= skip_probability
+    timestamps = np.arange(1, periods + 1, dtype=np.int64)[collected] * interval
+    elapsed = np.diff(timestamps, prepend=0)
+    noise = 1 + rng.uniform(-jitter, jitter, len(timestamps))
+    profits = BASE_ASSETS * apr / BPS * elapsed / ONE_YEAR_IN_SEC * noise
+    return timestamps, np.array([int(p) for p in profits], dtype=object)
+
+@dataclass
+class VestingSweep:
+    """
+    Metrics per candidate rate. Returns are fractions of share price, 0.01 = 1%
+    """
+    rates: np.ndarray
+    max_jump: np.ndarray        # biggest share price increase in the block after profit is booked
+    jit_return: np.ndarray      # avg return from depositing when profit is booked and exiting `hold` seconds later
+                                # beyond revenue earned while deposited, net of fees
+    apr_mean: np.ndarray        # mean realized APR in bps over `window` buckets
+    apr_volatility: np.ndarray  # stdev of realized APR in bps over `window` buckets
+    locked_share: np.ndarray    # avg share of pool assets held back as locked profit
+
+    def recommend(self, max_jit_return: float = 0.0, max_jump: float | None = None) -> int:
+        """
+        fastest vesting rate whose JIT return doesnt beat `max_jit_return` (e.g. gas cost as a share of deposit size)
+        and whose price never jumps more than `max_jump` in a block. slowest candidate if none qualify.
+        """
+        ok = self.jit_return <= max_jit_return
+        if max_jump is not None:
+            ok &= self.max_jump <= max_jump
+        return int(self.rates[ok].max() if ok.any() else self.rates.min())
+
+    def table(self) -> Dict[str, np.ndarray]:
+        return { f.name: getattr(self, f.name) for f in fields(self) }
+
+def sweep_vesting_rates(
+    timestamps, profits, total_assets=None, rates=None,
+    hold: int = ONE_DAY_IN_SEC, window: int = ONE_DAY_IN_SEC, fees: int = 0,
+) -> VestingSweep:
+    """
+    replay profits booked at `timestamps` on a pool for every candidate rate at once
+    @param total_assets - pool assets at each profit so streams from growing pools keep their yield. None if profits
+        are already relative to BASE_ASSETS
+    @param hold - seconds a JIT depositor stays in the pool
+    @param fees - deposit + withdraw fees in bps a JIT depositor pays
+    """
+    rates = candidate_rates() if rates is None else np.asarray(rates, dtype=np.int64)
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    profits = uints(profits)
+    if total_assets is not None:
+        profits = profits * BASE_ASSETS // np.maximum(uints(total_assets), 1)
+
+    start, end = int(timestamps[0]), int(timestamps[-1]) + hold
+    pool = PoolModel(len(rates), total_assets=BASE_ASSETS, total_supply=BASE_ASSETS, vesting_rate=rates, last_report=start, timestamp=start)
+
+    # (timestamp, kind, index) so profit is booked before prices are read in the same second
+    BOOK, BOOKED, NEXT_BLOCK, EXIT, GRID = range(5)
+    grid = np.arange(start, end + 1, window, dtype=np.int64)
+    schedule = sorted(
+        [(int(t), kind, i) for i, t in enumerate(timestamps) for kind in (BOOK, BOOKED)]
+        + [(int(t) + BLOCK_TIME, NEXT_BLOCK, i) for i, t in enumerate(timestamps)]
+        + [(int(t) + hold, EXIT, i) for i, t in enumerate(timestamps)]
+        + [(int(t), GRID, i) for i, t in enumerate(grid)]
+    )
+    # supply never changes so vault assets are price without PRICE_DECIMALS rounding, which hides per block moves
+    prices = np.zeros((4, len(timestamps), len(rates)))
+    grid_prices = np.zeros((len(grid), len(rates)))
+    locked = np.zeros((len(grid), len(rates)))
+    booked_assets = np.zeros(len(timestamps))
+    now = start
+    for t, kind, i in schedule:
+        pool.warp(t - now)
+        now = t
+        if kind == BOOK:
+            # same in every lane, vesting only changes when profit reaches price
+            booked_assets[i] = float(pool.total_assets[0])
+            pool.update_shares(profits[i])
+        elif kind == GRID:
+            grid_prices[i] = pool._vault_assets().astype(float) / BASE_ASSETS
+            locked[i] = pool.locked_profit().astype(float) / pool.total_assets.astype(float)
+        else:
+            prices[kind, i] = pool._vault_assets().astype(float) / BASE_ASSETS
+
+    booked, next_block, exit = prices[BOOKED], prices[NEXT_BLOCK], prices[EXIT]
+    # revenue earned while a JIT depositor is in the pool is theirs. anything above that was earned before they came in
+    growth = np.cumprod(np.concatenate(([1.0], 1 + profits.astype(float) / booked_assets)))
+    joined = np.searchsorted(timestamps, timestamps, side="right")
+    left = np.searchsorted(timestamps, timestamps + hold, side="right")
+    earned = growth[left] / growth[joined] - 1
+    jit = (exit - booked) / booked - earned[:, None] - fees / FEE_COEFFICIENT
+    aprs = (grid_prices[1:] - grid_prices[:-1]) / grid_prices[:-1] * BPS * ONE_YEAR_IN_SEC / window
+    return VestingSweep(
+        rates=rates,
+        max_jump=((next_block - booked) / booked).max(axis=0),
+        jit_return=jit.mean(axis=0),
+        apr_mean=aprs.mean(axis=0),
+        apr_volatility=aprs.std(axis=0),
+        locked_share=locked.mean(axis=0),
+    )
+
+def recommend_vesting_rate(history: SharePriceHistory, max_jit_return: float = 0.0, **kwargs) -> int:
+    """
+    recommended set_vesting_rate() for a pool from its own revenue history
+    """
+    timestamps, profits, total_assets = history.revenue()
+    return sweep_vesting_rates(timestamps, profits, total_assets, **kwargs).recommend(max_jit_return)
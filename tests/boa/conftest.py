@@ -1,34 +1,102 @@
+import os
 import boa
 import math
+import random
+import fcntl
 import pytest
 import logging
 
+from pathlib import Path
 from eip712.messages import EIP712Message
+from hypothesis import HealthCheck, settings
+from vyper.exceptions import VyperException
+from .utils.compile_cache import set_compile_cache, REPO_ROOT
+from .utils.events import EventRecorder
 
-# boa.interpret.set_cache_dir()
-# boa.reset_env()
 logging.basicConfig(format='%(asctime)s - %(message)s', level=logging.INFO)
 
+# content addressed compile cache shared by all pytest-xdist workers and runs.
+# set BOA_COMPILE_CACHE to a dir your CI caches/restores to skip compiling on cold starts
+COMPILE_CACHE_DIR = Path(os.environ.get("BOA_COMPILE_CACHE", "~/.cache/titanoboa")).expanduser()
+COMPILE_CACHE_LOCK = COMPILE_CACHE_DIR / "warm.lock"
+# set by pytest-xdist in worker processes e.g. gw0. None when running serially
+XDIST_WORKER = os.environ.get("PYTEST_XDIST_WORKER")
+set_compile_cache(COMPILE_CACHE_DIR)
+
 ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
 MAX_UINT = 115792089237316195423570985008687907853269984665640564039457584007913129639935
 INIT_POOL_BALANCE =  10**25  # 1M @ 18 decimals
 INIT_USER_POOL_BALANCE = 5*10**24
 POOL_PRICE_DECIMALS=1e18
 
+# `pytest -n auto` runs each xdist worker in its own process with its own boa env.
+# Results match a serial run bc every test rolls back to the same world (_isolation) and only the compile cache is shared
+@pytest.fixture(scope="session", autouse=True)
+def _compile_cache():
+    """
+    First worker compiles every contract and mock into the shared cache while holding the lock.
+    Other workers wait for it then only read from the cache instead of all compiling the same contracts at once
+    """
+    if not XDIST_WORKER:
+        return
+
+    COMPILE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    with open(COMPILE_CACHE_LOCK, "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        for source in sorted([*(REPO_ROOT / "contracts").glob("*.vy"), *(REPO_ROOT / "tests/mocks").glob("*.vy")]):
+            try:
+                # same relative name tests load it with, cached CompilerData keeps the name it was compiled under
+                boa.load_partial(str(source.relative_to(REPO_ROOT)))
+            except VyperException:
+                pass # e.g. PoolFactory needs a newer vyper than installed. tests that use it are skipped
+
+# boa.test.plugin anchors every hypothesis example so function scoped fixtures (e.g. _isolation) are safe to share across examples
+settings.register_profile("boa", suppress_health_check=[HealthCheck.function_scoped_fixture])
+settings.load_profile("boa")
+
+# Contracts are deployed once per session by session scoped fixtures.
+# Every test (and its function scoped fixtures like init_token_balances) runs inside an anchor
+# that is rolled back afterwards so tests always start from that same world regardless of order.
+# No opt out, anything a test changes including session contracts and block time is rolled back.
+@pytest.fixture(autouse=True)
+def _isolation():
+    with boa.env.anchor():
+        yield
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--shuffle", type=int, default=None, metavar="SEED",
+        help="run tests in a random order seeded by SEED to check they dont depend on each other. 0 reverses order",
+    )
+
+def pytest_collection_modifyitems(config, items):
+    # same seed gives every xdist worker the same order so their collections still match
+    seed = config.getoption("--shuffle")
+    if seed == 0:
+        items.reverse()
+    elif seed is not None:
+        random.Random(seed).shuffle(items)
+
+# every event emitted during the test, searchable after later calls overwrite contract.get_logs()
+@pytest.fixture
+def event_log():
+    with EventRecorder() as log:
+        yield log
+
 # dummy addresses. not active signers like Ape.accounts
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def me():
     return boa.env.generate_address()
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def admin():
     return boa.env.generate_address()
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def treasury():
     return boa.env.generate_address()
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def base_asset(admin):
     with boa.env.prank(admin): # necessary?
         return boa.load('tests/mocks/MockERC20.vy', "Lending Token", "LEND", 18)
@@ -38,21 +106,25 @@ def base_asset(admin):
 #     with boa.env.prank(admin): # necessary?
 #         return boa.load('contracts/BondToken.vy', "Bondage Token", "BONDAGE", 18, admin)
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def pool(admin, base_asset):
     with boa.env.prank(admin): # necessary?
         return boa.load('contracts/DebtDAOPool.vy', admin, base_asset, "Dev Testing", "KIBA-TEST", [ 0, 0, 0, 0, 0, 0 ])
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
+def lens():
+    return boa.load('contracts/PoolLens.vy')
+
+@pytest.fixture(scope="session")
 def all_erc20_tokens(base_asset, pool):
     return [base_asset, pool]
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def all_erc4626_tokens(pool):
     return [pool]
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def _deposit(pool, base_asset):
     def deposit(amount, receiver, referrer=None):
         base_asset.mint(receiver, amount)
@@ -64,7 +136,7 @@ def _deposit(pool, base_asset):
     return deposit
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture
 def init_token_balances(base_asset, pool, admin, me):
     # TODO dont be an idiot and use boa.eval instead of contract calls
 
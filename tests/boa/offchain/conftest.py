@@ -0,0 +1,8 @@
+import pytest
+from offchain.indexer import POOL_SOURCE, load_abi
+# share pool fixtures so offchain tests can generate real pool activity
+from ..pool.conftest import borrower, mock_line, flash_borrower, _create_line, _add_credit, _repay, _get_position, _collect_interest
+
+@pytest.fixture(scope="session")
+def pool_abi():
+    return load_abi(POOL_SOURCE)
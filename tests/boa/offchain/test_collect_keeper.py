@@ -0,0 +1,62 @@
+import boa
+import asyncio
+import pytest
+from offchain.collect_keeper import CollectScheduler, COLLECT_POSITION_GAS, UNLOCK_GAS
+from offchain.impair_keeper import Position
+from ..utils.chain import BoaChainClient
+from ..pool.conftest import DRATE, FRATE, INTEREST_TIMESPAN_SEC
+
+@pytest.mark.pool
+@pytest.mark.line_integration
+@pytest.mark.rev_generator
+def test_scheduler_collects_positions_worth_their_gas(
+    pool, admin, me, base_asset, borrower, flash_borrower, _deposit, _create_line, _add_credit, _repay, _get_position
+):
+    pool.set_collector_fee(100, sender=admin)
+    pool.set_flash_fee(10, sender=admin)
+    _deposit(10**21, me)
+    lines = [_create_line(borrower) for _ in range(3)]
+    ids = [_add_credit(10**20, DRATE, FRATE, line) for line in lines]
+    boa.env.time_travel(seconds=INTEREST_TIMESPAN_SEC)
+    for line, id in zip(lines, ids):
+        line.accrueInterest(id)
+    big = _get_position(lines[0], ids[0])['interestAccrued']
+    _repay(lines[0], ids[0], big)
+    _repay(lines[1], ids[1], 10**6)
+
+    keeper = boa.env.generate_address()
+    # collector fee on small repayment doesnt cover its gas
+    client = BoaChainClient(keeper, gas_price=10**6)
+    positions = [Position.of(pool.address, line.address, id) for line, id in zip(lines, ids)]
+    scheduler = CollectScheduler(client, positions, refresh_per_round=1)
+
+    [result] = asyncio.run(scheduler.poll())
+    assert result.tx_hash is not None and result.plan.positions == (positions[0],)
+    assert result.plan.interest == big and result.plan.profit > 0
+    assert base_asset.balanceOf(keeper) == result.plan.reward == big // 100
+    assert scheduler.interest == { positions[0]: 0, positions[1]: 10**6, positions[2]: 0 }
+
+    # nothing dirty so only round robin positions + pool state are read
+    client.calls.clear()
+    assert asyncio.run(scheduler.poll()) == []
+    assert len(client.calls) == 1 + 2
+
+    # cheap gas makes small positions worth collecting
+    _repay(lines[2], ids[2], 10**6)
+    scheduler.mark_dirty(positions[2])
+    client.gas = 10**6 // (COLLECT_POSITION_GAS * 10**2)
+    [result] = asyncio.run(scheduler.poll())
+    assert set(result.plan.positions) == { positions[1], positions[2] }
+    assert result.plan.interest == 2 * 10**6
+    assert _get_position(lines[1], ids[1])['interestRepaid'] == _get_position(lines[2], ids[2])['interestRepaid'] == 0
+
+    # flash fees only start vesting after an unlock and caller isnt paid so they need to be worth a lot more than gas
+    pool.flashLoan(flash_borrower, base_asset, 10**20, b"", sender=flash_borrower.address)
+    pending = pool.pending_flash_fees()
+    assert pending > 0
+    client.gas = pending // (UNLOCK_GAS * 10) + 1
+    assert asyncio.run(scheduler.poll()) == []
+    client.gas = pending // (UNLOCK_GAS * 10)
+    [result] = asyncio.run(scheduler.poll())
+    assert result.plan.positions == () and result.tx_hash is not None
+    assert pool.pending_flash_fees() == 0
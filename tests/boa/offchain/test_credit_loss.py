@@ -0,0 +1,84 @@
+import boa
+import pytest
+import numpy as np
+from offchain.credit_loss import LinePortfolio, Portfolio, simulate
+from offchain.pool_model import PoolModel
+from ..pool.test_pool_model import _assert_pool_matches_model, _set_fees
+from ..pool.conftest import DRATE, FRATE
+
+def _assert_line_matches_model(line, id, lines, j = 0):
+    deposit, principal, interest_accrued, interest_repaid, *_ = line.credits(id)
+    assert (deposit, principal, interest_accrued, interest_repaid) == (
+        lines.deposit[0, j], lines.principal[0, j], lines.interest_accrued[0, j], lines.interest_repaid[0, j],
+    )
+
+@pytest.mark.pool
+@pytest.mark.loss
+@pytest.mark.line_integration
+def test_line_portfolio_matches_pool(pool, mock_line, base_asset, admin, me, flash_borrower, _deposit, _repay):
+    fees = { 'performance': 1000, 'collector': 100 }
+    _set_fees(pool, fees)
+    model = PoolModel(1, fees)
+    lines = LinePortfolio(model, 1)
+
+    _deposit(10**21, me)
+    model.deposit(10**21)
+    base_asset.mint(admin, 10**19)
+    base_asset.approve(pool, 10**19, sender=admin)
+    pool.stake_assets(10**19, sender=admin)
+    model.stake_assets(10**19)
+
+    id = pool.add_credit(mock_line, DRATE, FRATE, 8 * 10**20, sender=admin)
+    assert lines.add_credit(0, 8 * 10**20, DRATE, FRATE)[0]
+    mock_line.borrow(id, 6 * 10**20)
+    assert lines.borrow(0, 6 * 10**20)[0]
+    _assert_pool_matches_model(pool, model)
+    assert pool.total_deployed() == model.total_deployed[0]
+
+    boa.env.time_travel(seconds=30 * 24 * 60 * 60)
+    model.warp(30 * 24 * 60 * 60)
+    payment = lines.owed(0)[0] - 6 * 10**20 + 10**20
+    _repay(mock_line, id, payment)
+    assert lines.repay(0, payment)[0]
+    _assert_line_matches_model(mock_line, id, lines)
+
+    # keeper collects
+    interest = pool.collect_interest(mock_line, id, sender=flash_borrower.address)
+    assert lines.collect_interest()[0][0] == interest
+    _assert_pool_matches_model(pool, model)
+    _assert_line_matches_model(mock_line, id, lines)
+
+    boa.env.time_travel(seconds=7 * 24 * 60 * 60)
+    model.warp(7 * 24 * 60 * 60)
+    mock_line.declareInsolvent()
+    lines.declare_insolvent([[True]])
+    # snitch impairs. loss is bigger than delegate stake so depositors eat the rest
+    collected = base_asset.balanceOf(flash_borrower)
+    pool_net_loss, fees_burned = pool.impair(mock_line, id, sender=flash_borrower.address)
+    (lost, burned, snitch_fee), ok = lines.impair(0)
+    assert ok[0] and fees_burned > 0 and pool_net_loss > 0
+    assert (lost[0], burned[0]) == (pool_net_loss, fees_burned)
+    assert snitch_fee[0] == base_asset.balanceOf(flash_borrower) - collected
+    _assert_pool_matches_model(pool, model)
+    _assert_line_matches_model(mock_line, id, lines)
+    assert pool.total_deployed() == model.total_deployed[0]
+
+    # replays revert
+    assert not lines.impair(0)[1][0]
+
+
+@pytest.mark.loss
+def test_simulated_losses_only_come_from_defaults():
+    portfolio = Portfolio(lines=3, periods=4, default_probability=0)
+    # same seed is the same paths no matter how they are split across processes
+    losses = simulate(portfolio, paths=40, batch_size=10, workers=1, seed=7)
+    assert np.array_equal(losses.final_price, simulate(portfolio, paths=40, batch_size=10, workers=2, seed=7).final_price)
+    assert not losses.net_loss.any() and not losses.fees_burned.any() and not losses.defaults.any()
+    assert (losses.final_price > 10**8).all()
+
+    defaulted = simulate(Portfolio(lines=3, periods=4, default_probability=1), paths=40, batch_size=10, workers=1, seed=7)
+    # every line defaults in the first period
+    assert (defaulted.defaults == 3).all()
+    assert (defaulted.fees_burned > 0).all() and (defaulted.snitch_fees > 0).all()
+    assert (defaulted.gross_loss >= defaulted.net_loss).all()
+    assert defaulted.summary()['max_drawdown']['mean'] > losses.summary()['max_drawdown']['mean']
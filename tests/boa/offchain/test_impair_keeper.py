@@ -0,0 +1,67 @@
+import boa
+import asyncio
+import pytest
+from offchain.impair_keeper import ImpairKeeper, Position, STATUS_SELECTOR
+from ..utils.chain import BoaChainClient
+
+@pytest.mark.pool
+@pytest.mark.loss
+@pytest.mark.line_integration
+def test_keeper_impairs_positions_once_lines_go_insolvent(
+    pool, admin, me, base_asset, borrower, _create_line, _add_credit, _deposit
+):
+    _deposit(10**21, me)
+    base_asset.mint(admin, 10**20)
+    base_asset.approve(pool, 10**20, sender=admin)
+    pool.stake_assets(10**20, sender=admin)
+
+    lines = [_create_line(borrower) for _ in range(3)]
+    ids = [_add_credit(10**20, 0, 0, line) for line in lines]
+    # last line has nothing to lose
+    for line, id in zip(lines[:2], ids):
+        line.borrow(id, 10**20, sender=borrower)
+
+    snitch = boa.env.generate_address()
+    client = BoaChainClient(snitch)
+    positions = [Position.of(pool.address, line.address, id) for line, id in zip(lines, ids)]
+    # not a position pool owns
+    bogus = Position.of(pool.address, lines[0].address, b"\x01" * 32)
+    keeper = ImpairKeeper(client, positions + [bogus], concurrency=2, batch_size=1)
+
+    assert asyncio.run(keeper.poll()) == []
+    assert client.sent == []
+    assert 1 < client.max_in_flight <= 2
+
+    lines[0].declareInsolvent()
+    lines[2].declareInsolvent()
+    results = { r.position: r for r in asyncio.run(keeper.poll()) }
+
+    impaired = results[positions[0]]
+    assert impaired.tx_hash is not None and impaired.error is None
+    assert impaired.fees_burned > 0 and impaired.snitch_fee > 0
+    assert pool.impairments(lines[0]) == 10**20
+    assert base_asset.balanceOf(snitch) == pool.convertToAssets(impaired.snitch_fee)
+    assert results[bogus].error == results[positions[2]].error == "impair reverted"
+    assert client.sent == [(pool.address.lower(), positions[0].impair_calldata())]
+
+    # only the solvent line is left and insolvent lines are never polled again
+    assert list(keeper.positions) == [positions[1].line]
+    client.calls.clear()
+    assert asyncio.run(keeper.poll()) == []
+    assert client.calls == [(positions[1].line, STATUS_SELECTOR)]
+
+@pytest.mark.pool
+@pytest.mark.line_integration
+def test_keeper_run_stops(pool, borrower, _create_line):
+    line = _create_line(borrower)
+    client = BoaChainClient(boa.env.generate_address())
+    keeper = ImpairKeeper(client, [Position.of(pool.address, line.address, b"\x00" * 32)])
+
+    async def run():
+        stop = asyncio.Event()
+        task = asyncio.create_task(keeper.run(interval=0.01, stop=stop))
+        await asyncio.sleep(0.05)
+        stop.set()
+        await asyncio.wait_for(task, 1)
+    asyncio.run(run())
+    assert client.requests > 1
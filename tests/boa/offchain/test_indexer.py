@@ -0,0 +1,78 @@
+import boa
+import pytest
+from offchain.indexer import PoolIndexer, FACTORY_SOURCE, load_abi
+from ..utils.events import BoaLogSource
+
+# factory uses code_offset=0 so blueprint must be deployed without ERC5202 preamble
+@pytest.fixture(scope="module")
+def pool_blueprint():
+    return boa.load_partial("contracts/DebtDAOPool.vy").deploy_as_blueprint(blueprint_preamble=None)
+
+@pytest.fixture(scope="module")
+def factory(pool_blueprint):
+    return boa.load("contracts/PoolFactory.vy", pool_blueprint.address)
+
+def _deposit_to(pool, base_asset, amount, receiver):
+    base_asset.mint(receiver, amount)
+    base_asset.approve(pool, amount, sender=receiver)
+    pool.deposit(amount, receiver, sender=receiver)
+
+
+@pytest.mark.pool
+@pytest.mark.event_emissions
+def test_indexer_resumes_from_cursor(pool, me, _deposit, event_log, pool_abi, tmp_path):
+    source = BoaLogSource(event_log)
+    _deposit(10**18, me)
+    boa.env.time_travel(blocks=1)
+    _deposit(2 * 10**25, me)
+    pool.withdraw(10**17, me, me, sender=me)
+    boa.env.time_travel(blocks=1)
+
+    # boa keeps adding txs to current block so only index up to the one before
+    indexer = PoolIndexer(source, tmp_path, pools=[pool.address], chunk_size=1, confirmations=1, pool_abi=pool_abi)
+    assert indexer.sync() > 0
+    assert indexer.next_block == boa.env.vm.state.block_number
+
+    deposits = indexer.load("Deposit")
+    assert list(deposits["assets"]) == [10**18, 2 * 10**25] # uint256 > 64 bits stay exact
+    assert list(deposits["owner"]) == [me.lower(), me.lower()]
+    assert deposits["block_number"][0] < deposits["block_number"][1]
+    assert deposits["timestamp"][0] < deposits["timestamp"][1]
+    withdraws = indexer.load("Withdraw")
+    assert list(withdraws["assets"]) == [10**17]
+
+    # new process picks up pools and block from cursor
+    _deposit(3 * 10**18, me)
+    boa.env.time_travel(blocks=1)
+    resumed = PoolIndexer(source, tmp_path, chunk_size=1, confirmations=1, pool_abi=pool_abi)
+    assert list(resumed.pools) == [pool.address.lower()]
+    assert resumed.sync() > 0
+    assert list(resumed.load("Deposit")["assets"]) == [10**18, 2 * 10**25, 3 * 10**18]
+    # nothing new
+    assert resumed.sync() == 0
+
+
+@pytest.mark.pool
+@pytest.mark.event_emissions
+def test_indexer_discovers_pools_from_factory(factory, base_asset, admin, me, event_log, pool_abi, tmp_path):
+    source = BoaLogSource(event_log)
+    indexer = PoolIndexer(
+        source, tmp_path, factory=factory.address, start_block=boa.env.vm.state.block_number, confirmations=1,
+        pool_abi=pool_abi, factory_abi=load_abi(FACTORY_SOURCE),
+    )
+    token2 = boa.load('tests/mocks/MockERC20.vy', "Token 2", "TKN2", 18)
+    pool_deployer = boa.load_partial("contracts/DebtDAOPool.vy")
+    pools = [
+        pool_deployer.at(factory.deploy_pool(admin, token, "Pool", "POOL", 1000, 10, 0, sender=admin))
+        for token in (base_asset, token2)
+    ]
+
+    for pool, token in zip(pools, (base_asset, token2)):
+        _deposit_to(pool, token, 10**18, me)
+    boa.env.time_travel(blocks=1)
+    indexer.sync()
+
+    assert list(indexer.pools) == [p.address.lower() for p in pools]
+    deposits = indexer.load("Deposit")
+    assert list(deposits["address"]) == [p.address.lower() for p in pools]
+    assert list(deposits["assets"]) == [10**18, 10**18]
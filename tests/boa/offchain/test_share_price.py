@@ -0,0 +1,60 @@
+import boa
+import pytest
+import numpy as np
+from offchain.indexer import PoolIndexer
+from offchain.share_price import SharePriceHistory
+from ..utils.events import BoaLogSource
+from ..pool.conftest import DRATE, FRATE, INTEREST_TIMESPAN_SEC, VESTING_RATE_COEFFICIENT
+
+@pytest.mark.pool
+@pytest.mark.event_emissions
+def test_share_price_history_matches_pool(
+    pool, admin, me, base_asset, flash_borrower, _deposit, _collect_interest, event_log, pool_abi, tmp_path
+):
+    pool.set_performance_fee(1000, sender=admin)
+    pool.set_collector_fee(100, sender=admin)
+    pool.set_flash_fee(10, sender=admin)
+    # default rate barely vests in a test's timespan
+    vesting_rate = VESTING_RATE_COEFFICIENT // (7 * 86400)
+    pool.set_vesting_rate(vesting_rate, sender=admin)
+    samples = []
+    def checkpoint(seconds: int):
+        # seconds MUST be a multiple of 12 so every block has one timestamp
+        samples.append((boa.env.vm.state.timestamp, pool.price(), pool.eval("self._calc_locked_profit()")))
+        boa.env.time_travel(seconds=seconds)
+
+    _deposit(10**21, me)
+    checkpoint(120)
+    pool.flashLoan(flash_borrower, base_asset, 10**20, b"", sender=flash_borrower.address)
+    checkpoint(120)
+    # line interest and flash fees only show up in price after the next unlock
+    interest, id = _collect_interest(10**20, DRATE, FRATE, INTEREST_TIMESPAN_SEC)
+    assert interest > 0
+    checkpoint(1200)
+    checkpoint(3600)
+    pool.set_vesting_rate(vesting_rate * 2, sender=admin)
+    checkpoint(3600)
+    pool.withdraw(10**18, me, me, sender=me)
+    checkpoint(86400)
+    checkpoint(86400 * 30)
+    # unsettled interest at the end of history is estimated from fees
+    _collect_interest(0, DRATE, FRATE, INTEREST_TIMESPAN_SEC, id=id)
+    checkpoint(3600)
+    checkpoint(12)
+
+    indexer = PoolIndexer(BoaLogSource(event_log), tmp_path, pools=[pool.address], confirmations=1, pool_abi=pool_abi)
+    indexer.sync()
+    history = SharePriceHistory.from_indexer(indexer, pool.address)
+
+    timestamps, prices, locked = (np.array(column) for column in zip(*samples))
+    settled = timestamps < history.settled_until
+    assert settled.sum() == 7
+    assert list(history.price(timestamps[settled])) == list(prices[settled])
+    assert list(history.locked_profit(timestamps[settled])) == list(locked[settled])
+    assert all(abs(p - expected) <= 1 for p, expected in zip(history.price(timestamps[~settled]), prices[~settled]))
+
+    # profits drip into price between events
+    series = history.series(timestamps[2], timestamps[5], step=600)
+    assert np.all(np.diff(series["price"].astype(float)) >= 0) and series["price"][-1] > series["price"][0]
+    assert np.all(series["locked_profit"] + series["free_profit"] == series["locked_profit"][0] + series["free_profit"][0])
+    assert history.apr(timestamps[2], timestamps[5]) > 0
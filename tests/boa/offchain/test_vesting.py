@@ -0,0 +1,67 @@
+import boa
+import pytest
+import numpy as np
+from offchain.indexer import PoolIndexer
+from offchain.share_price import SharePriceHistory
+from offchain.vesting import candidate_rates, simulate_revenue, sweep_vesting_rates, recommend_vesting_rate
+from ..utils.events import BoaLogSource
+from ..pool.conftest import DRATE, FRATE, INTEREST_TIMESPAN_SEC, VESTING_RATE_COEFFICIENT
+
+def test_faster_vesting_trades_smoothness_for_jit_exposure():
+    rates = candidate_rates(count=100)
+    timestamps, profits = simulate_revenue(apr=1000, seed=7)
+    sweep = sweep_vesting_rates(timestamps, profits, rates=rates, fees=0)
+
+    assert len(sweep.rates) == len(rates) and np.all(np.diff(sweep.rates) > 0)
+    # faster vesting = bigger jumps, more JIT profit, less profit held back
+    assert np.all(np.diff(sweep.max_jump) >= -1e-12)
+    assert np.all(np.diff(sweep.jit_return) >= -1e-12)
+    assert np.all(np.diff(sweep.locked_share) <= 1e-12)
+    assert sweep.jit_return[0] < 0 < sweep.jit_return[-1]
+    # vesting slower than revenue holds back yield
+    assert sweep.apr_mean[0] < sweep.apr_mean[-1]
+
+    # fastest rate that stays under each threshold
+    rate = sweep.recommend(max_jit_return=0.0)
+    assert sweep.jit_return[sweep.rates == rate] <= 0
+    assert np.all(sweep.jit_return[sweep.rates > rate] > 0)
+    assert sweep.recommend(max_jit_return=1.0) == rates.max()
+    assert sweep.recommend(max_jit_return=-1.0) == rates.min()
+    assert sweep.recommend(max_jit_return=1.0, max_jump=sweep.max_jump[50]) == rates[50]
+    # deposit + withdraw fees make JIT deposits less profitable so pools can vest faster
+    assert sweep_vesting_rates(timestamps, profits, rates=rates, fees=10).recommend() >= rate
+
+
+@pytest.mark.pool
+@pytest.mark.event_emissions
+def test_revenue_history_from_pool_events(
+    pool, admin, me, base_asset, flash_borrower, _deposit, _collect_interest, event_log, pool_abi, tmp_path
+):
+    pool.set_collector_fee(100, sender=admin)
+    pool.set_flash_fee(10, sender=admin)
+    pool.set_vesting_rate(VESTING_RATE_COEFFICIENT // (7 * 86400), sender=admin)
+    _deposit(10**21, me)
+    boa.env.time_travel(seconds=120)
+
+    pool.flashLoan(flash_borrower, base_asset, 10**20, b"", sender=flash_borrower.address)
+    flash_fee = pool.flashFee(base_asset, 10**20)
+    # flash fees lock at the next unlock
+    lent_at = boa.env.vm.state.timestamp
+    interest, id = _collect_interest(10**20, DRATE, FRATE, INTEREST_TIMESPAN_SEC)
+    collected_at = boa.env.vm.state.timestamp
+    boa.env.time_travel(seconds=120)
+    pool.unlock_profits()
+    boa.env.time_travel(seconds=120)
+
+    indexer = PoolIndexer(BoaLogSource(event_log), tmp_path, pools=[pool.address], confirmations=1, pool_abi=pool_abi)
+    indexer.sync()
+    history = SharePriceHistory.from_indexer(indexer, pool.address)
+    timestamps, profits, total_assets = history.revenue()
+
+    assert list(timestamps) == [lent_at, collected_at]
+    assert list(profits) == [flash_fee, interest]
+    # _add_credit deposits the credit amount first
+    assert list(total_assets) == [10**21, 10**21 + 10**20 + flash_fee]
+
+    rate = recommend_vesting_rate(history, rates=candidate_rates(count=20))
+    assert rate in candidate_rates(count=20)
@@ -3,50 +3,49 @@ import logging
 import pytest
 from eth_utils import to_checksum_address
 from ..conftest import MAX_UINT, ZERO_ADDRESS
-from ..utils.events import _find_event, _find_event_by
+from ..utils.events import EventRecorder
 from boa.vyper.event import Event
 
 VESTING_RATE_COEFFICIENT = 10**18
 FEE_COEFFICIENT = 10000 # 100% in bps
 MAX_PITTANCE_FEE = 200 # 2% in bps
-SET_FEES_TO_ZERO = "self.fees = Fees({performance: 0, deposit: 0, withdraw: 0, flash: 0, collector: 0, referral: 0})"
+SET_FEES_TO_ZERO = "self.packed_fees = 0"
+# FEE_TYPES enum values emitted as RevenueGenerated.fee_type
+FEE_CODES = { fee_type: 2**i for i, fee_type in enumerate(['performance', 'deposit', 'withdraw', 'flash', 'collector', 'referral', 'snitch']) }
 NULL_POSITION = f"Position({{deposit: 0, principal: 0, interestAccrued: 0, interestRepaid: 0, decimals: 0, token: {ZERO_ADDRESS}, lender: {ZERO_ADDRESS}, isOpen: True}})"
 ONE_YEAR_IN_SEC=60*60*24*365.25
 INTEREST_TIMESPAN_SEC = int(ONE_YEAR_IN_SEC / 12)
 DRATE=2000
 FRATE=1000
 
-boa.interpret.set_cache_dir()
-boa.reset_env()
-
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def borrower():
     return boa.env.generate_address()
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def mock_line(_create_line, borrower):
     return _create_line(borrower)
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def vault(me, base_asset):
     with boa.env.prank(me): # necessary?
         return boa.load('contracts/DebtDAOPool.vy', me, base_asset, "HYYYUUGE PROFIT MOBILE", "HYYUU", [ 2000, 100, 100, 10, 100, 200 ])
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def my_line(_create_line, me):
     return _create_line(me)
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def flash_borrower(_create_line, me):
     return boa.load("tests/mocks/FlashBorrower.vy")
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def pool_roles():
     return ['owner', 'rev_recipient']
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def pool_fee_types():
     return [
     	# NOTE: MUST be same order as Fees enum
@@ -59,7 +58,7 @@ def pool_fee_types():
         # 'snitch', unique constant fee, we test separately
     ]
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def pittance_fee_types(pool_fee_types):
     return pool_fee_types[1:] # cut performance and snitch fees of ends
 
@@ -69,20 +68,20 @@ def pittance_fee_types(pool_fee_types):
 ###########
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def _create_line():
     def deploy(borrower):
          return boa.load("tests/mocks/MockLine.vy", borrower)
     return deploy
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def _compute_id(mock_line):
     def compute_id(lender, token, line=mock_line):
         return line.computeId(lender, token)
     return compute_id
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def _add_credit(pool, mock_line, base_asset, admin, me, _deposit):
     def add_credit(amount, drate=0, frate=0, line=mock_line, new_deposit=True):
         if new_deposit:
@@ -91,7 +90,7 @@ def _add_credit(pool, mock_line, base_asset, admin, me, _deposit):
         return id
     return add_credit
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def _increase_credit(pool, mock_line, base_asset, admin, me, _deposit, _compute_id):
     def increase_credit(amount, drate=0, frate=0, line=mock_line, new_deposit=True):
         if new_deposit:
@@ -101,7 +100,7 @@ def _increase_credit(pool, mock_line, base_asset, admin, me, _deposit, _compute_
     return increase_credit
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def _get_position():
     def get_position(line, id):
         (deposit, principal, interestAccrued, intersetRepaid, decimals, token, lender, isOpen) = line.credits(id)
@@ -117,7 +116,7 @@ def _get_position():
         }
     return get_position
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def _repay(mock_line, base_asset, me):
     def repay(line, id, amount, payer=me, close=False):
         base_asset.mint(payer, amount)
@@ -133,7 +132,7 @@ def _repay(mock_line, base_asset, me):
     return repay
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def _collect_interest(pool, mock_line, base_asset, admin, flash_borrower, _add_credit, _repay, _get_position):
     def collect_interest(amount, drate, frate, timespan, line=mock_line, id=None):
         if not id:
@@ -150,20 +149,25 @@ def _collect_interest(pool, mock_line, base_asset, admin, flash_borrower, _add_c
 
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def _gen_rev(pool, base_asset, flash_borrower, _deposit, _collect_interest, me) -> Event | None:
     def gen_rev(fee_type, amount):
         """
         @return - [fee_type, amount_generated]
         """
         # print(f"generate revenue helper type/event  :  {fee_type}")
+        with EventRecorder() as log:
+            rev = _gen(fee_type, amount)
+
+        event = log.last('RevenueGenerated', pool, fee_type=FEE_CODES[fee_type])
+        return { **rev, 'event': event.args if event else None }
 
+    def _gen(fee_type, amount):
         match fee_type:
             case 'performance':
                 interest, id = _collect_interest(amount, DRATE, FRATE, INTEREST_TIMESPAN_SEC)
                 # print("performance fee", interest, id)
                 return {
-                    'event': _find_event_by({ "fee_type": 1 }, pool.get_logs()),
                     'position_id': id,
                     'interest': interest,
                 }
@@ -171,7 +175,6 @@ def _gen_rev(pool, base_asset, flash_borrower, _deposit, _collect_interest, me)
                 shares = _deposit(amount, me)
                 # print("deposit fee", 0)
                 return {
-                    'event': _find_event_by({ "fee_type": 2 }, pool.get_logs()),
                     'shares': shares,
                 }
             case 'withdraw':
@@ -179,20 +182,17 @@ def _gen_rev(pool, base_asset, flash_borrower, _deposit, _collect_interest, me)
                 shares = pool.withdraw(amount, me, me, sender=me)
                 # print("withdraw fee", 0)
                 return {
-                    'event': _find_event_by({ "fee_type": 4 }, pool.get_logs()),
                     'shares': shares,
                 }
             case 'flash':
-                pool.flashLoan(flash_borrower, base_asset, amount, "")
+                pool.flashLoan(flash_borrower, base_asset, amount, b"")
                 # print("flash fee", 0)
                 return {
-                    'event': _find_event_by({ "fee_type": 8 }, pool.get_logs()),
                 }
             case 'collector':
                 interest, id = _collect_interest(amount, DRATE, FRATE, INTEREST_TIMESPAN_SEC)
                 # print("performancefee", 0)
                 return {
-                    'event': _find_event_by({ "fee_type": 1 }, pool.get_logs()),
                     'position_id': id,
                     'interest': interest,
                 }
@@ -200,13 +200,11 @@ def _gen_rev(pool, base_asset, flash_borrower, _deposit, _collect_interest, me)
                 shares = _deposit(amount, me, flash_borrower) #random referrer
                 # print("referral fee", 0)
                 return {
-                    'event': _find_event_by({ "fee_type": 32 }, pool.get_logs()),
                     'shares': shares,
                 }
             case 'snitch':
                 # TODO generate snitch fees
                  return {
-                    'event':  _find_event_by({ "fee_type": 64 }, pool.get_logs()),
                 }
 
     return gen_rev
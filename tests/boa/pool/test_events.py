@@ -0,0 +1,79 @@
+import boa
+import pytest
+from hypothesis import given, settings
+from hypothesis import strategies as st
+from .conftest import FEE_CODES, MAX_PITTANCE_FEE, FEE_COEFFICIENT
+
+@pytest.mark.pool
+@pytest.mark.event_emissions
+def test_event_log_keeps_events_from_earlier_calls(pool, base_asset, admin, me, _deposit, event_log):
+    referrer = boa.env.generate_address()
+    pool.set_deposit_fee(MAX_PITTANCE_FEE, sender=admin)
+    pool.set_referral_fee(MAX_PITTANCE_FEE, sender=admin)
+    start = boa.env.vm.state.timestamp
+
+    _deposit(10**18, me, referrer)
+    boa.env.time_travel(seconds=60)
+    _deposit(10**18, me)
+    pool.withdraw(10**17, me, me, sender=me)
+
+    # pool.get_logs() would only have Withdraw events now
+    fee = 10**18 * MAX_PITTANCE_FEE // FEE_COEFFICIENT
+    deposits = event_log.find('RevenueGenerated', pool, fee_type=FEE_CODES['deposit'])
+    assert len(deposits) == 2
+    assert deposits[0].args['revenue'] == fee
+    assert deposits[0].seq < deposits[1].seq
+
+    [referral] = event_log.find('RevenueGenerated', fee_type=FEE_CODES['referral'], receiver=referrer)
+    assert referral.args['revenue'] == fee
+    assert referral.timestamp == start
+    # indexed arg lookup with no matches
+    assert event_log.find('RevenueGenerated', fee_type=FEE_CODES['referral'], receiver=me) == []
+
+    # time ranges are inclusive
+    assert len(event_log.find('RevenueGenerated', until=start)) == 2
+    assert len(event_log.find('RevenueGenerated', since=start + 60, fee_type=FEE_CODES['deposit'])) == 1
+    assert len(event_log.find('Deposit', since=start + 61)) == 0
+
+    # non indexed args get filtered and events from other contracts are recorded too
+    assert event_log.last('Withdraw', pool, assets=10**17).args['owner'].lower() == me.lower()
+    assert len(event_log.find('Transfer', base_asset, receiver=pool)) == 2
+
+    # reverted calls dont emit anything
+    recorded = len(event_log)
+    with boa.reverts():
+        pool.withdraw(10**25, me, me, sender=me)
+    assert len(event_log) == recorded
+
+
+@pytest.mark.pool
+@pytest.mark.event_emissions
+def test_event_log_drops_events_from_rolled_back_anchors(pool, me, _deposit, event_log):
+    _deposit(10**18, me)
+    start = boa.env.vm.state.timestamp
+
+    with boa.env.anchor():
+        boa.env.time_travel(seconds=60)
+        _deposit(10**18, me)
+        assert len(event_log.find('Deposit', pool)) == 2
+
+    # deposit and its timestamp in the future were rolled back with the chain
+    assert len(event_log.find('Deposit', pool)) == 1
+    assert event_log.find('Deposit', since=start + 1) == []
+
+    # time ranges still work after time goes backwards
+    boa.env.time_travel(seconds=30)
+    _deposit(10**18, me)
+    assert len(event_log.find('Deposit', pool, since=start + 30, until=start + 30)) == 1
+
+
+@pytest.mark.pool
+@pytest.mark.event_emissions
+@given(deposits=st.integers(min_value=1, max_value=3))
+@settings(max_examples=5)
+def test_event_log_is_fresh_for_every_hypothesis_example(pool, me, _deposit, event_log, deposits):
+    # boa anchors each example so events from earlier examples are gone
+    assert event_log.find('Deposit', pool) == []
+    for _ in range(deposits):
+        _deposit(10**18, me)
+    assert len(event_log.find('Deposit', pool)) == deposits
@@ -3,4 +3,49 @@
 # new pool configs should match deploy_pool params
 # look at LineFactory tests and steal
 
-# ensure that create_from_blueprint acts as expected if impl. contract is or isnt deployed properly
\ No newline at end of file
+# ensure that create_from_blueprint acts as expected if impl. contract is or isnt deployed properly
+import boa
+import pytest
+from eth_abi import encode
+from eth_utils import keccak
+
+# factory uses code_offset=0 so blueprint must be deployed without ERC5202 preamble
+@pytest.fixture(scope="module")
+def pool_blueprint():
+    return boa.load_partial("contracts/DebtDAOPool.vy").deploy_as_blueprint(blueprint_preamble=None)
+
+@pytest.fixture(scope="module")
+def factory(pool_blueprint):
+    return boa.load("contracts/PoolFactory.vy", pool_blueprint.address)
+
+def _pool_init_code_hash(blueprint, owner, token, name, symbol, performance_fee, deposit_fee) -> bytes:
+    # same defaults as PoolFactory.deploy_pool
+    fees = (performance_fee, deposit_fee, 0, 5, 0, 20)
+    args = encode(
+        ["address", "address", "string", "string", "(uint16,uint16,uint16,uint16,uint16,uint16)"],
+        [owner, token, name, symbol, fees]
+    )
+    code = boa.env.vm.state.get_code(bytes.fromhex(blueprint.address[2:]))
+    return keccak(code + args)
+
+
+@pytest.mark.pool
+def test_deploy_pools_matches_computed_addresses(factory, pool_blueprint, admin, base_asset):
+    token2 = boa.load('tests/mocks/MockERC20.vy', "Token 2", "TKN2", 18)
+    configs = [
+        (admin, base_asset.address, "Pool 1", "POOL1", 1000, 10, 0),
+        (admin, token2.address, "Pool 2", "POOL2", 2000, 20, 0),
+    ]
+    expected = [
+        factory.compute_pool_address(admin, c[1], _pool_init_code_hash(pool_blueprint, *c[:6]))
+        for c in configs
+    ]
+
+    pools = factory.deploy_pools(configs, sender=admin)
+    assert list(pools) == expected
+
+    # salt is per deployer so same token can still be deployed by someone else
+    rando = boa.env.generate_address()
+    assert factory.compute_pool_address(rando, base_asset, _pool_init_code_hash(pool_blueprint, *configs[0][:6])) != expected[0]
+    with boa.reverts(): # same deployer + token
+        factory.deploy_pools(configs[:1], sender=admin)
@@ -0,0 +1,354 @@
+import boa
+import pytest
+import vyper
+from packaging.version import Version
+from vyper.compiler.output import build_abi_output
+from ..utils.gas import GasSnapshot, UPDATE_SNAPSHOT
+from ..utils.boa_version import requires_pinned_boa
+from ..utils.multicall import _encode_multicall
+from ..utils.permit import _sign_permit, _permit_signer
+from .conftest import INTEREST_TIMESPAN_SEC
+from ..conftest import INIT_POOL_BALANCE, INIT_USER_POOL_BALANCE
+
+# Gas benchmarks for every external Pool + Factory function in representative pool states.
+# Each run is diffed against tests/boa/.gas-snapshot and fails if any benchmark regresses past GAS_REGRESSION_THRESHOLD %.
+# `GAS_SNAPSHOT=update pytest -m gas` to accept changes and overwrite the baseline.
+# Benchmarks run inside normal test isolation so their setup is rolled back like any other test.
+# Cold storage access relies on boa internals so they only run on the pinned boa, see utils/boa_version.py
+
+# realistic non-zero fees so fee paths are benchmarked too
+BENCH_FEES = [1000, 10, 10, 5, 50, 20]
+AMOUNT = 10**18
+EIP170_MAX_CODE_SIZE = 24576
+# maxMint always reverts, _convert_to_shares(max_value(uint256) - total_assets) overflows multiplying by PRICE_DECIMALS
+UNBENCHMARKED = {"maxMint"}
+# PoolFactory requires vyper 0.3.10 so pool blueprints are always compiled with it
+factory_compiler = pytest.mark.skipif(Version(vyper.__version__) < Version("0.3.10"), reason="PoolFactory needs vyper 0.3.10")
+
+@pytest.fixture(scope="module")
+def gas_snapshot():
+    boa.env.enable_gas_profiling()
+    snapshot = GasSnapshot()
+    yield snapshot
+
+    boa.env.reset_gas_metering_behavior()
+    print(f"\n{snapshot.report()}")
+    if UPDATE_SNAPSHOT:
+        snapshot.write()
+
+# dedicated pool with realistic fees instead of the zero fee session pool
+@pytest.fixture
+def bench_pool(admin, base_asset):
+    with boa.env.prank(admin):
+        return boa.load('contracts/DebtDAOPool.vy', admin, base_asset, "Gas Bench", "GAS", BENCH_FEES)
+
+@pytest.fixture
+def depositor(bench_pool, base_asset):
+    user = boa.env.generate_address()
+    base_asset.mint(user, INIT_POOL_BALANCE)
+    base_asset.approve(bench_pool, INIT_POOL_BALANCE, sender=user)
+    return user
+
+def _bench(gas_snapshot, state: str, contract, calls: dict):
+    contract_name = contract.compiler_data.contract_name.split("/")[-1].removesuffix(".vy")
+    for fn_name, call in calls.items():
+        gas_snapshot.measure(f"{contract_name}:{fn_name}:{state}", contract, call)
+
+def _assert_no_regressions(gas_snapshot, state: str):
+    if UPDATE_SNAPSHOT:
+        return # accepting new baseline
+
+    regressions = [r for r in gas_snapshot.regressions() if r[0].endswith(f":{state}")]
+    assert not regressions, f"gas regressions over {gas_snapshot.threshold}%\n{gas_snapshot.regression_report()}"
+
+def _collectable_line(bench_pool, line, base_asset, admin, amount=AMOUNT):
+    """ open a position on `line` with interest repaid and ready to collect """
+    id = bench_pool.add_credit(line, 0, 1000, amount, sender=admin)
+    boa.env.time_travel(seconds=INTEREST_TIMESPAN_SEC)
+    line.accrueInterest(id)
+    interest = line.credits(id)[2]
+    payer = line.borrower()
+    base_asset.mint(payer, interest)
+    base_asset.approve(line, interest, sender=payer)
+    line.depositAndRepay(id, interest, sender=payer)
+    return id
+
+
+@pytest.mark.gas
+@requires_pinned_boa
+def test_gas_empty_pool(gas_snapshot, bench_pool, base_asset, admin, depositor):
+    state = "empty_pool"
+    rando = boa.env.generate_address()
+    signer, key = _permit_signer(8)
+    base_asset.mint(signer, AMOUNT)
+    deadline = boa.env.vm.state.timestamp + 3600
+    signature = _sign_permit(base_asset, key, bench_pool, AMOUNT, deadline)
+
+    pool_signature = _sign_permit(bench_pool, key, rando, AMOUNT, deadline)
+    stray_token = boa.load('tests/mocks/MockERC20.vy', "Stray", "STRAY", 18)
+    stray_token.mint(bench_pool, AMOUNT)
+
+    base_asset.mint(admin, AMOUNT)
+    base_asset.approve(bench_pool, AMOUNT, sender=admin)
+
+    _bench(gas_snapshot, state, bench_pool, {
+        "deposit": lambda: bench_pool.deposit(AMOUNT, depositor, sender=depositor),
+        "depositWithReferral": lambda: bench_pool.depositWithReferral(AMOUNT, depositor, rando, sender=depositor),
+        "mint": lambda: bench_pool.mint(AMOUNT, depositor, sender=depositor),
+        "mintWithReferral": lambda: bench_pool.mintWithReferral(AMOUNT, depositor, rando, sender=depositor),
+        "depositWithPermit": lambda: bench_pool.depositWithPermit(AMOUNT, signer, deadline, signature, sender=signer),
+        "mintWithPermit": lambda: bench_pool.mintWithPermit(AMOUNT, signer, AMOUNT, deadline, signature, sender=signer),
+        "stake_assets": lambda: bench_pool.stake_assets(AMOUNT, sender=admin),
+        "unlock_profits": lambda: bench_pool.unlock_profits(),
+        "set_performance_fee": lambda: bench_pool.set_performance_fee(2000, sender=admin),
+        "set_deposit_fee": lambda: bench_pool.set_deposit_fee(20, sender=admin),
+        "set_withdraw_fee": lambda: bench_pool.set_withdraw_fee(20, sender=admin),
+        "set_flash_fee": lambda: bench_pool.set_flash_fee(20, sender=admin),
+        "set_collector_fee": lambda: bench_pool.set_collector_fee(20, sender=admin),
+        "set_referral_fee": lambda: bench_pool.set_referral_fee(20, sender=admin),
+        "set_min_deposit": lambda: bench_pool.set_min_deposit(AMOUNT, sender=admin),
+        "set_max_assets": lambda: bench_pool.set_max_assets(AMOUNT, sender=admin),
+        "set_vesting_rate": lambda: bench_pool.set_vesting_rate(10**12, sender=admin),
+        "set_owner": lambda: bench_pool.set_owner(rando, sender=admin),
+        "set_rev_recipient": lambda: bench_pool.set_rev_recipient(rando, sender=admin),
+        "set_redemption_queue": lambda: bench_pool.set_redemption_queue(rando, sender=admin),
+        "sweep": lambda: bench_pool.sweep(stray_token, sender=admin),
+        "approve": lambda: bench_pool.approve(rando, AMOUNT, sender=depositor),
+        "increaseAllowance": lambda: bench_pool.increaseAllowance(rando, AMOUNT, sender=depositor),
+        "permit": lambda: bench_pool.permit(signer, rando, AMOUNT, deadline, pool_signature),
+        "totalAssets": lambda: bench_pool.totalAssets(),
+        "price": lambda: bench_pool.price(),
+        "APR": lambda: bench_pool.APR(),
+        "fees": lambda: bench_pool.fees(),
+        "maxDeposit": lambda: bench_pool.maxDeposit(depositor),
+        "previewDeposit": lambda: bench_pool.previewDeposit(AMOUNT),
+        "previewMint": lambda: bench_pool.previewMint(AMOUNT),
+        "convertToShares": lambda: bench_pool.convertToShares(AMOUNT),
+        "convertToAssets": lambda: bench_pool.convertToAssets(AMOUNT),
+        "balanceOf": lambda: bench_pool.balanceOf(depositor),
+        "allowance": lambda: bench_pool.allowance(depositor, rando),
+        "nonces": lambda: bench_pool.nonces(signer),
+        "totalSupply": lambda: bench_pool.totalSupply(),
+        "total_supply": lambda: bench_pool.total_supply(),
+        "total_assets": lambda: bench_pool.total_assets(),
+        "asset": lambda: bench_pool.asset(),
+        "name": lambda: bench_pool.name(),
+        "symbol": lambda: bench_pool.symbol(),
+        "decimals": lambda: bench_pool.decimals(),
+        "n": lambda: bench_pool.n(),
+        "v": lambda: bench_pool.v(),
+        "owner": lambda: bench_pool.owner(),
+        "pending_owner": lambda: bench_pool.pending_owner(),
+        "rev_recipient": lambda: bench_pool.rev_recipient(),
+        "pending_rev_recipient": lambda: bench_pool.pending_rev_recipient(),
+        "redemption_queue": lambda: bench_pool.redemption_queue(),
+        "min_deposit": lambda: bench_pool.min_deposit(),
+        "max_assets": lambda: bench_pool.max_assets(),
+        "DOMAIN_SEPARATOR": lambda: bench_pool.DOMAIN_SEPARATOR(),
+        "CACHED_CHAIN_ID": lambda: bench_pool.CACHED_CHAIN_ID(),
+        "CACHED_COMAIN_SEPARATOR": lambda: bench_pool.CACHED_COMAIN_SEPARATOR(),
+        "API_VERSION": lambda: bench_pool.API_VERSION(),
+        "CONTRACT_NAME": lambda: bench_pool.CONTRACT_NAME(),
+        "FEE_COEFFICIENT": lambda: bench_pool.FEE_COEFFICIENT(),
+        "FOUR_EEKS_VESTING_RATE": lambda: bench_pool.FOUR_EEKS_VESTING_RATE(),
+        "MAX_BATCH_SIZE": lambda: bench_pool.MAX_BATCH_SIZE(),
+        "MAX_MULTICALL_CALLDATA": lambda: bench_pool.MAX_MULTICALL_CALLDATA(),
+        "MAX_PITTANCE_FEE": lambda: bench_pool.MAX_PITTANCE_FEE(),
+        "MAX_UNSTAKE_QUEUE": lambda: bench_pool.MAX_UNSTAKE_QUEUE(),
+        "PRICE_DECIMALS": lambda: bench_pool.PRICE_DECIMALS(),
+        "SNITCH_FEE": lambda: bench_pool.SNITCH_FEE(),
+        "UNSTAKE_TIMELOCK": lambda: bench_pool.UNSTAKE_TIMELOCK(),
+        "VESTING_RATE_COEFFICIENT": lambda: bench_pool.VESTING_RATE_COEFFICIENT(),
+    })
+
+    # handover to new owner and rev recipient
+    bench_pool.set_owner(rando, sender=admin)
+    bench_pool.set_rev_recipient(rando, sender=admin)
+    _bench(gas_snapshot, state, bench_pool, {
+        "accept_owner": lambda: bench_pool.accept_owner(sender=rando),
+        "accept_rev_recipient": lambda: bench_pool.accept_rev_recipient(sender=rando),
+    })
+
+    _assert_no_regressions(gas_snapshot, state)
+
+
+@pytest.mark.gas
+@requires_pinned_boa
+def test_gas_active_lines(gas_snapshot, bench_pool, base_asset, admin, depositor, _create_line):
+    state = "active_lines"
+    line = _create_line(boa.env.generate_address())
+    line2 = _create_line(boa.env.generate_address())
+    new_line = _create_line(boa.env.generate_address())
+    revenue_line = _create_line(boa.env.generate_address())
+
+    bench_pool.deposit(INIT_USER_POOL_BALANCE, depositor, sender=depositor)
+    id = _collectable_line(bench_pool, line, base_asset, admin)
+    id2 = _collectable_line(bench_pool, line2, base_asset, admin)
+    # borrower drew down and line has revenue on hand to repay with
+    revenue_id = bench_pool.add_credit(revenue_line, 0, 1000, AMOUNT, sender=admin)
+    revenue_line.borrow(revenue_id, AMOUNT // 2)
+    base_asset.mint(revenue_line, AMOUNT // 2)
+
+    calls = [("reduce_credit", line, id, AMOUNT // 2), ("increase_credit", line2, id2, AMOUNT), ("unlock_profits",)]
+    _bench(gas_snapshot, state, bench_pool, {
+        "add_credit": lambda: bench_pool.add_credit(new_line, 100, 100, AMOUNT, sender=admin),
+        "increase_credit": lambda: bench_pool.increase_credit(line, id, AMOUNT, sender=admin),
+        "set_rates": lambda: bench_pool.set_rates(line, id, 100, 100, sender=admin),
+        "collect_interest": lambda: bench_pool.collect_interest(line, id),
+        "collect_interest_many": lambda: bench_pool.collect_interest_many([line.address, line2.address], [id, id2]),
+        "reduce_credit": lambda: bench_pool.reduce_credit(line, id, AMOUNT // 2, sender=admin),
+        "abort": lambda: bench_pool.abort(line, id, sender=admin),
+        "multicall": lambda: bench_pool.multicall(_encode_multicall(calls), sender=admin),
+        "deposit": lambda: bench_pool.deposit(AMOUNT, depositor, sender=depositor),
+        "withdraw": lambda: bench_pool.withdraw(AMOUNT, depositor, depositor, sender=depositor),
+        "use_and_repay": lambda: bench_pool.use_and_repay(revenue_line, AMOUNT // 2, AMOUNT, sender=admin),
+        "get_credit_positions": lambda: bench_pool.get_credit_positions(1, bench_pool.MAX_BATCH_SIZE()),
+        "credit_position_count": lambda: bench_pool.credit_position_count(),
+        "total_deployed": lambda: bench_pool.total_deployed(),
+        "debt_principal": lambda: bench_pool.debt_principal(),
+        "impairments": lambda: bench_pool.impairments(line),
+    })
+
+    # borrower defaults
+    line.borrow(id, AMOUNT // 2)
+    line.declareInsolvent()
+    _bench(gas_snapshot, state, bench_pool, {
+        "impair": lambda: bench_pool.impair(line, id),
+    })
+
+    _assert_no_regressions(gas_snapshot, state)
+
+
+@pytest.mark.gas
+@requires_pinned_boa
+def test_gas_locked_profits_vesting(gas_snapshot, bench_pool, base_asset, admin, depositor, flash_borrower, _create_line):
+    state = "vesting_profits"
+    rando = boa.env.generate_address()
+    line = _create_line(boa.env.generate_address())
+
+    bench_pool.deposit(INIT_USER_POOL_BALANCE, depositor, sender=depositor)
+    id = _collectable_line(bench_pool, line, base_asset, admin, INIT_USER_POOL_BALANCE // 2)
+    bench_pool.collect_interest(line, id)
+    # halfway through vesting
+    boa.env.time_travel(seconds=60*60*24*7)
+
+    bench_pool.approve(rando, AMOUNT, sender=depositor)
+    base_asset.mint(admin, AMOUNT)
+    base_asset.approve(bench_pool, AMOUNT, sender=admin)
+    bench_pool.stake_assets(AMOUNT, sender=admin)
+    for _ in range(3):
+        bench_pool.initiate_unstake(AMOUNT // 3, sender=admin)
+    boa.env.time_travel(seconds=bench_pool.UNSTAKE_TIMELOCK() + 1)
+    base_asset.mint(flash_borrower, AMOUNT)
+    # unvested flash fee waiting for the next accounting update
+    bench_pool.flashLoan(flash_borrower, base_asset, AMOUNT, b"", sender=flash_borrower.address)
+
+    _bench(gas_snapshot, state, bench_pool, {
+        "deposit": lambda: bench_pool.deposit(AMOUNT, depositor, sender=depositor),
+        "mint": lambda: bench_pool.mint(AMOUNT, depositor, sender=depositor),
+        "withdraw": lambda: bench_pool.withdraw(AMOUNT, depositor, depositor, sender=depositor),
+        "redeem": lambda: bench_pool.redeem(AMOUNT, depositor, depositor, sender=depositor),
+        "transfer": lambda: bench_pool.transfer(rando, AMOUNT, sender=depositor),
+        "transferFrom": lambda: bench_pool.transferFrom(depositor, rando, AMOUNT, sender=rando),
+        "unlock_profits": lambda: bench_pool.unlock_profits(),
+        "flashLoan": lambda: bench_pool.flashLoan(flash_borrower, base_asset, AMOUNT, b"", sender=flash_borrower.address),
+        "claim_rev": lambda: bench_pool.claim_rev(bench_pool, 1, sender=admin),
+        "initiate_unstake": lambda: bench_pool.initiate_unstake(1, sender=admin),
+        "unstake_shares": lambda: bench_pool.unstake_shares(0, admin, sender=admin),
+        "unstake_matured": lambda: bench_pool.unstake_matured(3, admin, sender=admin),
+        "price": lambda: bench_pool.price(),
+        "APR": lambda: bench_pool.APR(),
+        "maxFlashLoan": lambda: bench_pool.maxFlashLoan(base_asset),
+        "flashFee": lambda: bench_pool.flashFee(base_asset, AMOUNT),
+        "maxWithdraw": lambda: bench_pool.maxWithdraw(depositor),
+        "maxRedeem": lambda: bench_pool.maxRedeem(depositor),
+        "previewWithdraw": lambda: bench_pool.previewWithdraw(AMOUNT),
+        "previewRedeem": lambda: bench_pool.previewRedeem(AMOUNT),
+        "claimable_rev": lambda: bench_pool.claimable_rev(bench_pool),
+        "free_profit": lambda: bench_pool.free_profit(),
+        "liquid_assets": lambda: bench_pool.liquid_assets(),
+        "pending_flash_fees": lambda: bench_pool.pending_flash_fees(),
+        "locked_profits": lambda: bench_pool.locked_profits(),
+        "last_report": lambda: bench_pool.last_report(),
+        "vesting_rate": lambda: bench_pool.vesting_rate(),
+        "accrued_fees": lambda: bench_pool.accrued_fees(),
+        "delegate_stake": lambda: bench_pool.delegate_stake(),
+        "unstake_queue": lambda: bench_pool.unstake_queue(0),
+        "unstake_head": lambda: bench_pool.unstake_head(),
+        "unstake_tail": lambda: bench_pool.unstake_tail(),
+        "balanceOf": lambda: bench_pool.balanceOf(depositor),
+    })
+
+    _assert_no_regressions(gas_snapshot, state)
+
+
+@pytest.mark.gas
+@requires_pinned_boa
+def test_gas_vault_investments(gas_snapshot, bench_pool, base_asset, admin, depositor, vault):
+    state = "vault_investments"
+
+    bench_pool.deposit(INIT_USER_POOL_BALANCE, depositor, sender=depositor)
+    bench_pool.invest_vault(vault, INIT_USER_POOL_BALANCE // 2, sender=admin)
+    # vault earns profit
+    base_asset.mint(vault, AMOUNT)
+    vault.eval(f"self.total_assets += {AMOUNT}")
+
+    _bench(gas_snapshot, state, bench_pool, {
+        "invest_vault": lambda: bench_pool.invest_vault(vault, AMOUNT, sender=admin),
+        "divest_vault": lambda: bench_pool.divest_vault(vault, AMOUNT, sender=admin),
+        "deposit": lambda: bench_pool.deposit(AMOUNT, depositor, sender=depositor),
+        "withdraw": lambda: bench_pool.withdraw(AMOUNT, depositor, depositor, sender=depositor),
+        "redeem": lambda: bench_pool.redeem(AMOUNT, depositor, depositor, sender=depositor),
+        "totalAssets": lambda: bench_pool.totalAssets(),
+        "vault_assets": lambda: bench_pool.vault_assets(),
+        "price": lambda: bench_pool.price(),
+        "get_vaults": lambda: bench_pool.get_vaults(1, bench_pool.MAX_BATCH_SIZE()),
+        "vault_count": lambda: bench_pool.vault_count(),
+        "vault_investments": lambda: bench_pool.vault_investments(vault),
+    })
+
+    _assert_no_regressions(gas_snapshot, state)
+
+
+@pytest.mark.gas
+@requires_pinned_boa
+@factory_compiler
+def test_gas_factory(gas_snapshot, admin, base_asset):
+    state = "factory"
+    # factory uses code_offset=0 so blueprint must be deployed without ERC5202 preamble
+    blueprint = boa.load_partial("contracts/DebtDAOPool.vy").deploy_as_blueprint(blueprint_preamble=None)
+    factory = boa.load("contracts/PoolFactory.vy", blueprint.address)
+    tokens = [boa.load('tests/mocks/MockERC20.vy', f"Token {i}", f"TKN{i}", 18).address for i in range(3)]
+
+    _bench(gas_snapshot, state, factory, {
+        "deploy_pool": lambda: factory.deploy_pool(admin, base_asset, "Pool", "POOL", 1000, 10, 0, sender=admin),
+        "deploy_pools": lambda: factory.deploy_pools([(admin, t, "Pool", "POOL", 1000, 10, 0) for t in tokens], sender=admin),
+        "compute_pool_address": lambda: factory.compute_pool_address(admin, base_asset, b"\x00" * 32),
+        "pool_implementation": lambda: factory.pool_implementation(),
+    })
+
+    _assert_no_regressions(gas_snapshot, state)
+
+
+@pytest.mark.gas
+@pytest.mark.skipif(UPDATE_SNAPSHOT, reason="baseline is rewritten after benchmarks finish")
+def test_gas_snapshot_covers_pool_abi():
+    # new external functions need a benchmark too
+    compiled = boa.load_partial("contracts/DebtDAOPool.vy").compiler_data
+    functions = {f["name"] for f in build_abi_output(compiled) if f["type"] == "function"}
+    benchmarked = {name.split(":")[1] for name in GasSnapshot().baseline if name.startswith("DebtDAOPool:")}
+    assert functions - benchmarked - UNBENCHMARKED == set()
+
+
+@pytest.mark.gas
+def test_pool_runtime_code_fits_eip170():
+    compiled = boa.load_partial("contracts/DebtDAOPool.vy").compiler_data
+    assert len(compiled.bytecode_runtime) <= EIP170_MAX_CODE_SIZE
+
+
+@pytest.mark.gas
+@factory_compiler
+def test_pool_blueprint_fits_eip170():
+    # factory deploys pools from a blueprint so the pool's init code is the blueprint's runtime code
+    compiled = boa.load_partial("contracts/DebtDAOPool.vy").compiler_data
+    assert len(compiled.bytecode) <= EIP170_MAX_CODE_SIZE
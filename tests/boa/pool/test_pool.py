@@ -11,6 +11,7 @@ from eth_utils import to_checksum_address
 from datetime import timedelta
 from ..utils.events import _find_event, _find_event_by
 from ..utils.price import _calc_price, _to_assets, _to_shares
+from ..utils.permit import _sign_permit, _permit_signer
 from .conftest import VESTING_RATE_COEFFICIENT, SET_FEES_TO_ZERO, DRATE, FRATE, INTEREST_TIMESPAN_SEC, ONE_YEAR_IN_SEC,  FEE_COEFFICIENT, MAX_PITTANCE_FEE
 from ..conftest import MAX_UINT, ZERO_ADDRESS, POOL_PRICE_DECIMALS, INIT_POOL_BALANCE, INIT_USER_POOL_BALANCE
 
@@ -155,6 +156,52 @@ def test_withdrawing_from_pool_decreases_total_supply(pool, admin, me, base_asse
     assert pool.total_supply() == init_token_balances * 2 - 200
     
 
+@pytest.mark.pool
+def test_deposit_and_mint_with_permit_dont_need_approval(pool, admin, me, base_asset, init_token_balances):
+    depositor, key = _permit_signer(1)
+    deadline = boa.env.vm.state.timestamp + 60
+    base_asset.mint(depositor, 200)
+
+    signature = _sign_permit(base_asset, key, pool, 100, deadline)
+    assert pool.depositWithPermit(100, depositor, deadline, signature, sender=depositor) == 100
+    assert pool.balanceOf(depositor) == 100
+    assert base_asset.nonces(depositor) == 1
+
+    signature = _sign_permit(base_asset, key, pool, 100, deadline)
+    assert pool.mintWithPermit(100, me, 100, deadline, signature, admin, sender=depositor) == 100
+    assert pool.balanceOf(me) == 100 + init_token_balances
+    assert pool.totalAssets() == 200 + init_token_balances * 2
+    assert base_asset.allowance(depositor, pool) == 0
+
+
+@pytest.mark.pool
+def test_permit_deposit_needs_valid_signature_or_approval(pool, admin, me, base_asset):
+    depositor, key = _permit_signer(2)
+    deadline = boa.env.vm.state.timestamp + 60
+    base_asset.mint(depositor, 200)
+    signature = _sign_permit(base_asset, key, pool, 100, deadline)
+
+    # signed for 100 assets, not 101
+    with boa.reverts():
+        pool.depositWithPermit(101, depositor, deadline, signature, sender=depositor)
+    # permit signed by someone else
+    with boa.reverts():
+        pool.depositWithPermit(100, me, deadline, signature, sender=me)
+    # minting costs more than max assets signed
+    with boa.reverts():
+        pool.mintWithPermit(101, depositor, 100, deadline, signature, sender=depositor)
+
+    # frontrun permit doesnt block deposit
+    base_asset.permit(depositor, pool, 100, deadline, signature, sender=me)
+    pool.depositWithPermit(100, depositor, deadline, signature, sender=depositor)
+    assert pool.balanceOf(depositor) == 100
+
+    # existing allowance covers the mint but max assets is still enforced
+    base_asset.approve(pool, 100, sender=depositor)
+    with boa.reverts():
+        pool.mintWithPermit(11, depositor, 10, deadline, signature, sender=depositor)
+
+
 ############################################
 ########                            ########
 ########  Pool Owner Functionality  ########
@@ -345,7 +392,7 @@ def test_revenue_calculations_based_on_fees_state(
         fee_bps = pittance_fee if _is_pittance_fee(fee_type) else perf_fee
 
         set_fee(fee_bps, sender=admin) # set fee so we generate revenue
-        assert fee_bps == pool.eval(f'self.fees.{fee_type}')
+        assert fee_bps == pool.eval(f'self._fees().{fee_type}')
         print(f"\n\n\n")
         rev_data = _gen_rev(fee_type, amount)
 
@@ -565,10 +612,10 @@ def test_can_set_pittance_fee_0_to_200_bps(pool, pittance_fee_types, admin, pitt
     for fee_type in pittance_fee_types:
         set_fee = getattr(pool, f'set_{fee_type}_fee', lambda x: "Fee type does not exist in Pool.vy")
 
-        curr_fee = pool.eval(f'self.fees.{fee_type}')
+        curr_fee = pool.eval(f'self._fees().{fee_type}')
         assert curr_fee == 0
         set_fee(pittance_fee, sender=admin)
-        new_fee = pool.eval(f'self.fees.{fee_type}')
+        new_fee = pool.eval(f'self._fees().{fee_type}')
         assert new_fee == pittance_fee
 
 
@@ -584,10 +631,10 @@ def test_cant_set_performance_fee_over_10000_bps(pool, admin):
 @given(perf_fee=st.integers(min_value=1, max_value=FEE_COEFFICIENT))
 @settings(max_examples=100, deadline=timedelta(seconds=1000))
 def test_can_set_performance_fee_under_10000_bps(pool, admin, perf_fee):
-    curr_fee = pool.eval(f'self.fees.performance')
+    curr_fee = pool.eval(f'self._fees().performance')
     assert curr_fee == 0
     pool.set_performance_fee(perf_fee, sender=admin)
-    new_fee = pool.eval(f'self.fees.performance')
+    new_fee = pool.eval(f'self._fees().performance')
     assert new_fee == perf_fee
 
 
@@ -618,6 +665,17 @@ def test_setting_fees_emits_standard_event(pool, pool_fee_types, admin, fee_bps)
         assert event['fee_type'] == enum_idx
         assert pool.fees()[idx] == fee_bps
 
+@pytest.mark.pool
+@pytest.mark.rev_generator
+@given(fee_bps=st.integers(min_value=1, max_value=MAX_PITTANCE_FEE - 5)) # each fee type gets a different bps
+@settings(max_examples=100, deadline=timedelta(seconds=1000))
+def test_setting_fee_doesnt_change_other_packed_fees(pool, pool_fee_types, admin, fee_bps):
+    pool.eval(SET_FEES_TO_ZERO)
+    for idx, fee_type in enumerate(pool_fee_types):
+        getattr(pool, f'set_{fee_type}_fee')(fee_bps + idx, sender=admin)
+        expected = [fee_bps + i if i <= idx else 0 for i in range(len(pool_fee_types))]
+        assert list(pool.fees()) == expected
+
 def _is_pittance_fee(fee_name: str) -> bool:
     if fee_name:
         match fee_name:
@@ -629,6 +687,115 @@ def _is_pittance_fee(fee_name: str) -> bool:
                 return True
 
 
+@pytest.mark.pool
+@pytest.mark.pool_owner
+def test_unstake_matured_settles_all_unlocked_unstakes_in_one_tx(pool, base_asset, admin):
+    base_asset.mint(admin, 1000)
+    base_asset.approve(pool, 1000, sender=admin)
+    stake = pool.stake_assets(1000, sender=admin)
+    rando = boa.env.generate_address()
+
+    # staggered unstakes a day apart
+    for i in range(4):
+        assert pool.initiate_unstake(100, sender=admin) == i
+        boa.env.time_travel(seconds=60*60*24)
+
+    # first 2 unstakes matured, last 2 still locked
+    boa.env.time_travel(seconds=pool.UNSTAKE_TIMELOCK() - 60*60*24*3 + 1)
+    assert pool.unstake_matured(10, rando, sender=admin) == 200
+    assert pool.balanceOf(rando) == 200
+    assert pool.delegate_stake() == stake - 200
+    assert pool.unstake_head() == 2 and pool.unstake_tail() == 4
+    # settled slots cleared for gas refunds
+    assert pool.unstake_queue(0) == 0 and pool.unstake_queue(1) == 0
+
+    # nothing matured
+    assert pool.unstake_matured(10, rando, sender=admin) == 0
+    assert pool.unstake_head() == 2
+
+    boa.env.time_travel(seconds=60*60*24*2)
+    # claim one individually, batch should skip it
+    pool.unstake_shares(3, rando, sender=admin)
+    assert pool.unstake_head() == 2
+    assert pool.unstake_matured(1, rando, sender=admin) == 100
+    assert pool.unstake_head() == 3
+    # only cleared entry left. head still moves past it
+    assert pool.unstake_matured(10, rando, sender=admin) == 0
+    assert pool.unstake_head() == pool.unstake_tail() == 4
+    assert pool.balanceOf(rando) == 400
+    assert pool.delegate_stake() == stake - 400
+
+
+@pytest.mark.pool
+@pytest.mark.pool_owner
+def test_unstake_queue_is_bounded_and_owner_only(pool, base_asset, admin, me):
+    max_queue = pool.MAX_UNSTAKE_QUEUE()
+    base_asset.mint(admin, max_queue + 1)
+    base_asset.approve(pool, max_queue + 1, sender=admin)
+    pool.stake_assets(max_queue + 1, sender=admin)
+
+    with boa.reverts():
+        pool.initiate_unstake(1, sender=me)
+
+    for _ in range(max_queue):
+        pool.initiate_unstake(1, sender=admin)
+    with boa.reverts():
+        pool.initiate_unstake(1, sender=admin)
+
+    boa.env.time_travel(seconds=pool.UNSTAKE_TIMELOCK() + 1)
+    with boa.reverts():
+        pool.unstake_matured(max_queue, me, sender=me)
+    pool.unstake_shares(0, admin, sender=admin)
+    assert pool.unstake_head() == 1
+    with boa.reverts(): # cant claim twice
+        pool.unstake_shares(0, admin, sender=admin)
+
+    assert pool.unstake_matured(max_queue, admin, sender=admin) == max_queue - 1
+    # ring buffer slots reusable once settled
+    assert pool.initiate_unstake(1, sender=admin) == max_queue
+
+
+@pytest.mark.pool
+@pytest.mark.pool_owner
+def test_unstake_shares_frees_queue_slots(pool, base_asset, admin):
+    """
+    claiming the head entry with unstake_shares must advance the head
+    otherwise the ring buffer fills up after MAX_UNSTAKE_QUEUE individual claims
+    """
+    max_queue = pool.MAX_UNSTAKE_QUEUE()
+    base_asset.mint(admin, max_queue + 1)
+    base_asset.approve(pool, max_queue + 1, sender=admin)
+    pool.stake_assets(max_queue + 1, sender=admin)
+
+    for i in range(max_queue):
+        assert pool.initiate_unstake(1, sender=admin) == i
+        boa.env.time_travel(seconds=pool.UNSTAKE_TIMELOCK() + 1)
+        pool.unstake_shares(i, admin, sender=admin)
+        assert pool.unstake_head() == pool.unstake_tail() == i + 1
+
+    assert pool.initiate_unstake(1, sender=admin) == max_queue
+    assert pool.balanceOf(admin) == max_queue
+
+
+@pytest.mark.pool
+@pytest.mark.pool_owner
+def test_unstake_clamps_to_slashed_stake(pool, base_asset, admin):
+    base_asset.mint(admin, 1000)
+    base_asset.approve(pool, 1000, sender=admin)
+    stake = pool.stake_assets(1000, sender=admin)
+    pool.initiate_unstake(600, sender=admin)
+    pool.initiate_unstake(400, sender=admin)
+
+    # impairment burns part of stake after unstakes were queued
+    pool.eval(f"self.delegate_stake = {stake - 300}")
+    boa.env.time_travel(seconds=pool.UNSTAKE_TIMELOCK() + 1)
+
+    # second entry only gets whats left but is still cleared from the queue
+    assert pool.unstake_matured(10, admin, sender=admin) == stake - 300
+    assert pool.delegate_stake() == 0
+    assert pool.unstake_head() == pool.unstake_tail() == 2
+
+
 @pytest.mark.slow
 @pytest.mark.pool
 @pytest.mark.invariant
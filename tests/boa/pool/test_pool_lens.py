@@ -0,0 +1,87 @@
+import boa
+import asyncio
+import pytest
+from offchain.lens import PoolLensReader, decode_pool_state, to_columns, POOL_STATE_SELECTOR
+from ..utils.chain import BoaChainClient
+from .conftest import DRATE, FRATE, INTEREST_TIMESPAN_SEC
+
+GETTERS = (
+    "asset", "decimals", "totalAssets", "totalSupply", "price", "locked_profits", "free_profit", "pending_flash_fees",
+    "liquid_assets", "total_deployed", "debt_principal", "accrued_fees", "delegate_stake", "fees", "vesting_rate",
+    "last_report", "min_deposit", "max_assets", "owner", "rev_recipient", "credit_position_count", "vault_count",
+)
+
+def _getters(pool) -> tuple:
+    return tuple(getattr(pool, name)() for name in GETTERS)
+
+@pytest.fixture
+def active_pool(pool, admin, me, base_asset, flash_borrower, _deposit, _collect_interest):
+    pool.set_performance_fee(1000, sender=admin)
+    pool.set_flash_fee(10, sender=admin)
+    _deposit(10**21, me)
+    base_asset.mint(admin, 10**19)
+    base_asset.approve(pool, 10**19, sender=admin)
+    pool.stake_assets(10**19, sender=admin)
+    _collect_interest(10**20, DRATE, FRATE, INTEREST_TIMESPAN_SEC)
+    pool.flashLoan(flash_borrower, base_asset, 10**19, b"", sender=flash_borrower.address)
+    boa.env.time_travel(seconds=3600)
+    return pool
+
+@pytest.mark.pool
+def test_pool_state_matches_getters(lens, active_pool):
+    state = lens.pool_state(active_pool)
+    assert state[0] == active_pool.address
+    assert state[1:-2] == _getters(active_pool)
+    assert state[-2:] == (boa.env.vm.state.block_number, boa.env.vm.state.timestamp)
+    # still vesting
+    assert 0 < state[GETTERS.index("free_profit") + 1] < state[GETTERS.index("locked_profits") + 1]
+    assert lens.pool_states([active_pool.address, active_pool.address]) == [state, state]
+
+@pytest.mark.pool
+def test_pool_lens_reader_decodes_states(lens, active_pool, vault, base_asset):
+    client = BoaChainClient(boa.env.generate_address())
+    # not a pool so its chunk reverts and pools are read one by one
+    pools = [active_pool.address, vault.address, base_asset.address]
+    states = asyncio.run(PoolLensReader(client, lens.address).pool_states(pools))
+
+    assert list(states) == [active_pool.address.lower(), vault.address.lower()]
+    for pool in (active_pool, vault):
+        state = states[pool.address.lower()]
+        assert state["pool"] == pool.address.lower() and state["asset"] == base_asset.address.lower()
+        assert state["price"] == pool.price() and state["free_profit"] == pool.free_profit()
+        assert tuple(state["fees"].values()) == pool.fees()
+        assert list(state.keys())[1:-2] == [name for name in (
+            "asset", "decimals", "total_assets", "total_supply", "price", "locked_profits", "free_profit",
+            "pending_flash_fees", "liquid_assets", "total_deployed", "debt_principal", "accrued_fees", "delegate_stake",
+            "fees", "vesting_rate", "last_report", "min_deposit", "max_assets", "owner", "rev_recipient",
+            "credit_position_count", "vault_count",
+        )]
+
+    [output] = asyncio.run(client.call_many([(lens.address, POOL_STATE_SELECTOR + bytes(12) + bytes.fromhex(active_pool.address[2:]))]))
+    assert decode_pool_state(output) == states[active_pool.address.lower()]
+
+    columns = to_columns(states.values())
+    assert list(columns["fees_performance"]) == [1000, vault.fees()[0]]
+    assert list(columns["total_assets"]) == [active_pool.totalAssets(), vault.totalAssets()]
+
+
+@pytest.mark.pool
+@pytest.mark.ERC4626
+def test_accounts_state_matches_per_account_getters(lens, active_pool, admin, me, base_asset, _deposit):
+    holders = [me, admin, boa.env.generate_address(), boa.env.generate_address()]
+    _deposit(10**18, holders[2])
+    active_pool.approve(admin, 10**17, sender=me)
+    accounts = holders + [active_pool.address]
+
+    state = lens.accounts_state(active_pool, accounts, admin)
+    assert state[:3] == (active_pool.address, active_pool.price(), active_pool.liquid_assets())
+    rows = [(a, active_pool.balanceOf(a), active_pool.maxWithdraw(a), active_pool.maxRedeem(a), active_pool.allowance(a, admin), active_pool.nonces(a)) for a in accounts]
+    assert [tuple(row) for row in state[3]] == rows
+    # assets lent out cap big holders by liquidity
+    assert active_pool.maxWithdraw(me) == active_pool.liquid_assets() < active_pool.convertToAssets(active_pool.balanceOf(me))
+
+    client = BoaChainClient(boa.env.generate_address())
+    reader = PoolLensReader(client, lens.address)
+    decoded = asyncio.run(reader.accounts_state(active_pool.address, accounts, admin))
+    assert list(decoded) == [a.lower() for a in accounts]
+    assert [tuple(row.values()) for row in decoded.values()] == [(a.lower(), *rest) for a, *rest in rows]
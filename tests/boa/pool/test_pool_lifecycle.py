@@ -0,0 +1,305 @@
+import os
+import boa
+import time
+import logging
+import pytest
+from hypothesis import settings, HealthCheck
+from hypothesis import strategies as st
+from hypothesis.stateful import RuleBasedStateMachine, run_state_machine_as_test, rule, invariant, precondition
+from .conftest import VESTING_RATE_COEFFICIENT, FEE_COEFFICIENT, DRATE, FRATE
+from ..conftest import INIT_USER_POOL_BALANCE
+
+# Stateful fuzzing of a pool through its whole lifecycle - lenders depositing/withdrawing, delegate investing in
+# lines and vaults, borrowers drawing down/repaying/defaulting, flash loans and delegate staking.
+# Invariants are the share price INVARIANTS from the header of test_pool_share_price.py.
+#
+# Defaults are sized for CI. For overnight runs crank them up e.g.
+# POOL_FUZZ_EXAMPLES=100000 POOL_FUZZ_STEPS=100 pytest tests/boa/pool/test_pool_lifecycle.py
+# hypothesis picks a new seed every run so one process per core covers different paths
+FUZZ_EXAMPLES = int(os.environ.get("POOL_FUZZ_EXAMPLES", 10))
+FUZZ_STEPS = int(os.environ.get("POOL_FUZZ_STEPS", 50))
+
+PRICE_DECIMALS = 10**8
+MAX_LINES = 4
+MAX_UNSTAKE_QUEUE = 64
+UNSTAKE_TIMELOCK = 60*60*24 * 7
+UINT192_MASK = 2**192 - 1
+
+pct = st.integers(min_value=1, max_value=100)
+amounts = st.integers(min_value=10**18, max_value=INIT_USER_POOL_BALANCE)
+
+class PoolLifecycle(RuleBasedStateMachine):
+    """
+    Contracts are deployed once by session fixtures and passed in.
+    Every example runs in its own anchor so it starts from the same world and leaves nothing behind.
+    """
+    def __init__(self, pool, vault, base_asset, admin, lenders, borrower, flash_borrower, create_line, stats):
+        super().__init__()
+        self.pool = pool
+        self.vault = vault
+        self.base_asset = base_asset
+        self.admin = admin
+        self.lenders = lenders
+        self.borrower = borrower
+        self.flash_borrower = flash_borrower
+        self.create_line = create_line
+        self.stats = stats
+        self.snitch = boa.env.generate_address()
+
+        self.lines = [] # (line, id) with open positions
+        self.unstaking = 0 # queued unstakes not settled yet
+
+        self._anchor = boa.env.anchor()
+        self._anchor.__enter__()
+        stats['examples'] += 1
+
+    def teardown(self):
+        self._anchor.__exit__(None, None, None)
+
+    def _step(self):
+        self.stats['steps'] += 1
+
+    def _available(self) -> int:
+        # funds delegate can invest. see _assert_owner_has_available_funds
+        return max(0, self.pool.total_assets() - self.pool.total_deployed())
+
+    def _locked_profit(self) -> int:
+        # python version of _calc_locked_profit
+        elapsed = boa.env.vm.state.timestamp - self.pool.last_report()
+        pct_locked = elapsed * self.pool.vesting_rate()
+        locked = self.pool.locked_profits()
+        return 0 if pct_locked >= VESTING_RATE_COEFFICIENT else locked - (pct_locked * locked // VESTING_RATE_COEFFICIENT)
+
+    ### lenders
+
+    @rule(lender=st.integers(min_value=0), amount=amounts)
+    def deposit(self, lender, amount):
+        self._step()
+        lender = self.lenders[lender % len(self.lenders)]
+        self.base_asset.mint(lender, amount)
+        self.base_asset.approve(self.pool, amount, sender=lender)
+        self.pool.deposit(amount, lender, sender=lender)
+
+    @rule(lender=st.integers(min_value=0), pct=pct)
+    def withdraw(self, lender, pct):
+        self._step()
+        lender = self.lenders[lender % len(self.lenders)]
+        assets = self.pool.maxWithdraw(lender) * pct // 100
+        if assets != 0:
+            self.pool.withdraw(assets, lender, lender, sender=lender)
+
+    @rule(amount=amounts)
+    def flash_loan(self, amount):
+        self._step()
+        amount = min(amount, self.pool.maxFlashLoan(self.base_asset))
+        if amount != 0:
+            # pool pulls repayment from caller not receiver
+            self.pool.flashLoan(self.flash_borrower, self.base_asset, amount, b"", sender=self.flash_borrower.address)
+
+    @rule(seconds=st.integers(min_value=1, max_value=60*60*24*30))
+    def time_travel(self, seconds):
+        self._step()
+        boa.env.time_travel(seconds=seconds)
+
+    @rule()
+    def unlock_profits(self):
+        self._step()
+        price = self.pool.price()
+        self.pool.unlock_profits()
+        # calling unlock_profit() MUST update last_report to equal block.timestamp
+        assert self.pool.last_report() == boa.env.vm.state.timestamp
+        # vesting only ever unlocks assets
+        assert self.pool.price() >= price
+
+    ### credit
+
+    @precondition(lambda self: len(self.lines) < MAX_LINES)
+    @rule(pct=pct, drate=st.integers(min_value=0, max_value=DRATE * 5), frate=st.integers(min_value=0, max_value=FRATE * 5))
+    def add_credit(self, pct, drate, frate):
+        self._step()
+        amount = self._available() * pct // 100
+        if amount == 0:
+            return
+        line = self.create_line(self.borrower)
+        id = self.pool.add_credit(line, drate, frate, amount, sender=self.admin)
+        self.lines.append((line, id))
+
+    @precondition(lambda self: self.lines)
+    @rule(line=st.integers(min_value=0), pct=pct)
+    def increase_credit(self, line, pct):
+        self._step()
+        line, id = self.lines[line % len(self.lines)]
+        amount = self._available() * pct // 100
+        if amount != 0:
+            self.pool.increase_credit(line, id, amount, sender=self.admin)
+
+    @precondition(lambda self: self.lines)
+    @rule(line=st.integers(min_value=0), pct=pct)
+    def borrow(self, line, pct):
+        self._step()
+        line, id = self.lines[line % len(self.lines)]
+        (deposit, principal, *_) = line.credits(id)
+        amount = (deposit - principal) * pct // 100
+        if amount != 0:
+            line.borrow(id, amount, sender=self.borrower)
+
+    @precondition(lambda self: self.lines)
+    @rule(line=st.integers(min_value=0), pct=pct)
+    def repay(self, line, pct):
+        self._step()
+        line, id = self.lines[line % len(self.lines)]
+        line.accrueInterest(id)
+        (_, principal, interest_accrued, *_) = line.credits(id)
+        amount = (principal + interest_accrued) * pct // 100
+        if amount != 0:
+            self.base_asset.mint(self.borrower, amount)
+            self.base_asset.approve(line, amount, sender=self.borrower)
+            line.depositAndRepay(id, amount, sender=self.borrower)
+
+    @precondition(lambda self: self.lines)
+    @rule(line=st.integers(min_value=0))
+    def collect_interest(self, line):
+        self._step()
+        line, id = self.lines[line % len(self.lines)]
+        (_, _, _, interest_repaid, *_) = line.credits(id)
+        if interest_repaid == 0:
+            return
+        # price MUST NOT immediately increase when fees earned (call unlock_profit before paying fees)
+        self.pool.unlock_profits()
+        price = self.pool.price()
+        self.pool.collect_interest(line, id, sender=self.snitch)
+        assert self.pool.price() <= price
+
+    @precondition(lambda self: self.lines)
+    @rule(line=st.integers(min_value=0), pct=pct)
+    def reduce_credit(self, line, pct):
+        self._step()
+        line, id = self.lines[line % len(self.lines)]
+        line.accrueInterest(id)
+        (deposit, principal, _, interest_repaid, *_) = line.credits(id)
+        amount = (deposit + interest_repaid - principal) * pct // 100
+        if amount != 0:
+            self.pool.reduce_credit(line, id, amount, sender=self.admin)
+
+    @precondition(lambda self: self.lines)
+    @rule(line=st.integers(min_value=0))
+    def impair(self, line):
+        self._step()
+        line, id = self.lines[line % len(self.lines)]
+        (_, principal, _, interest_repaid, *_) = line.credits(id)
+        if principal == 0:
+            return
+        price = self.pool.price()
+        accrued_fees = self.pool.accrued_fees()
+
+        # snitch fee is paid out of liquid assets before anything is recovered from the line.
+        # if pool might not cover it, delegate impairs themselves which doesnt pay a snitch fee
+        max_burn = self.pool.convertToAssets(accrued_fees + self.pool.delegate_stake())
+        max_snitch_fee = max_burn * self.pool.SNITCH_FEE() // FEE_COEFFICIENT + 1
+        snitch = self.snitch if self.base_asset.balanceOf(self.pool) >= max_snitch_fee else self.admin
+
+        line.declareInsolvent()
+        self.pool.impair(line, id, sender=snitch)
+        self.lines.remove((line, id))
+
+        # price always immediately decreases on impair calls if no accrued_fees
+        if accrued_fees == 0 and principal > interest_repaid:
+            assert self.pool.price() <= price
+
+    ### vaults
+
+    @rule(pct=pct)
+    def invest_vault(self, pct):
+        self._step()
+        amount = self._available() * pct // 100
+        if amount != 0:
+            self.pool.invest_vault(self.vault, amount, sender=self.admin)
+
+    @precondition(lambda self: self.pool.vault_investments(self.vault) != 0)
+    @rule(pct=pct)
+    def divest_vault(self, pct):
+        self._step()
+        # maxWithdraw doesnt include vault's withdraw fee
+        amount = self.vault.previewRedeem(self.vault.balanceOf(self.pool)) * pct // 100
+        if amount != 0:
+            self.pool.divest_vault(self.vault, amount, sender=self.admin)
+
+    ### delegate stake
+
+    @rule(amount=amounts)
+    def stake(self, amount):
+        self._step()
+        self.base_asset.mint(self.admin, amount)
+        self.base_asset.approve(self.pool, amount, sender=self.admin)
+        self.pool.stake_assets(amount, sender=self.admin)
+
+    @precondition(lambda self: self.unstaking < MAX_UNSTAKE_QUEUE)
+    @rule(pct=pct)
+    def initiate_unstake(self, pct):
+        self._step()
+        shares = self.pool.delegate_stake() * pct // 100
+        if shares != 0:
+            self.pool.initiate_unstake(shares, sender=self.admin)
+            self.unstaking += 1
+
+    @precondition(lambda self: self.unstaking)
+    @rule()
+    def unstake_matured(self):
+        self._step()
+        boa.env.time_travel(seconds=UNSTAKE_TIMELOCK + 1)
+        # everything queued is matured now
+        queued = sum(
+            self.pool.unstake_queue(i % MAX_UNSTAKE_QUEUE) & UINT192_MASK
+            for i in range(self.pool.unstake_head(), self.pool.unstake_tail())
+        )
+        stake = self.pool.delegate_stake()
+        # stake slashed by impairments since initiating is clamped to whats left
+        assert self.pool.unstake_matured(MAX_UNSTAKE_QUEUE, self.admin, sender=self.admin) == min(queued, stake)
+        self.unstaking = self.pool.unstake_tail() - self.pool.unstake_head()
+        assert self.unstaking == 0
+
+    ### INVARIANTS
+
+    @invariant()
+    def locked_profit_vests_linearly(self):
+        # locked_profit^t = total_interest_earned * vesting_rate^t
+        assert self.pool.vault_assets() == self.pool.total_assets() - self._locked_profit()
+        assert self.pool.locked_profits() <= self.pool.total_assets()
+
+    @invariant()
+    def price_is_vested_assets_per_share(self):
+        # price^t = total_assets^t / shares
+        assets = self.pool.vault_assets()
+        expected = PRICE_DECIMALS if assets == 0 else assets * PRICE_DECIMALS // max(1, self.pool.totalSupply())
+        assert self.pool.price() == expected
+
+    @invariant()
+    def pool_holds_liquid_assets(self):
+        # everything not deployed must be in the pool. flash fees are held but not accounted yet
+        liquid = self.pool.total_assets() - min(self.pool.total_deployed(), self.pool.total_assets())
+        assert self.base_asset.balanceOf(self.pool) >= liquid + self.pool.pending_flash_fees()
+
+    @invariant()
+    def fees_and_stake_are_shares(self):
+        assert self.pool.accrued_fees() + self.pool.delegate_stake() <= self.pool.totalSupply()
+
+
+@pytest.mark.pool
+@pytest.mark.invariant
+@pytest.mark.line_integration
+def test_pool_lifecycle(pool, vault, base_asset, admin, me, borrower, flash_borrower, _create_line):
+    lenders = [me, boa.env.generate_address(), boa.env.generate_address()]
+    stats = { 'examples': 0, 'steps': 0 }
+
+    start = time.perf_counter()
+    run_state_machine_as_test(
+        lambda: PoolLifecycle(pool, vault, base_asset, admin, lenders, borrower, flash_borrower, _create_line, stats),
+        settings=settings(
+            max_examples=FUZZ_EXAMPLES,
+            stateful_step_count=FUZZ_STEPS,
+            deadline=None,
+            suppress_health_check=[HealthCheck.too_slow],
+        ),
+    )
+    elapsed = time.perf_counter() - start
+    logging.info(f"pool lifecycle: {stats['steps']} steps over {stats['examples']} examples in {elapsed:.1f}s ({stats['steps'] / elapsed:.1f} steps/sec)")
@@ -9,6 +9,7 @@ from eth_utils import to_checksum_address
 from datetime import timedelta
 from ..utils.events import _find_event, _find_event_by
 from ..utils.price import _to_assets, _to_shares, _calc_price
+from ..utils.multicall import _encode_call, _encode_multicall, _decode_multicall
 from .conftest import INTEREST_TIMESPAN_SEC, DRATE, FRATE, FEE_COEFFICIENT, MAX_PITTANCE_FEE, NULL_POSITION
 from ..conftest import ZERO_ADDRESS, INIT_USER_POOL_BALANCE, INIT_POOL_BALANCE, MAX_UINT, POOL_PRICE_DECIMALS
 
@@ -341,6 +342,149 @@ def test_anyone_can_call_collect_interest(
     assert p4['interestRepaid'] == 0 
 
 
+@pytest.mark.pool
+@pytest.mark.line_integration
+def test_collect_interest_many_books_profit_once(
+    pool, mock_line, my_line, admin, me, base_asset,
+    _add_credit, _get_position, _repay,
+):
+    amount = INIT_POOL_BALANCE
+    facility_fee = 1000 # 10%
+
+    id = _add_credit(amount, 0, facility_fee)
+    id2 = _add_credit(amount, 0, facility_fee, line=my_line)
+
+    boa.env.time_travel(seconds=INTEREST_TIMESPAN_SEC)
+
+    mock_line.accrueInterest(id)
+    my_line.accrueInterest(id2)
+    interest = _get_position(mock_line, id)['interestAccrued']
+    interest2 = _get_position(my_line, id2)['interestAccrued']
+    _repay(mock_line, id, interest)
+    _repay(my_line, id2, interest2)
+
+    init_assets = pool.totalAssets()
+    init_locked = pool.locked_profits()
+    rando = boa.env.generate_address()
+    collected = pool.collect_interest_many([mock_line.address, my_line.address], [id, id2], sender=rando)
+    logs = pool.get_logs()
+
+    assert collected == interest + interest2
+    assert pool.totalAssets() == init_assets + interest + interest2
+    assert pool.locked_profits() == init_locked + interest + interest2
+    # profits booked and fees charged once for whole batch
+    assert len([e for e in logs if e.event_type.name == 'UnlockProfits']) == 1
+    perf_rev_event = _find_event_by({ 'fee_type': 1 }, logs)
+    assert perf_rev_event['amount'] == interest + interest2
+
+    assert _get_position(mock_line, id)['interestRepaid'] == 0
+    assert _get_position(my_line, id2)['interestRepaid'] == 0
+
+
+@pytest.mark.pool
+@pytest.mark.line_integration
+def test_collect_interest_many_requires_interest_and_matching_positions(
+    pool, mock_line, my_line, admin, me,
+    _add_credit,
+):
+    id = _add_credit(100, 0, 0)
+    id2 = _add_credit(100, 0, 0, line=my_line)
+
+    with boa.reverts():
+        pool.collect_interest_many([mock_line.address, my_line.address], [id], sender=me)
+    # no interest repaid on either position yet
+    with boa.reverts():
+        pool.collect_interest_many([mock_line.address, my_line.address], [id, id2], sender=me)
+
+
+@pytest.mark.pool
+@pytest.mark.pool_owner
+@pytest.mark.line_integration
+def test_multicall_batches_delegate_rebalance(
+    pool, mock_line, my_line, vault, admin, me, base_asset,
+    _add_credit, _get_position, _deposit,
+):
+    id2 = _add_credit(500, 0, 0, line=my_line)
+    _deposit(1000 + 50 + 300, me)
+    init_deployed = pool.total_deployed()
+
+    calls = [
+        ("add_credit", mock_line, 0, 0, 1000),
+        ("reduce_credit", my_line, id2, 200),
+        ("increase_credit", my_line, id2, 50),
+        ("set_rates", my_line, id2, 100, 200),
+        ("invest_vault", vault, 300),
+        ("unlock_profits",),
+    ]
+    results = _decode_multicall(calls, pool.multicall(_encode_multicall(calls), sender=admin))
+
+    id = results[0]
+    assert _get_position(mock_line, id)['deposit'] == 1000
+    assert results[1] == (200, 0)
+    assert _get_position(my_line, id2)['deposit'] == 500 - 200 + 50
+    assert my_line.rates(id2)[:2] == (100, 200)
+    assert results[4] == vault.balanceOf(pool) and results[4] != 0
+    assert pool.total_deployed() == init_deployed + 1000 - 200 + 50 + 300
+
+
+@pytest.mark.pool
+@pytest.mark.pool_owner
+@pytest.mark.line_integration
+def test_multicall_only_owner_and_supported_functions(
+    pool, mock_line, admin, me,
+    _add_credit, _get_position,
+):
+    id = _add_credit(100, 0, 0)
+    call = _encode_call("reduce_credit", mock_line, id, 100)
+
+    with boa.reverts():
+        pool.multicall([call], sender=me)
+
+    # not a delegate portfolio function
+    with boa.reverts():
+        pool.multicall([bytes.fromhex("a9059cbb") + call[4:]], sender=admin)
+
+    # whole batch is atomic
+    with boa.reverts():
+        pool.multicall([call, call], sender=admin)
+    assert _get_position(mock_line, id)['deposit'] == 100
+
+    pool.multicall([call], sender=admin)
+    assert _get_position(mock_line, id)['deposit'] == 0
+
+
+@pytest.mark.pool
+@pytest.mark.line_integration
+def test_credit_position_registry_tracks_open_positions(
+    pool, mock_line, my_line, admin, me,
+    _add_credit,
+):
+    id = _add_credit(100, line=mock_line)
+    id2 = _add_credit(100, line=my_line)
+
+    assert pool.credit_position_count() == 2
+    assert pool.get_credit_positions(1, 10) == [(mock_line.address, id), (my_line.address, id2)]
+    assert pool.get_credit_positions(2, 1) == [(my_line.address, id2)]
+    assert pool.get_credit_positions(3, 10) == []
+
+    # position stays open until all principal is withdrawn
+    pool.reduce_credit(mock_line, id, 50, sender=admin)
+    assert pool.credit_position_count() == 2
+
+    # last position is swapped into closed position's slot
+    pool.abort(mock_line, id, sender=admin)
+    assert pool.credit_position_count() == 1
+    assert pool.get_credit_positions(1, 10) == [(my_line.address, id2)]
+
+    my_line.borrow(id2, 100)
+    my_line.declareInsolvent()
+    pool.impair(my_line, id2)
+    # lost principal can still be recovered from line so impaired position stays listed
+    assert pool.impairments(my_line) == 100
+    assert pool.credit_position_count() == 1
+    assert pool.get_credit_positions(1, 10) == [(my_line.address, id2)]
+
+
 @pytest.mark.pool
 @pytest.mark.pool_owner
 @pytest.mark.line_integration
@@ -545,9 +689,13 @@ def test_impair_only_callable_once(pool, base_asset, admin, mock_line, _get_posi
         # self.impairments[line] will be > 0 so assert fails
         pool.impair(mock_line, id)
     
+    # impaired position stays listed until lost principal is recovered
+    assert pool.get_credit_positions(1, 10) == [(mock_line.address, id)]
     principal, interest = pool.reduce_credit(mock_line, id, MAX_UINT, sender=admin)
     assert principal == 100
     assert interest == 0
+    assert pool.impairments(mock_line) == 0
+    assert pool.credit_position_count() == 0
 
 
 @pytest.mark.pool
@@ -623,7 +771,7 @@ def test_reduce_credit_on_insolvent_line_with_interest(
     new_perf_rev_event = _find_event_by({ 'fee_type': 1 }, new_events)
     new_collect_rev_event = _find_event_by({ 'fee_type': 16 }, new_events)
     new_total_deposits = interest + interest2 + INIT_POOL_BALANCE
-    new_rev = (_to_shares(interest2) * pool.eval('self.fees.performance')) / FEE_COEFFICIENT
+    new_rev = (_to_shares(interest2) * pool.eval('self._fees().performance')) / FEE_COEFFICIENT
     total_fees = perf_rev_event['revenue'] + new_rev
     assert base_asset.balanceOf(pool) == new_total_deposits
 
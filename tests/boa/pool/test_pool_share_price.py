@@ -85,7 +85,7 @@ def test_calling_unlock_profit_releases_all_available_profit(
     base_asset.mint(pool, total_profit)
     pool.eval(f"self.total_assets = {total_profit}")
     pool.eval(f"self.locked_profits = {total_profit}")
-    pool.eval(f"self.vesting_rate = {vesting_rate}")
+    pool.eval(f"self.packed_vesting = self._pack_vesting(self._last_report(), {vesting_rate})")
     # last_report set at contract deployment in fixture so should be `now`
 
     # nothing should change until we call unlock_profit
@@ -110,3 +110,114 @@ def test_calling_unlock_profit_releases_all_available_profit(
     # max liquid should include unlocked profits now
     assert pool.maxFlashLoan(base_asset) == total_profit - locked_profit
 
+
+@pytest.mark.pool
+@pytest.mark.share_price
+@given(vesting_rate=st.integers(min_value=0, max_value=VESTING_RATE_COEFFICIENT),
+        vesting_time=st.integers(min_value=1, max_value=10**8),)
+@settings(max_examples=100, deadline=timedelta(seconds=1000))
+def test_packed_vesting_schedule_updates_independently(pool, admin, vesting_rate, vesting_time):
+    last_report = pool.last_report()
+    pool.set_vesting_rate(vesting_rate, sender=admin)
+    assert pool.vesting_rate() == vesting_rate
+    assert pool.last_report() == last_report
+
+    boa.env.time_travel(vesting_time)
+    pool.unlock_profits()
+    assert pool.vesting_rate() == vesting_rate
+    assert pool.last_report() == last_report + vesting_time
+
+
+@pytest.mark.pool
+@pytest.mark.share_price
+@given(amount=st.integers(min_value=10**18, max_value=10**25),
+        withdraw_fee=st.integers(min_value=0, max_value=200),)
+@settings(max_examples=100, deadline=timedelta(seconds=1000))
+def test_redeem_matches_preview_with_single_price_snapshot(pool, me, admin, _deposit, amount, withdraw_fee):
+    pool.set_withdraw_fee(withdraw_fee, sender=admin)
+    _deposit(amount, me)
+
+    expected_assets = pool.previewRedeem(amount)
+    assert pool.redeem(amount, me, me, sender=me) == expected_assets
+
+
+@pytest.mark.pool
+@pytest.mark.share_price
+@given(amount=st.integers(min_value=10**18, max_value=10**24),
+        flash_fee=st.integers(min_value=1, max_value=200),
+        vesting_time=st.integers(min_value=1, max_value=60*60*24*28),)
+@settings(max_examples=100, deadline=timedelta(seconds=1000))
+def test_flash_fees_locked_as_profit_on_next_accounting_update(
+    pool, me, admin, base_asset, flash_borrower, _deposit,
+    amount, flash_fee, vesting_time
+):
+    pool.set_flash_fee(flash_fee, sender=admin)
+    _deposit(INIT_USER_POOL_BALANCE, me)
+    init_price = pool.price()
+    init_assets = pool.total_assets()
+    init_locked = pool.locked_profits()
+
+    fee = pool.flashFee(base_asset, amount)
+    pool.flashLoan(flash_borrower, base_asset, amount, b"", sender=flash_borrower.address)
+
+    # flash loan only records fee
+    assert pool.pending_flash_fees() == fee
+    assert pool.total_assets() == init_assets
+    assert pool.totalAssets() == init_assets + fee
+    assert pool.price() == init_price
+
+    # fee gets locked as profit on next update and only starts vesting from then
+    boa.env.time_travel(seconds=vesting_time)
+    pool.unlock_profits()
+    assert pool.pending_flash_fees() == 0
+    assert pool.total_assets() == init_assets + fee
+    assert pool.locked_profits() == init_locked + fee
+    assert pool.price() == init_price
+
+
+def _prices_after_flash_loan(pool, base_asset, flash_borrower, lock_delay, offsets):
+    """
+    share price `offsets` seconds after a flash loan whose fee gets locked `lock_delay` seconds after the loan.
+    lock_delay=0 is the old path where flashLoan locked the fee itself with _update_shares
+    """
+    prices = []
+    with boa.env.anchor():
+        pool.flashLoan(flash_borrower, base_asset, INIT_USER_POOL_BALANCE, b"", sender=flash_borrower.address)
+        loaned_at = boa.env.vm.state.timestamp
+        locked = False
+        for offset in sorted(offsets):
+            if not locked and offset >= lock_delay:
+                boa.env.time_travel(seconds=lock_delay - (boa.env.vm.state.timestamp - loaned_at))
+                pool.unlock_profits()
+                locked = True
+            boa.env.time_travel(seconds=offset - (boa.env.vm.state.timestamp - loaned_at))
+            prices.append(pool.price())
+    return prices
+
+
+@pytest.mark.pool
+@pytest.mark.share_price
+@given(delay=st.integers(min_value=1, max_value=60*60*24*7),
+        offsets=st.lists(st.integers(min_value=0, max_value=60*60*24*28), min_size=1, max_size=5, unique=True),)
+@settings(max_examples=50, deadline=timedelta(seconds=1000))
+def test_lazy_flash_fees_vest_from_next_accounting_update(
+    pool, me, admin, base_asset, flash_borrower, _deposit,
+    delay, offsets
+):
+    pool.set_flash_fee(200, sender=admin)
+    # fully vest over 2 weeks so price visibly moves inside the sampled window
+    pool.set_vesting_rate(VESTING_RATE_COEFFICIENT // (60*60*24*14), sender=admin)
+    _deposit(INIT_USER_POOL_BALANCE, me)
+    init_price = pool.price()
+    offsets = sorted(offsets)
+
+    eager = _prices_after_flash_loan(pool, base_asset, flash_borrower, 0, [delay + o for o in offsets])
+    lazy = _prices_after_flash_loan(pool, base_asset, flash_borrower, delay, [delay + o for o in offsets])
+    # same vesting curve as locking inside flashLoan, just starting from the next accounting update
+    assert lazy == _prices_after_flash_loan(pool, base_asset, flash_borrower, 0, offsets)
+    # so price lags behind the old path until the fee is fully vested
+    assert all(l <= e for l, e in zip(lazy, eager))
+    if delay >= 60*60*24 and offsets[0] < 60*60*24*13:
+        assert lazy[0] < eager[0]
+    # and doesnt move at all before the next update
+    assert _prices_after_flash_loan(pool, base_asset, flash_borrower, delay, [o % delay for o in offsets]) == [init_price] * len(offsets)
@@ -308,6 +308,27 @@ def test_divest_vault_only_owner_if_unrealized_loss(pool, vault, base_asset, adm
 def test_divest_vault_anyone_if_realizing_loss(pool, vault, base_asset, admin, me, init_token_balances):
     assert True
 
+def test_vault_registry_tracks_vaults_with_open_investments(pool, vault, base_asset, admin, me, init_token_balances):
+    # no withdraw fees so divesting all principal burns all shares
+    vault2 = boa.load('contracts/DebtDAOPool.vy', me, base_asset, "No Fee Vault", "NOFEE", [0, 0, 0, 0, 0, 0])
+
+    pool.invest_vault(vault, 100, sender=admin)
+    pool.invest_vault(vault2, 100, sender=admin)
+    pool.invest_vault(vault, 100, sender=admin)
+
+    assert pool.vault_count() == 2
+    assert pool.get_vaults(1, 10) == [vault.address, vault2.address]
+    assert pool.get_vaults(2, 1) == [vault2.address]
+    assert pool.get_vaults(3, 10) == []
+
+    # vault stays in set until all shares are burned
+    pool.divest_vault(vault2, 50, sender=admin)
+    assert pool.vault_count() == 2
+
+    pool.divest_vault(vault2, 50, sender=admin)
+    assert pool.vault_count() == 1
+    assert pool.get_vaults(1, 10) == [vault.address]
+
 # burn proper amount of shares for assets (do it 2x),
 # no profit, no profit (do it 2x),
 # no profit, profit (do it 2x),
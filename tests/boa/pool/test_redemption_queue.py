@@ -0,0 +1,109 @@
+import boa
+import pytest
+from eth_utils import to_checksum_address
+from ..conftest import ZERO_ADDRESS
+from ..utils.events import _find_event, _find_event_by
+
+@pytest.fixture
+def queue(pool, admin):
+    queue = boa.load('contracts/RedemptionQueue.vy', pool)
+    pool.set_redemption_queue(queue, sender=admin)
+    return queue
+
+@pytest.fixture
+def lent_out(pool, me, admin, _deposit, _add_credit):
+    """
+    me and admin each own 100 shares and every pool asset is lent to mock_line so nothing can be redeemed
+    """
+    _deposit(10**20, me)
+    _deposit(10**20, admin)
+    id = _add_credit(2 * 10**20, new_deposit=False)
+    assert pool.liquid_assets() == 0
+    return id
+
+def _request(pool, queue, shares, owner):
+    pool.approve(queue, shares, sender=owner)
+    return queue.request_redeem(shares, owner, sender=owner)
+
+@pytest.mark.pool
+def test_only_owner_can_set_redemption_queue(pool, admin, me):
+    assert pool.redemption_queue() == ZERO_ADDRESS
+    with boa.reverts():
+        pool.set_redemption_queue(me, sender=me)
+    pool.set_redemption_queue(me, sender=admin)
+    assert to_checksum_address(_find_event('UpdateRedemptionQueue', pool.get_logs()).args_map['queue']) == me
+    assert pool.redemption_queue() == me
+
+@pytest.mark.pool
+def test_cant_swap_queue_with_pending_redemptions(pool, queue, lent_out, mock_line, me, admin):
+    _request(pool, queue, 10**20, me)
+    with boa.reverts():
+        pool.set_redemption_queue(ZERO_ADDRESS, sender=admin)
+
+    # shares only partially redeemed
+    pool.reduce_credit(mock_line, lent_out, 4 * 10**19, sender=admin)
+    with boa.reverts():
+        pool.set_redemption_queue(ZERO_ADDRESS, sender=admin)
+
+    # old queue can still pay out redeemed shares after swap
+    pool.reduce_credit(mock_line, lent_out, 6 * 10**19, sender=admin)
+    pool.set_redemption_queue(ZERO_ADDRESS, sender=admin)
+    assert queue.claim(me) == 10**20
+
+@pytest.mark.pool
+def test_returned_liquidity_fills_requests_in_order(pool, base_asset, queue, lent_out, mock_line, me, admin):
+    first = _request(pool, queue, 6 * 10**19, me)
+    second = _request(pool, queue, 6 * 10**19, admin)
+    assert (first, second) == (0, 1)
+    assert pool.balanceOf(queue) == queue.pending_shares() == 12 * 10**19
+
+    # line repays part of deposit. pool redeems escrowed shares with it right away
+    pool.reduce_credit(mock_line, lent_out, 10**20, sender=admin)
+    # same withdraw fee log as any other redeem
+    fee_log = _find_event_by({ 'fee_type': 4 }, pool.get_logs())
+    assert to_checksum_address(fee_log['payer']) == queue.address and fee_log['amount'] == 10**20
+    assert pool.liquid_assets() == 0
+    assert pool.balanceOf(queue) == 2 * 10**19
+    assert base_asset.balanceOf(queue) == 10**20
+
+    queue.claim(me)
+    assert base_asset.balanceOf(me) == 6 * 10**19
+    assert queue.requests(first)[2] == 0
+    # second request only partially filled
+    assert queue.requests(second)[2] == 2 * 10**19
+    assert queue.head() == 1
+    assert queue.claimable(admin) == 4 * 10**19
+
+    pool.reduce_credit(mock_line, lent_out, 10**20, sender=admin)
+    queue.claim(sender=admin)
+    assert base_asset.balanceOf(admin) == 6 * 10**19
+    assert queue.head() == queue.tail() == 2
+    assert queue.pending_shares() == pool.balanceOf(queue) == 0
+    assert base_asset.balanceOf(queue) == 0
+    # rest of liquidity stays in pool for remaining holders
+    assert pool.liquid_assets() == pool.totalAssets() == 8 * 10**19
+
+@pytest.mark.pool
+def test_cancel_returns_unfilled_shares(pool, queue, lent_out, mock_line, me, admin):
+    index = _request(pool, queue, 10**20, me)
+    pool.reduce_credit(mock_line, lent_out, 4 * 10**19, sender=admin)
+
+    with boa.reverts():
+        queue.cancel(index, sender=admin)
+    assert queue.cancel(index, sender=me) == 6 * 10**19
+    assert pool.balanceOf(me) == 6 * 10**19
+    assert queue.claimable(me) == 4 * 10**19
+    # nothing left to cancel
+    with boa.reverts():
+        queue.cancel(index, sender=me)
+
+@pytest.mark.pool
+def test_anyone_can_settle_with_new_deposits(pool, base_asset, queue, lent_out, me, _deposit):
+    _request(pool, queue, 10**20, me)
+    assert queue.settle() == 0
+
+    _deposit(3 * 10**19, boa.env.generate_address())
+    assert queue.settle() == 3 * 10**19
+    assert queue.claim(me) == 3 * 10**19
+    assert queue.pending_shares() == 7 * 10**19
+    assert base_asset.balanceOf(me) == 3 * 10**19
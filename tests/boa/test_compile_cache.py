@@ -0,0 +1,103 @@
+import boa
+import vyper
+import pytest
+import pickle
+import copyreg
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from boa.vyper.contract import VyperDeployer
+from vyper.compiler.phases import CompilerData
+from vyper.semantics.namespace import Namespace
+from .utils.compile_cache import CompileCache, REPO_ROOT
+
+CONTRACT = '''
+import interfaces.ICounter as ICounter
+
+implements: ICounter
+
+count: public(uint256)
+
+@external
+def increment():
+    self.count += 1
+'''
+
+INTERFACE = '''
+@external
+def increment():
+    pass
+'''
+
+def _project(root: Path) -> Path:
+    (root / "interfaces").mkdir(parents=True)
+    (root / "interfaces" / "ICounter.vy").write_text(INTERFACE)
+    return root
+
+@pytest.fixture
+def project(tmp_path) -> Path:
+    return _project(tmp_path / "project")
+
+@pytest.fixture
+def cache(tmp_path, project) -> CompileCache:
+    return CompileCache(tmp_path / "cache", root=project)
+
+def test_key_changes_when_imported_interface_changes(cache, project):
+    key = cache.cal(CONTRACT)
+    assert cache.cal(CONTRACT) == key
+
+    (project / "interfaces" / "ICounter.vy").write_text(INTERFACE + "\n@external\ndef reset():\n    pass\n")
+    assert cache.cal(CONTRACT) != key
+
+def test_key_changes_with_compiler_version(cache, project, monkeypatch):
+    key = cache.cal(CONTRACT)
+    monkeypatch.setattr(vyper, "__version__", "0.0.0")
+    assert CompileCache(cache.cache_dir, root=project).cal(CONTRACT) != key
+
+def test_key_doesnt_depend_on_checkout_location(tmp_path, cache):
+    # CI restores the cache dir into checkouts at other paths
+    other_checkout = _project(tmp_path / "other" / "checkout")
+    assert CompileCache(cache.cache_dir, root=other_checkout).cal(CONTRACT) == cache.cal(CONTRACT)
+
+def test_cache_hit_returns_equivalent_deployer(tmp_path):
+    source = (REPO_ROOT / "tests/mocks/MockERC20.vy").read_text()
+    cache = CompileCache(tmp_path / "cache")
+    compiled = []
+    def compile():
+        # same as boa does on a cache miss
+        compiled.append(1)
+        data = CompilerData(source, "MockERC20")
+        data.bytecode_runtime
+        return data
+
+    fresh = cache.caching_lookup(source, compile)
+    cached = CompileCache(tmp_path / "cache").caching_lookup(source, compile)
+    assert len(compiled) == 1 # second lookup read from disk
+    assert cached is not fresh
+    assert cached.bytecode == fresh.bytecode
+    assert cached.bytecode_runtime == fresh.bytecode_runtime
+
+    # deployer from cached data works end to end, including eval which needs the unpickled Namespace
+    token = VyperDeployer(cached).deploy("Cached", "CACHE", 18)
+    me = boa.env.generate_address()
+    token.mint(me, 10)
+    assert token.balanceOf(me) == 10
+    assert token.eval(f"self.balances[{me}]") == 10
+    # Namespace reducer is scoped to the cache's pickler
+    assert Namespace not in copyreg.dispatch_table
+
+def test_crashed_write_is_recompiled(tmp_path, cache):
+    p = cache.cal(CONTRACT)
+    p.parent.mkdir(parents=True)
+    p.write_bytes(b"truncated")
+    assert cache.caching_lookup(CONTRACT, lambda: "recompiled") == "recompiled"
+    assert cache.caching_lookup(CONTRACT, lambda: "not called") == "recompiled"
+    # no temp files left behind
+    assert [f.name for f in p.parent.iterdir()] == [p.name]
+
+def test_concurrent_writers_leave_one_complete_entry(cache):
+    # xdist workers compiling the same contract at once. each writes its own temp file then renames over the entry
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda i: cache.caching_lookup(CONTRACT, lambda: ("compiled", i)), range(8)))
+    p = cache.cal(CONTRACT)
+    assert pickle.loads(p.read_bytes()) in results
+    assert [f.name for f in p.parent.iterdir()] == [p.name]
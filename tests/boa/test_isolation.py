@@ -0,0 +1,41 @@
+import sys
+import pytest
+import subprocess
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).parents[2]
+# modules that change session contracts and block time the most
+SHARED_STATE_MODULES = [
+    "tests/boa/pool/test_gas_snapshot.py",
+    "tests/boa/pool/test_redemption_queue.py",
+    "tests/boa/pool/test_pool_lifecycle.py",
+]
+
+def _outcomes(report: Path, *args) -> dict:
+    """ run SHARED_STATE_MODULES in a fresh session and return each test's outcome """
+    subprocess.run(
+        [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", f"--junitxml={report}", *args, *SHARED_STATE_MODULES],
+        cwd=REPO_ROOT, capture_output=True,
+    )
+    outcomes = {}
+    for case in ET.parse(report).iter("testcase"):
+        results = [child.tag for child in case if child.tag in ("failure", "error", "skipped")]
+        outcomes[f"{case.get('classname')}::{case.get('name')}"] = results[0] if results else "passed"
+    return outcomes
+
+@pytest.fixture(scope="module")
+def in_order(tmp_path_factory) -> dict:
+    outcomes = _outcomes(tmp_path_factory.mktemp("in_order") / "report.xml")
+    assert outcomes
+    return outcomes
+
+@pytest.mark.slow
+@pytest.mark.parametrize("shuffle", [0, 1337])
+def test_results_dont_depend_on_test_order(tmp_path, in_order, shuffle):
+    assert _outcomes(tmp_path / "shuffled.xml", f"--shuffle={shuffle}") == in_order
+
+@pytest.mark.slow
+def test_results_match_serial_run_under_xdist(tmp_path, in_order):
+    pytest.importorskip("xdist")
+    assert _outcomes(tmp_path / "xdist.xml", "-n", "2") == in_order
@@ -83,7 +83,7 @@ def test_deposit(pool, base_asset, me, admin, init_token_balances,
 
     # fees_generated = round((amount * deposit_fee) / FEE_COEFFICIENT / share_price)
     fees_generated = math.floor((amount * deposit_fee) / FEE_COEFFICIENT / share_price) 
-    pool.eval(f'self.fees.deposit = {deposit_fee}')
+    pool.eval(f'self._set_fee({deposit_fee}, FEE_TYPES.DEPOSIT)')
 
     # deposit fails if we `amount` gets us no shares back bc price too high
     expected_shares = _to_shares(amount, share_price)
@@ -169,7 +169,7 @@ def test_mint(pool, base_asset, me, admin, init_token_balances,
 
     # fees_generated = math.floor((amount * deposit_fee) / FEE_COEFFICIENT / share_price) 
     fees_generated = math.floor(math.floor(amount * deposit_fee) / FEE_COEFFICIENT)
-    pool.eval(f'self.fees.deposit = {deposit_fee}')
+    pool.eval(f'self._set_fee({deposit_fee}, FEE_TYPES.DEPOSIT)')
     
     # deposit fails if we havent approved base tokens yet
     if amount > 0:
@@ -230,7 +230,7 @@ def test_withdraw(
     pre_action_price = pool.price()
     assert pre_action_price == POOL_PRICE_DECIMALS
 
-    pool.eval(f"self.fees.withdraw = {withdraw_fee}")
+    pool.eval(f"self._set_fee({withdraw_fee}, FEE_TYPES.WITHDRAW)")
 
     if amount > INIT_USER_POOL_BALANCE:
         with boa.reverts(): # TODO TEST custom errors
@@ -301,7 +301,7 @@ def test_withdraw_with_approval(
     # approve max bc they take `amount` + a withdraw fee` 
     pool.approve(admin, MAX_UINT, sender=me)
     
-    pool.eval(f"self.fees.withdraw = {withdraw_fee}")
+    pool.eval(f"self._set_fee({withdraw_fee}, FEE_TYPES.WITHDRAW)")
 
     if amount > INIT_USER_POOL_BALANCE:
         with boa.reverts(): # TODO TEST custom errors
@@ -358,7 +358,7 @@ def test_redeem(
     assert pool.totalSupply() == INIT_POOL_BALANCE
     assert pool.balanceOf(me) == INIT_USER_POOL_BALANCE
 
-    pool.eval(f"self.fees.withdraw = {withdraw_fee}")
+    pool.eval(f"self._set_fee({withdraw_fee}, FEE_TYPES.WITHDRAW)")
 
     if amount > INIT_USER_POOL_BALANCE:
         with boa.reverts(): # TODO TEST custom errors
@@ -421,7 +421,7 @@ def test_redeem_with_approval(
     assert pool.totalSupply() == INIT_POOL_BALANCE
     assert pool.balanceOf(me) == INIT_USER_POOL_BALANCE
 
-    pool.eval(f"self.fees.withdraw = {withdraw_fee}")
+    pool.eval(f"self._set_fee({withdraw_fee}, FEE_TYPES.WITHDRAW)")
 
     if amount > INIT_USER_POOL_BALANCE:
         with boa.reverts(): # TODO TEST custom errors
@@ -584,7 +584,7 @@ def test_invariant_preview_equals_realized_share_price(
     assert redeemable == redeemed
     assert withdrawable == withdrawn
 
-    pool.eval(f"self.fees.withdraw = {pittance_fee}")
+    pool.eval(f"self._set_fee({pittance_fee}, FEE_TYPES.WITHDRAW)")
 
     withdraw_fee = _calc_fee(assets=assets, fee=withdraw_fee, price=pre_action_price)
     redeem_fee = _calc_fee(shares=shares, fee=withdraw_fee, price=pre_action_price)
@@ -611,7 +611,7 @@ def test_invariant_preview_equals_realized_share_price(
     assert mintable == minted
     assert depositable == deposited
     
-    pool.eval(f"self.fees.deposit = {pittance_fee}")
+    pool.eval(f"self._set_fee({pittance_fee}, FEE_TYPES.DEPOSIT)")
 
     reset(pool, base_asset)
     mintable = pool.previewMint(shares, sender=me)
@@ -0,0 +1,15 @@
+import pytest
+import importlib.metadata
+
+# gas.py and compile_cache.py hook into titanoboa internals that arent part of its public API
+# (py-evm's access journal, boa.interpret._disk_cache). They are only verified against this release.
+# Keep in sync with the titanoboa pin in dev-requirements.txt and recheck both utils when bumping it.
+PINNED_BOA_VERSION = "0.1.7"
+BOA_VERSION = importlib.metadata.version("titanoboa")
+IS_PINNED_BOA = BOA_VERSION == PINNED_BOA_VERSION
+
+# skip tests that depend on boa internals instead of failing in confusing ways on other boa versions
+requires_pinned_boa = pytest.mark.skipif(
+    not IS_PINNED_BOA,
+    reason=f"relies on titanoboa {PINNED_BOA_VERSION} internals, found {BOA_VERSION}",
+)
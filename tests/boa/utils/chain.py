@@ -0,0 +1,47 @@
+import boa
+import asyncio
+from typing import List, Sequence, Tuple
+
+# offchain.rpc.ChainClient backed by the boa env so keepers run against MockLine without a node
+
+class BoaChainClient:
+    """
+    eth_calls run on an anchored env so they never change state. txs apply immediately.
+    Tracks requests in flight to check keepers respect their concurrency limit.
+    """
+    def __init__(self, sender: str, gas_price: int = 0):
+        self.sender = sender
+        self.gas = gas_price
+        self.requests = 0
+        self.calls: List[Tuple[str, bytes]] = []
+        self.sent: List[Tuple[str, bytes]] = []
+        self.in_flight = self.max_in_flight = 0
+
+    def _execute(self, to: str, data: bytes):
+        code = boa.env.vm.state.get_code(bytes.fromhex(to[2:]))
+        return boa.env.execute_code(to, self.sender, data=data, bytecode=code)
+
+    async def call_many(self, calls: Sequence[Tuple[str, bytes]]) -> List[bytes | None]:
+        self.requests += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        # yield so concurrent batches overlap like real requests
+        await asyncio.sleep(0)
+        outputs = []
+        for to, data in calls:
+            self.calls.append((to, data))
+            with boa.env.anchor():
+                computation = self._execute(to, data)
+                outputs.append(None if computation.is_error else computation.output)
+        self.in_flight -= 1
+        return outputs
+
+    async def send(self, to: str, data: bytes) -> str:
+        computation = self._execute(to, data)
+        if computation.is_error:
+            raise RuntimeError(f"tx to {to} reverted")
+        self.sent.append((to, data))
+        return f"0x{len(self.sent):064x}"
+
+    async def gas_price(self) -> int:
+        return self.gas
@@ -0,0 +1,117 @@
+import io
+import os
+import re
+import boa
+import time
+import pickle
+import copyreg
+import hashlib
+import threading
+import vyper
+from pathlib import Path
+from typing import List
+from vyper.semantics.namespace import Namespace
+from .boa_version import IS_PINNED_BOA
+
+# `import interfaces.IERC20 as IERC20` or `from interfaces import IERC20`
+IMPORT_PATTERN = re.compile(r"^(?:import\s+([\w.]+)|from\s+([\w.]+)\s+import\s+(\w+))", re.MULTILINE)
+INTERFACE_SUFFIXES = (".vy", ".vyi", ".json")
+# contracts import interfaces relative to the repo root, wherever pytest is run from
+REPO_ROOT = Path(__file__).resolve().parents[3]
+# unused entries are deleted after a week, checked at most every ttl / 10
+CACHE_TTL = 7 * 24 * 60 * 60
+
+def _new_namespace() -> Namespace:
+    namespace = Namespace.__new__(Namespace)
+    namespace._scopes = []
+    return namespace
+
+def _reduce_namespace(namespace: Namespace):
+    # default dict subclass pickling sets items before __dict__ is restored and Namespace.__setitem__ needs _scopes.
+    # without this every cached CompilerData fails on contract.eval()
+    return (_new_namespace, (), dict(namespace.__dict__), None, iter(dict.items(namespace)))
+
+def _dumps(result) -> bytes:
+    # reducer only applies to this pickler instead of every pickle.dumps in the process
+    buffer = io.BytesIO()
+    pickler = pickle.Pickler(buffer)
+    pickler.dispatch_table = { **copyreg.dispatch_table, Namespace: _reduce_namespace }
+    pickler.dump(result)
+    return buffer.getvalue()
+
+class CompileCache:
+    """
+    Content addressed compile cache for boa. Entries are keyed on the vyper version, the contract source
+    and the source of every interface it imports (boa only keys on contract source) so editing `interfaces/` invalidates
+    every contract using them. Entries are written atomically so processes can share one cache dir and CI can restore it.
+    Same `caching_lookup(source, func)` interface boa calls on its own cache.
+    """
+    def __init__(self, cache_dir, root: Path = REPO_ROOT, ttl: int = CACHE_TTL):
+        self.cache_dir = Path(cache_dir).expanduser()
+        self.root = Path(root)
+        self.ttl = ttl
+        self.compiler_version = f"{vyper.__version__}.{vyper.__commit__}"
+        self._last_gc = 0.0
+
+    def _interfaces(self, source: str, seen: set | None = None) -> List[Path]:
+        """
+        every interface file imported by `source`, recursively. builtins like `vyper.interfaces` arent on disk and
+        are already covered by the compiler version.
+        """
+        seen = set() if seen is None else seen
+        for match in IMPORT_PATTERN.finditer(source):
+            module = match[1] or f"{match[2]}.{match[3]}"
+            for suffix in INTERFACE_SUFFIXES:
+                path = self.root.joinpath(*module.split(".")).with_suffix(suffix)
+                if path.is_file() and path not in seen:
+                    seen.add(path)
+                    self._interfaces(path.read_text(), seen)
+        return sorted(seen)
+
+    # content-addressable location
+    def cal(self, source: str) -> Path:
+        digest = hashlib.sha256(f"{self.compiler_version}\n{source}".encode("utf-8"))
+        for path in self._interfaces(source):
+            digest.update(f"\n{path.relative_to(self.root).as_posix()}\n".encode("utf-8"))
+            digest.update(path.read_bytes())
+        return self.cache_dir.joinpath(self.compiler_version, f"{digest.hexdigest()}.pickle")
+
+    def gc(self):
+        """ delete entries nobody has read within ttl """
+        now = time.time()
+        for path in self.cache_dir.glob("*/*.pickle"):
+            try:
+                if now - path.stat().st_atime > self.ttl:
+                    path.unlink()
+            except FileNotFoundError:
+                pass # another process collected it first
+        self._last_gc = now
+
+    def caching_lookup(self, source: str, func):
+        if time.time() - self._last_gc >= self.ttl // 10:
+            self.gc()
+
+        p = self.cal(source)
+        try:
+            return pickle.loads(p.read_bytes())
+        except (OSError, EOFError, pickle.UnpicklingError):
+            pass # not cached yet or truncated by a crashed run. recompile and overwrite
+
+        result = func()
+        p.parent.mkdir(parents=True, exist_ok=True)
+        # unique per process and thread so xdist workers never write the same temp file. rename is atomic so last writer wins
+        tmp = p.with_suffix(f".{os.getpid()}.{threading.get_ident()}.unfinished")
+        tmp.write_bytes(_dumps(result))
+        os.replace(tmp, p)
+        return result
+
+def set_compile_cache(cache_dir: Path | None):
+    """
+    Use CompileCache for every boa.load* call in this process. None disables caching.
+    boa has no public hook for a custom cache so this sets boa.interpret._disk_cache, only on the pinned boa version.
+    Other versions fall back to boa's own cache (keyed on contract source only) in the same dir.
+    """
+    if not IS_PINNED_BOA:
+        boa.interpret.set_cache_dir(cache_dir)
+        return
+    boa.interpret._disk_cache = None if cache_dir is None else CompileCache(cache_dir)
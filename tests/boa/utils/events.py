@@ -1,5 +1,10 @@
+import boa
 import logging
-from typing  import List
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing  import Any, Dict, List, Tuple
 from boa.vyper.event import Event
 
 def _find_event(name: str, events: List[Event]) -> Event | None:
@@ -25,4 +30,222 @@ def _find_event_by(where: object, events: List[Event]) -> Event | None:
                      passed = False
             
             if passed:
-                return e.args_map
\ No newline at end of file
+                return e.args_map
+# `pool.get_logs()` only returns logs from the last call made through `pool` so helpers have to search
+# them right after the call. EventRecorder keeps every log from every call made in the env instead.
+
+@dataclass(frozen=True)
+class RecordedEvent:
+    seq: int            # position in recorder. also global emit order across calls
+    block: int
+    timestamp: int
+    contract: str       # checksum address of emitter
+    name: str
+    args: Dict[str, Any]
+    event: Event
+
+@dataclass(frozen=True)
+class RawLog:
+    """
+    log as an RPC node returns it. same fields offchain.indexer.LogSource implementations return
+    """
+    address: str        # lowercase hex
+    topics: List[bytes] # 32 byte topics. topics[0] is event id
+    data: bytes
+    block_number: int
+    log_index: int
+
+def _key(value: Any) -> Any:
+    """
+    normalize arg values for index lookups. decoded addresses are lowercase, tests use checksummed or contracts
+    """
+    if hasattr(value, 'address'):
+        value = value.address
+    if isinstance(value, str):
+        return value.lower()
+    return value
+
+class EventRecorder:
+    """
+    Append only store of every decoded event emitted by calls through `env.execute_code` while recording.
+    Indexed by event name, (emitter, event name) and (event name, indexed arg, value) for O(1) lookups
+    e.g. `log.find('RevenueGenerated', fee_type=1)`. Non indexed args are filtered over the narrowest index.
+    Events from anchors opened while recording are dropped when the anchor rolls back, same as the chain.
+    That includes the anchor boa wraps every hypothesis example in so each example only sees its own events.
+    Events emitted by constructors (deploy_code) are not recorded.
+    """
+    def __init__(self, env=None):
+        self.env = env or boa.env
+        self.records: List[RecordedEvent] = []
+        # every log as emitted. (block, timestamp, address, topics, data)
+        self.raw_logs: List[Tuple[int, int, bytes, List[int], bytes]] = []
+        self._by_name: Dict[str, List[int]] = defaultdict(list)
+        self._by_contract: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+        self._by_arg: Dict[Tuple[str, str, Any], List[int]] = defaultdict(list)
+        # False once a record is older than the one before it e.g. time set back manually. disables bisect in find()
+        self._monotonic = True
+        # env methods shadowed while recording, restored on stop
+        self._patched: Dict[str, Any] = {}
+
+    def __enter__(self) -> "EventRecorder":
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def start(self):
+        if self._patched:
+            return
+        execute_code, anchor = self.env.execute_code, self.env.anchor
+
+        def record_execute_code(*args, **kwargs):
+            computation = execute_code(*args, **kwargs)
+            self.record(computation)
+            return computation
+
+        @contextmanager
+        def truncating_anchor():
+            mark = (len(self.records), len(self.raw_logs))
+            try:
+                with anchor():
+                    yield
+            finally:
+                self.truncate(*mark)
+
+        # shadow bound methods on this env instance only. keep whatever was there (e.g. another recorder) to restore
+        for name, method in (("execute_code", record_execute_code), ("anchor", truncating_anchor)):
+            self._patched[name] = self.env.__dict__.get(name)
+            setattr(self.env, name, method)
+
+    def stop(self):
+        for name, previous in self._patched.items():
+            if previous is None:
+                delattr(self.env, name)
+            else:
+                setattr(self.env, name, previous)
+        self._patched = {}
+
+    def truncate(self, records: int, raw_logs: int):
+        """
+        forget everything recorded after the first `records` events and `raw_logs` logs e.g. after an anchor reverts
+        """
+        del self.raw_logs[raw_logs:]
+        if len(self.records) <= records:
+            return
+        del self.records[records:]
+        # every index is in seq order so dropped seqs are always at the end
+        for index in (self._by_name, self._by_contract, self._by_arg):
+            for key in list(index):
+                seqs = index[key]
+                while seqs and seqs[-1] >= records:
+                    seqs.pop()
+                if not seqs:
+                    del index[key]
+        self._monotonic = all(a.timestamp <= b.timestamp for a, b in zip(self.records, self.records[1:]))
+
+    def record(self, computation):
+        """
+        decode and index all logs from `computation` and its child calls. reverted calls have no logs
+        """
+        block, timestamp = self.env.vm.state.block_number, self.env.vm.state.timestamp
+        # py-evm log format is (log_id, address, topics, data)
+        for entry in sorted(computation.get_raw_log_entries()):
+            self.raw_logs.append((block, timestamp, *entry[1:]))
+            contract = self.env.lookup_contract(entry[1])
+            # only boa contracts have an abi to decode with. anonymous events have no topic to match
+            if contract is None or not entry[2] or entry[2][0] not in getattr(contract, 'event_for', {}):
+                continue
+
+            event = contract.decode_log(entry)
+            name = event.event_type.name
+            seq = len(self.records)
+            if self.records and timestamp < self.records[-1].timestamp:
+                self._monotonic = False
+            self.records.append(RecordedEvent(seq, block, timestamp, event.address, name, event.args_map, event))
+
+            self._by_name[name].append(seq)
+            self._by_contract[(_key(event.address), name)].append(seq)
+            for arg, is_topic in zip(event.event_type.arguments.keys(), event.event_type.indexed):
+                if is_topic:
+                    self._by_arg[(name, arg, _key(event.args_map[arg]))].append(seq)
+
+    def find(self, name: str, contract: Any = None, since: int = None, until: int = None, **where) -> List[RecordedEvent]:
+        """
+        @param name     event name e.g. RevenueGenerated
+        @param contract emitter address or boa contract
+        @param since    inclusive block timestamp to start from
+        @param until    inclusive block timestamp to end at
+        @param where    arg values to match. indexed args are looked up, others are filtered
+        @return matching events in emit order
+        """
+        candidates = [self._by_name.get(name, [])]
+        if contract is not None:
+            candidates.append(self._by_contract.get((_key(contract), name), []))
+        for arg, value in where.items():
+            index = self._by_arg.get((name, arg, _key(value)))
+            if index is not None:
+                candidates.append(index)
+            elif self._is_indexed(name, arg):
+                return [] # nothing emitted with that value
+
+        # all indexes are sorted by seq so any one is a superset in order. filter the smallest
+        seqs = min(candidates, key=len)
+        lo, hi = 0, len(seqs)
+        if self._monotonic:
+            # timestamps never decrease so time ranges are a bisect over any index
+            lo = 0 if since is None else bisect_left(seqs, since, key=lambda i: self.records[i].timestamp)
+            hi = len(seqs) if until is None else bisect_right(seqs, until, key=lambda i: self.records[i].timestamp)
+
+        found = []
+        for seq in seqs[lo:hi]:
+            record = self.records[seq]
+            if (since is not None and record.timestamp < since) or (until is not None and record.timestamp > until):
+                continue
+            if contract is not None and _key(record.contract) != _key(contract):
+                continue
+            if any(_key(record.args.get(arg)) != _key(value) for arg, value in where.items()):
+                continue
+            found.append(record)
+        return found
+
+    def last(self, name: str, contract: Any = None, **where) -> RecordedEvent | None:
+        found = self.find(name, contract, **where)
+        return found[-1] if found else None
+
+    def _is_indexed(self, name: str, arg: str) -> bool:
+        # any recorded event of this type tells us which args are topics
+        seqs = self._by_name.get(name)
+        if not seqs:
+            return True
+        event_t = self.records[seqs[0]].event.event_type
+        return dict(zip(event_t.arguments.keys(), event_t.indexed)).get(arg, False)
+
+class BoaLogSource:
+    """
+    offchain.indexer.LogSource over everything an EventRecorder has recorded, so the indexer runs against a boa chain
+    """
+    def __init__(self, recorder: EventRecorder):
+        self.recorder = recorder
+
+    def block_number(self) -> int:
+        return self.recorder.env.vm.state.block_number
+
+    def block_timestamp(self, block_number: int) -> int:
+        return next(timestamp for block, timestamp, *_ in self.recorder.raw_logs if block == block_number)
+
+    def get_logs(self, from_block: int, to_block: int, addresses: List[str], topics: List[bytes]) -> List[RawLog]:
+        addresses = { a.lower() for a in addresses }
+        topics = { int.from_bytes(t, "big") for t in topics }
+        logs = []
+        log_index = {}
+        for block, _, address, log_topics, data in self.recorder.raw_logs:
+            # position in block like a node would return. boa doesnt have txs/receipts
+            index = log_index[block] = log_index.get(block, -1) + 1
+            address = "0x" + address.hex()
+            if from_block <= block <= to_block and address in addresses and log_topics and log_topics[0] in topics:
+                logs.append(RawLog(address, [t.to_bytes(32, "big") for t in log_topics], data, block, index))
+        return logs
@@ -0,0 +1,114 @@
+import os
+import re
+import boa
+import fcntl
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple
+
+# committed baseline, same format as `forge snapshot`
+GAS_SNAPSHOT_PATH = Path(__file__).parent.parent / ".gas-snapshot"
+# `GAS_SNAPSHOT=update pytest -m gas` to overwrite baseline with current run
+UPDATE_SNAPSHOT = os.environ.get("GAS_SNAPSHOT") == "update"
+# % gas increase over baseline before a benchmark fails
+REGRESSION_THRESHOLD = float(os.environ.get("GAS_REGRESSION_THRESHOLD", 1))
+
+SNAPSHOT_LINE = re.compile(r"^(?P<name>\S+) \(gas: (?P<gas>\d+)\)$")
+
+@contextmanager
+def _cold_access():
+    """
+    Treat every account and storage slot as cold (EIP-2929) like the start of a new tx.
+    boa has no public API for this. `_reset_access_counters()` swaps py-evm's access journal for a new one which
+    breaks any anchor already open, so put the outer journal back on exit. Private API, see boa_version.py
+    """
+    db = boa.env.vm.state._account_db
+    outer = db._journal_accessed_state
+    db._reset_access_counters()
+    try:
+        yield
+    finally:
+        db._journal_accessed_state = outer
+
+class GasSnapshot:
+    """
+    Collects gas used by contract calls and diffs them against the committed baseline.
+    Entries are named `Contract:function:state` e.g. `DebtDAOPool:deposit:empty_pool`
+    """
+    def __init__(self, path: Path = GAS_SNAPSHOT_PATH, threshold: float = REGRESSION_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self.baseline = self._load(path)
+        self.current: Dict[str, int] = {}
+        self.profiles = {}
+
+    @staticmethod
+    def _load(path: Path) -> Dict[str, int]:
+        if not path.exists():
+            return {}
+        return GasSnapshot._parse(path.read_text())
+
+    @staticmethod
+    def _parse(text: str) -> Dict[str, int]:
+        entries = {}
+        for line in text.splitlines():
+            match = SNAPSHOT_LINE.match(line.strip())
+            if match:
+                entries[match['name']] = int(match['gas'])
+        return entries
+
+    def measure(self, name: str, contract, call: Callable) -> int:
+        """
+        Record gas used by `call()` on `contract` starting with all accounts/slots cold.
+        State is reverted afterwards so measurements in the same state dont affect each other.
+        Safe inside other anchors (e.g. default boa test isolation), see _cold_access
+        """
+        with _cold_access(), boa.env.anchor():
+            call()
+            computation = contract._computation
+            self.current[name] = computation.get_gas_used()
+            # keep line profile around to explain any regressions
+            self.profiles[name] = contract.line_profile(computation)
+
+        return self.current[name]
+
+    def diff(self) -> List[Tuple[str, int | None, int, float]]:
+        """
+        (name, baseline gas, current gas, % change) for every benchmark measured this run
+        """
+        rows = []
+        for name, gas in sorted(self.current.items()):
+            old = self.baseline.get(name)
+            change = 0.0 if not old else (gas - old) * 100 / old
+            rows.append((name, old, gas, change))
+        return rows
+
+    def regressions(self) -> List[Tuple[str, int | None, int, float]]:
+        # new benchmarks dont have a baseline to regress from
+        return [row for row in self.diff() if row[1] is not None and row[3] > self.threshold]
+
+    def report(self, rows: List[Tuple[str, int | None, int, float]] | None = None) -> str:
+        lines = []
+        for name, old, gas, change in (self.diff() if rows is None else rows):
+            if old is None:
+                lines.append(f"{name} (gas: {gas}) NEW")
+            elif old != gas:
+                lines.append(f"{name} (gas: {old} -> {gas} | {gas - old:+d} {change:+.3f}%)")
+        return "\n".join(lines)
+
+    def regression_report(self) -> str:
+        report = [self.report(self.regressions())]
+        for name, *_ in self.regressions():
+            report.append(f"\n{name}\n{self.profiles[name].summary()}")
+        return "\n".join(report)
+
+    def write(self):
+        # keep entries that weren't measured this run e.g. running a subset of benchmarks.
+        # xdist workers each write the benchmarks they ran so lock and reread file instead of using self.baseline
+        with open(self.path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            entries = {**self._parse(f.read()), **self.current}
+            f.seek(0)
+            f.truncate()
+            f.write("".join(f"{name} (gas: {gas})\n" for name, gas in sorted(entries.items())))
@@ -0,0 +1,2 @@
+# reference model lives in offchain/ so simulations can use it outside of tests
+from offchain.pool_model import PoolModel, FEE_TYPES, PRICE_DECIMALS, FOUR_EEKS_VESTING_RATE, uints
@@ -0,0 +1,46 @@
+from typing import Any, List, Tuple
+from eth_abi import encode, decode
+from eth_utils import function_signature_to_4byte_selector
+
+# Delegate functions DebtDAOPool.multicall() can route to
+# fn name -> (arg types, return types)
+MULTICALL_FUNCTIONS = {
+    "add_credit": (["address", "uint128", "uint128", "uint256"], ["bytes32"]),
+    "increase_credit": (["address", "bytes32", "uint256"], ["bool"]),
+    "set_rates": (["address", "bytes32", "uint128", "uint128"], ["bool"]),
+    "reduce_credit": (["address", "bytes32", "uint256"], ["uint256", "uint256"]),
+    "invest_vault": (["address", "uint256"], ["uint256"]),
+    "divest_vault": (["address", "uint256"], ["bool"]),
+    "unlock_profits": ([], ["uint256"]),
+}
+
+def _encode_call(fn_name: str, *args: Any) -> bytes:
+    """
+    calldata for a single multicall item e.g. _encode_call("reduce_credit", line, id, amount)
+    """
+    arg_types, _ = MULTICALL_FUNCTIONS[fn_name]
+    assert len(args) == len(arg_types), f"bad args to {fn_name}"
+
+    # allow passing contracts directly like boa does
+    args = [getattr(arg, "address", arg) for arg in args]
+    selector = function_signature_to_4byte_selector(f"{fn_name}({','.join(arg_types)})")
+    return selector + encode(arg_types, args)
+
+def _encode_multicall(calls: List[Tuple]) -> List[bytes]:
+    """
+    calldata for DebtDAOPool.multicall() from a list of (fn_name, *args) tuples
+    e.g. pool.multicall(_encode_multicall([("unlock_profits",), ("invest_vault", vault, 100)]), sender=admin)
+    """
+    return [_encode_call(*call) for call in calls]
+
+def _decode_multicall(calls: List[Tuple], results: List[bytes]) -> List[Any]:
+    """
+    decode multicall() return data into the same values the individual functions return
+    """
+    decoded = []
+    for call, result in zip(calls, results):
+        _, return_types = MULTICALL_FUNCTIONS[call[0]]
+        values = decode(return_types, result)
+        decoded.append(values[0] if len(values) == 1 else values)
+
+    return decoded
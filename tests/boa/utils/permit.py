@@ -0,0 +1,30 @@
+from eth_abi import encode
+from eth_keys import keys
+from eth_utils import keccak
+
+PERMIT_TYPE_HASH = keccak(text="Permit(address owner,address spender,uint256 value,uint256 nonce,uint256 deadline)")
+
+def _sign_permit(token, owner_key: bytes, spender: str, value: int, deadline: int) -> bytes:
+    """
+    EIP712 permit signature for MockERC20 (or any IERC2612 token w/ DOMAIN_SEPARATOR()).
+    Returns signature packed as r, s, v like permit() expects
+    """
+    private_key = keys.PrivateKey(owner_key)
+    owner = private_key.public_key.to_checksum_address()
+    spender = getattr(spender, "address", spender)
+
+    struct_hash = keccak(encode(
+        ["bytes32", "address", "address", "uint256", "uint256", "uint256"],
+        [PERMIT_TYPE_HASH, owner, spender, value, token.nonces(owner), deadline]
+    ))
+    digest = keccak(b"\x19\x01" + token.DOMAIN_SEPARATOR() + struct_hash)
+
+    sig = private_key.sign_msg_hash(digest)
+    return sig.r.to_bytes(32, "big") + sig.s.to_bytes(32, "big") + (sig.v + 27).to_bytes(1, "big")
+
+def _permit_signer(seed: int) -> (str, bytes):
+    """
+    deterministic account with a private key for signing permits. boa.env.generate_address() doesnt expose keys
+    """
+    owner_key = seed.to_bytes(32, "big")
+    return keys.PrivateKey(owner_key).public_key.to_checksum_address(), owner_key
@@ -49,7 +49,8 @@ struct Rate:
 # implements: ISecuredLine
 INTEREST_RATE_COEFFICIENT: constant(uint256) = 315576000000 # (100% in bps * 364.25 days in seconds)
 
-ids: public(uint256)
+# repayment queue. ids(0) is next position repaid by useAndRepay
+ids: public(DynArray[bytes32, 100])
 status: public(uint8)
 borrower: public(address)
 credits: public(HashMap[bytes32, Position])
@@ -81,6 +82,7 @@ def addCredit(
     _lender: address,
 ) -> bytes32:
     id: bytes32 = keccak256(_abi_encode(self, _lender, _token))
+    self.ids.append(id)
     self._set_rates(id, _drate, _frate)
     self.credits[id] = Position({
         deposit: _amount,
@@ -113,7 +115,8 @@ def _calc_new_interest(deposit: uint256, principal: uint256, timespan: uint256,
             self._calc_interest_rate(deposit - principal, timespan, frate))
 
 @internal
-def _accrue(p: Position, id: bytes32) -> Position:
+def _accrue(_p: Position, id: bytes32) -> Position:
+    p: Position = _p
     if not p.isOpen:
         return p
 
@@ -135,7 +138,8 @@ def _accrue(p: Position, id: bytes32) -> Position:
     return p
     
 @internal
-def _repay(p: Position, id: bytes32, amount: uint256) -> Position:
+def _repay(_p: Position, id: bytes32, amount: uint256) -> Position:
+    p: Position = _p
     assert amount <= p.principal + p.interestAccrued
 
     if(amount > p.interestAccrued):
@@ -239,9 +243,12 @@ def computeId(lender: address,  token: address) -> bytes32:
 # @external
 # def claimAndRepay(claimToken: address, tradeData: Bytes[50000]) -> uint256: 
 
-# @external
-# def useAndRepay(amount: uint256) -> bool: 
-#     IERC20(self.credits[id].token).transferFrom(msg.sender, self, amount)
+@external
+def useAndRepay(amount: uint256) -> bool:
+    # real line repays from revenue reserves it already holds. mint tokens to this mock to back the repayment
+    id: bytes32 = self.ids[0]
+    self.credits[id] = self._repay(self._accrue(self.credits[id], id), id, amount)
+    return True
 
 # @external
 # def declareInsolvent() -> bool: 